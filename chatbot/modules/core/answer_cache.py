@@ -0,0 +1,122 @@
+"""
+Cevap Önbelleği
+===============
+İlk tur (geçmişsiz) sorular için süreç genelinde cevap önbelleği.
+- Anahtar: normalize edilmiş soru metni + veri versiyonu
+- Opsiyonel: sorgu embedding'i ile semantik yakın-tekrar eşleşmesi
+Hit durumunda LLM ve tool çağrıları tamamen atlanır.
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from logger import get_logger
+
+log = get_logger("ans_cache")
+
+_TR_UPPER = str.maketrans({"I": "ı", "İ": "i"})
+_NON_WORD = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Soruyu önbellek anahtarı için normalize eder (Türkçe küçük harf, noktalama, boşluk)."""
+    text = text.translate(_TR_UPPER).lower()
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def data_version(stats: dict) -> str | None:
+    """Veritabanı istatistiklerinden kısa bir veri versiyonu üretir.
+    İlan sayısı, fiyat/yıl aralığı veya vektör sayısı değişince versiyon da değişir.
+
+    İstatistikler yoksa (soğuk başlangıç, MySQL/Qdrant erişilemiyor) None döner;
+    sabit bir özet o anda önbelleğe alınan cevapları veri gelince de geçerli sayardı.
+    """
+    mysql_stats = stats.get("mysql", {}) if stats else {}
+    qdrant_stats = stats.get("qdrant", {}) if stats else {}
+    fingerprint = {
+        "mysql": {k: mysql_stats.get(k) for k in ("toplam_ilan", "min_fiyat", "max_fiyat", "min_yil", "max_yil")},
+        "vektor": qdrant_stats.get("points_count") if isinstance(qdrant_stats, dict) else None,
+    }
+    if fingerprint["mysql"]["toplam_ilan"] is None or fingerprint["vektor"] is None:
+        return None
+    raw = json.dumps(fingerprint, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    if not na or not nb:
+        return 0.0
+    return dot / (na * nb)
+
+
+class AnswerCache:
+    """LRU + TTL cevap önbelleği. Thread-safe; Streamlit oturumları arasında paylaşılır."""
+
+    def __init__(self, max_entries: int = 256, ttl_sec: float = 3600.0,
+                 semantic_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.semantic_threshold = semantic_threshold
+        self._entries: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, entry: dict) -> bool:
+        return time.monotonic() - entry["created"] > self.ttl_sec
+
+    def get(self, question: str, version: str, embedding: list[float] | None = None) -> str | None:
+        """Tam eşleşme, yoksa (embedding verildiyse) semantik yakın-tekrar eşleşmesi arar."""
+        key = (normalize_question(question), version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                log.info(f"Cevap önbelleği hit (tam): {key[0][:60]}")
+                return entry["answer"]
+            if entry:
+                del self._entries[key]
+
+            if embedding is not None:
+                best_key, best_score = None, 0.0
+                for k, e in self._entries.items():
+                    if k[1] != version or e["embedding"] is None or self._expired(e):
+                        continue
+                    score = _cosine(embedding, e["embedding"])
+                    if score > best_score:
+                        best_key, best_score = k, score
+                if best_key is not None and best_score >= self.semantic_threshold:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    log.info(f"Cevap önbelleği hit (semantik {best_score:.3f}): {best_key[0][:60]}")
+                    return self._entries[best_key]["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, version: str, answer: str, embedding: list[float] | None = None):
+        key = (normalize_question(question), version)
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "embedding": embedding,
+                "created": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"kayit": len(self._entries), "hit": self.hits, "miss": self.misses}
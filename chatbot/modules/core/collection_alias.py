@@ -0,0 +1,143 @@
+"""
+Sürümlü Collection'lar ve Alias Geçişi (blue/green)
+===================================================
+Yeniden indeksleme canlı collection'ı silmek yerine yeni bir sürüme yazar:
+    arabam_ilanlar            → alias (semantic_search bu adı okur)
+    arabam_ilanlar_v20260101… → gerçek collection'lar
+
+Yeni sürüm doğrulandıktan sonra alias tek bir `update_collection_aliases`
+çağrısıyla (atomik) yeni sürüme çevrilir; eski sürümler temizlenir.
+
+Alias öncesi kurulumdan geçiş: alias adında gerçek bir collection varsa Qdrant aynı
+adla alias oluşturmaz; önce collection silinmelidir ve bu iki adım atomik yapılamaz
+(arada arama boş döner). Bu yüzden geçiş ancak `allow_outage=True` ile yapılır.
+
+Ortam değişkenleri:
+    INDEX_KEEP_VERSIONS   geri dönüş için saklanan önceki sürüm sayısı (varsayılan: 1)
+"""
+
+import os
+import time
+
+from qdrant_client.models import (
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+    PayloadSchemaType, VectorParams, Distance,
+)
+
+from logger import get_logger
+
+log = get_logger("coll_alias")
+
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "1"))
+
+# Alias eski bir collection'dan kopyalanamazsa semantic_search filtreleri için varsayılan indeksler
+DEFAULT_PAYLOAD_INDEXES = {
+    "marka": PayloadSchemaType.KEYWORD,
+    "yakit_tipi": PayloadSchemaType.KEYWORD,
+    "fiyat": PayloadSchemaType.INTEGER,
+    "yil": PayloadSchemaType.INTEGER,
+}
+
+
+def version_name(alias: str) -> str:
+    """Yeni sürüm adı: <alias>_v<YYYYmmddHHMMSS> (ada göre sıralama = zamana göre sıralama)."""
+    return f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def is_version_of(alias: str, collection: str) -> bool:
+    suffix = collection.removeprefix(f"{alias}_v")
+    return suffix != collection and suffix.isdigit()
+
+
+def alias_target(client, alias: str) -> str | None:
+    """Alias'ın gösterdiği collection (alias yoksa None)."""
+    for item in client.get_aliases().aliases:
+        if item.alias_name == alias:
+            return item.collection_name
+    return None
+
+
+def resolve(client, alias: str) -> str:
+    """Okuma/yazma yapılacak gerçek collection: alias hedefi ya da (eski kurulumda) aynı adlı collection."""
+    return alias_target(client, alias) or alias
+
+
+def list_versions(client, alias: str) -> list[str]:
+    """Alias'a ait sürüm collection'ları, eskiden yeniye."""
+    names = [c.name for c in client.get_collections().collections]
+    return sorted(n for n in names if is_version_of(alias, n))
+
+
+def create_version(client, alias: str, name: str, dim: int):
+    """Yeni sürümü oluşturur. Canlı collection varsa vektör ayarları ve payload indeksleri ondan kopyalanır."""
+    source = resolve(client, alias)
+    vectors = VectorParams(size=dim, distance=Distance.COSINE)
+    indexes = dict(DEFAULT_PAYLOAD_INDEXES)
+    if client.collection_exists(source):
+        info = client.get_collection(source)
+        live = info.config.params.vectors
+        if getattr(live, "size", None) == dim:
+            vectors = live
+        indexes = {field: schema.data_type for field, schema in (info.payload_schema or {}).items()} or indexes
+
+    client.create_collection(collection_name=name, vectors_config=vectors)
+    for field, schema in indexes.items():
+        client.create_payload_index(collection_name=name, field_name=field, field_schema=schema)
+    log.info(f"📦 Yeni sürüm oluşturuldu: {name} ({dim} boyut, {len(indexes)} payload indeksi)")
+
+
+def is_legacy_collection(client, alias: str) -> bool:
+    """Alias adında gerçek bir collection var mı (alias öncesi kurulum)."""
+    return alias_target(client, alias) is None and client.collection_exists(alias)
+
+
+def switch_alias(client, alias: str, target: str, allow_outage: bool = False):
+    """Alias'ı `target`'a atomik olarak çevirir.
+
+    Alias ile aynı adda gerçek bir collection varsa (alias öncesi kurulum) geçiş için
+    önce o silinmelidir; silme ile alias oluşturma arasında arama boş döner. Bu kesinti
+    `allow_outage=True` verilmedikçe yapılmaz, RuntimeError fırlatılır.
+    """
+    previous = alias_target(client, alias)
+    if previous is None and client.collection_exists(alias):
+        if not allow_outage:
+            raise RuntimeError(
+                f"{alias} alias değil gerçek bir collection; alias'a geçiş için silinmesi gerekiyor "
+                f"ve bu sırada arama kesilir. Kesintiyi kabul ediyorsanız allow_outage=True verin."
+            )
+        log.warning(f"⚠️ {alias} alias değil gerçek bir collection; alias'a geçiş için siliniyor "
+                    f"(alias oluşturulana kadar arama boş döner)")
+        client.delete_collection(alias)
+
+    operations = []
+    if previous is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    log.info(f"🔀 Alias {alias}: {previous or '-'} → {target}")
+
+
+def previous_version(client, alias: str) -> str | None:
+    """Canlı sürümden bir önceki sürüm (geri dönüş için)."""
+    current = alias_target(client, alias)
+    older = [v for v in list_versions(client, alias) if current is None or v < current]
+    return older[-1] if older else None
+
+
+def gc_versions(client, alias: str, keep: int = KEEP_VERSIONS) -> list[str]:
+    """Canlı sürüm ve ondan önceki en yeni `keep` sürüm dışındakileri siler.
+
+    Canlıdan yeni olup alias'a hiç geçmemiş sürümler (doğrulamadan geçemeyen ya da
+    yarıda bırakılan yeniden indekslemeler) de silinir.
+    """
+    current = alias_target(client, alias)
+    if current is None:
+        return []
+    versions = list_versions(client, alias)
+    older = [v for v in versions if v < current]
+    kept = set(older[-keep:]) if keep > 0 else set()
+    removed = [v for v in versions if v != current and v not in kept]
+    for name in removed:
+        client.delete_collection(name)
+        log.info(f"🗑️ Eski sürüm silindi: {name}")
+    return removed
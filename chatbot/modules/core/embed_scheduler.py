@@ -0,0 +1,173 @@
+"""
+Embedding Zamanlayıcı — Token Bucket + AIMD
+============================================
+Embedding isteklerini sınırlı eşzamanlılıkla ve uyarlanır hız sınırıyla gönderir.
+- Token bucket: saniyedeki istek sayısı `rate` ile sınırlanır
+- AIMD: her başarılı istekte hız yavaşça artar (additive increase),
+  429 / kota hatasında yarıya iner (multiplicative decrease)
+- Canlı throughput (metin/sn) ve hata sayaçları periyodik loglanır
+
+Sabit `time.sleep` yerine kotanın izin verdiği en yüksek hızda çalışmayı hedefler.
+Embed fonksiyonu senkron olabilir; thread'de çalıştırılır.
+
+Ortam değişkenleri:
+    EMBED_CONCURRENCY     eşzamanlı istek üst sınırı (varsayılan: 4)
+    EMBED_RATE            başlangıç hızı, istek/sn (varsayılan: 2)
+    EMBED_MAX_RATE        hız üst sınırı, istek/sn (varsayılan: 20)
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Callable
+
+from logger import get_logger
+
+log = get_logger("embed_sched")
+
+CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+START_RATE = float(os.getenv("EMBED_RATE", "2"))
+MAX_RATE = float(os.getenv("EMBED_MAX_RATE", "20"))
+MIN_RATE = 0.2
+MAX_RETRIES = 6
+REPORT_EVERY_SEC = 10.0
+
+_RATE_LIMIT_MARKERS = ("429", "resource_exhausted", "resourceexhausted", "quota", "rate limit", "too many requests")
+
+
+def is_rate_limit(error: BaseException) -> bool:
+    """429 / kota aşımı hatası mı? (SDK'ya bağımlı olmamak için ad + mesaj kontrolü)"""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _RATE_LIMIT_MARKERS)
+
+
+class TokenBucket:
+    """Saniyede `rate` token dolan, en fazla `capacity` token biriktiren kova."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def set_rate(self, rate: float):
+        self._refill()
+        self.rate = rate
+
+
+class EmbedScheduler:
+    """Metin parçalarını eşzamanlı, hız sınırlı ve 429'a uyarlanarak embed eder."""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[list[str]], list[list[float]]],
+        concurrency: int = CONCURRENCY,
+        rate: float = START_RATE,
+        max_rate: float = MAX_RATE,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+    ):
+        self.embed_fn = embed_fn
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._bucket = TokenBucket(rate, capacity=max(1.0, float(concurrency)))
+        self._slots = asyncio.Semaphore(concurrency)
+        self._stats = {"istek": 0, "metin": 0, "hiz_siniri": 0, "hata": 0, "basarisiz_parca": 0}
+        self._started = time.monotonic()
+        self._last_report = self._started
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def _on_success(self, n_texts: int):
+        self._stats["istek"] += 1
+        self._stats["metin"] += n_texts
+        # Additive increase: saniyede yaklaşık `increase` istek/sn artış
+        self._bucket.set_rate(min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0)))
+        self._maybe_report()
+
+    def _on_rate_limit(self):
+        self._stats["hiz_siniri"] += 1
+        new_rate = max(MIN_RATE, self.rate * self.decrease)
+        if new_rate < self.rate:
+            log.warning(f"⏳ Hız sınırı: {self.rate:.2f} → {new_rate:.2f} istek/sn")
+        self._bucket.set_rate(new_rate)
+
+    def _maybe_report(self):
+        now = time.monotonic()
+        if now - self._last_report >= REPORT_EVERY_SEC:
+            self._last_report = now
+            s = self.stats()
+            log.info(f"⚡ {s['metin_sn']} metin/sn, hız {s['hiz']} istek/sn, "
+                     f"{s['metin']} metin, {s['hiz_siniri']} hız sınırı, {s['hata']} hata")
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """Tek parçayı embed eder; hız sınırında ve geçici hatalarda üstel bekleme ile tekrar dener."""
+        for attempt in range(MAX_RETRIES):
+            await self._bucket.acquire()
+            # Slot sadece API çağrısı süresince tutulur; bekleme slot dışında yapılır
+            async with self._slots:
+                try:
+                    vectors = await asyncio.to_thread(self.embed_fn, texts)
+                except Exception as e:
+                    error = e
+                else:
+                    error = None
+            if error is None:
+                self._on_success(len(texts))
+                return vectors
+
+            if is_rate_limit(error):
+                self._on_rate_limit()
+            else:
+                self._stats["hata"] += 1
+                log.error(f"Embedding hatası (deneme {attempt + 1}/{MAX_RETRIES}): {error}")
+            if attempt == MAX_RETRIES - 1:
+                raise error
+            await asyncio.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random()))
+        raise RuntimeError("unreachable")
+
+    async def embed_many(self, texts: list[str], batch_size: int) -> list[list[float] | None]:
+        """Metinleri `batch_size`'lık parçalar hâlinde eşzamanlı embed eder; sıra korunur.
+
+        Tüm denemeleri başarısız olan parçanın vektörleri None döner.
+        """
+        chunks = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        results = await asyncio.gather(*(self.embed(c) for c in chunks), return_exceptions=True)
+
+        vectors: list[list[float] | None] = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, BaseException):
+                self._stats["basarisiz_parca"] += 1
+                log.error(f"Embedding parçası başarısız ({len(chunk)} metin): {result}")
+                vectors.extend([None] * len(chunk))
+            else:
+                vectors.extend(result)
+        return vectors
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {
+            **self._stats,
+            "hiz": round(self.rate, 2),
+            "metin_sn": round(self._stats["metin"] / elapsed, 1),
+            "sure_sn": round(elapsed, 1),
+        }
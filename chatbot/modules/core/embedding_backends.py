@@ -0,0 +1,210 @@
+"""
+Embedding Arka Uçları
+=====================
+Metin → vektör dönüşümü için takılabilir arka uçlar:
+  - gemini  : Gemini Embedding API (ağ gerekir, ücretli) — varsayılan
+  - hashed  : karakter n-gram + kelime hashing (saf numpy, ağsız, çok hızlı)
+  - onnx    : yerel ONNX cümle modeli (onnxruntime + tokenizers gerekir, opsiyonel)
+
+Arka uç collection bazında seçilir; aynı collection'ı indeksleyen ve sorgulayan
+her yer aynı arka ucu kullanmalıdır (vektör uzayları birbirine karışmaz).
+
+Ortam değişkenleri:
+    EMBED_BACKEND     varsayılan arka uç tanımı (varsayılan: "gemini")
+    EMBED_BACKENDS    collection bazlı tanımlar, örn. "arabam_ilanlar=gemini,arabam_yerel=hashed:512"
+
+Tanım biçimi: "<tür>[:<parametre>]"
+    gemini[:<model>]      örn. gemini:models/gemini-embedding-001
+    hashed[:<boyut>]      örn. hashed:512
+    onnx:<model_dizini>   dizinde model.onnx + tokenizer.json
+"""
+
+import os
+import re
+import unicodedata
+import zlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from logger import get_logger
+
+log = get_logger("embed_backend")
+
+DEFAULT_SPEC = os.getenv("EMBED_BACKEND", "gemini")
+GEMINI_DEFAULT_MODEL = "models/gemini-embedding-001"
+
+
+class EmbeddingBackend(ABC):
+    """Ortak arayüz. `name` embedding deposu ve metin özetlerinde model kimliği olarak kullanılır."""
+
+    name: str = ""
+    dim: int | None = None      # bilinmiyorsa ilk embed'de belirlenir
+    remote: bool = False        # ağ/kota kısıtı var mı (hız sınırlayıcı gerekir)
+    cacheable: bool = False     # sonuçları diske saklamaya değer mi
+    batch_size: int = 64        # tek çağrıdaki metin sayısı
+
+    @abstractmethod
+    def embed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        """Metinleri sırayla vektörleştirir; `task_type` "retrieval_document" / "retrieval_query"."""
+
+
+# ─────────────── Gemini ───────────────
+
+class GeminiBackend(EmbeddingBackend):
+    remote = True
+    cacheable = True
+    batch_size = 20
+
+    def __init__(self, model: str = GEMINI_DEFAULT_MODEL):
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.model = model
+        self.name = model
+
+    def embed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        import genai_replay
+
+        result = genai_replay.embed_content(model=self.model, content=texts, task_type=task_type)
+        vectors = result["embedding"]
+        self.dim = self.dim or len(vectors[0])
+        return vectors
+
+
+# ─────────────── Hashed n-gram ───────────────
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _normalize(text: str) -> str:
+    """Türkçe küçük harf + aksan sadeleştirme (ı/i, ş/s ... aynı kovaya düşer)."""
+    text = text.replace("I", "ı").replace("İ", "i").lower()
+    text = unicodedata.normalize("NFKD", text.replace("ı", "i"))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+class HashedNgramBackend(EmbeddingBackend):
+    """Kelime + karakter n-gram'larının işaretli hashing hilesiyle sabit boyutlu vektöre indirgenmesi.
+
+    Model dosyası gerektirmez, deterministiktir; TF log-ölçekli, vektörler L2 normalize edilir.
+    Görev tipi (sorgu/doküman) farkı yoktur.
+    """
+
+    batch_size = 512
+
+    def __init__(self, dim: int = 512, ngram_range: tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.name = f"hashed-{dim}-{ngram_range[0]}{ngram_range[1]}-v1"
+
+    def _features(self, text: str) -> list[bytes]:
+        words = _TOKEN.findall(_normalize(text))
+        feats = [b"w:" + w.encode("utf-8") for w in words]
+        lo, hi = self.ngram_range
+        for w in words:
+            padded = f"<{w}>".encode("utf-8")
+            for n in range(lo, hi + 1):
+                feats.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return feats
+
+    def embed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        rows, cols, signs = [], [], []
+        for r, text in enumerate(texts):
+            for feat in self._features(text):
+                h = zlib.crc32(feat)
+                rows.append(r)
+                cols.append(h % self.dim)
+                signs.append(1.0 if (h >> 31) & 1 else -1.0)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            np.add.at(matrix, (np.asarray(rows), np.asarray(cols)), np.asarray(signs, dtype=np.float32))
+        # Alt-doğrusal TF (işaret korunur), sonra L2 normalize
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix.tolist()
+
+
+# ─────────────── ONNX (opsiyonel) ───────────────
+
+class OnnxBackend(EmbeddingBackend):
+    """Yerel ONNX cümle modeli (örn. multilingual-e5-small'un quantize edilmiş hâli).
+
+    E5 tarzı modeller için sorgu/doküman önekleri ("query: " / "passage: ") eklenir;
+    çıktı mean pooling + L2 normalize.
+    """
+
+    cacheable = True
+    batch_size = 32
+
+    def __init__(self, model_dir: str, max_length: int = 256):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError("onnx arka ucu için 'onnxruntime' ve 'tokenizers' kurulu olmalı") from e
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("ONNX_THREADS", str(os.cpu_count() or 1)))
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.name = f"onnx:{os.path.basename(os.path.normpath(model_dir))}"
+
+    def embed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        prefix = "query: " if "query" in task_type.lower() else "passage: "
+        encodings = self.tokenizer.encode_batch([prefix + t for t in texts])
+        ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+
+        hidden = self.session.run(None, feeds)[0]  # (batch, seq, dim)
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        self.dim = pooled.shape[1]
+        return pooled.tolist()
+
+
+# ─────────────── Seçim ───────────────
+
+def create_backend(spec: str) -> EmbeddingBackend:
+    kind, _, arg = spec.strip().partition(":")
+    kind = kind.lower()
+    if kind == "gemini":
+        return GeminiBackend(arg or GEMINI_DEFAULT_MODEL)
+    if kind == "hashed":
+        return HashedNgramBackend(int(arg) if arg else 512)
+    if kind == "onnx":
+        if not arg:
+            raise ValueError("onnx arka ucu için model dizini gerekli: onnx:/yol/model")
+        return OnnxBackend(arg)
+    raise ValueError(f"Bilinmeyen embedding arka ucu: {spec}")
+
+
+def _collection_specs() -> dict[str, str]:
+    specs = {}
+    for item in os.getenv("EMBED_BACKENDS", "").split(","):
+        collection, sep, spec = item.partition("=")
+        if sep and collection.strip():
+            specs[collection.strip()] = spec.strip()
+    return specs
+
+
+_backends: dict[str, EmbeddingBackend] = {}
+
+
+def backend_for(collection: str) -> EmbeddingBackend:
+    """Collection için yapılandırılmış arka uç (süreç boyunca tek örnek)."""
+    spec = _collection_specs().get(collection, DEFAULT_SPEC)
+    if spec not in _backends:
+        _backends[spec] = create_backend(spec)
+        log.info(f"Embedding arka ucu: {collection} → {_backends[spec].name}")
+    return _backends[spec]
@@ -0,0 +1,181 @@
+"""
+İçerik Adresli Embedding Deposu (disk)
+======================================
+Üretilen embedding'leri yerelde saklar; aynı (model, görev tipi, metin) için
+Gemini tekrar çağrılmaz. Collection'ı sıfırdan kurmak, metinler değişmediyse
+hiç API çağrısı gerektirmez.
+
+Yapı:
+  - vectors_<dim>.f32 : yalnızca sona eklenen ham float32 vektör dosyası (memmap ile okunur)
+  - index.sqlite3     : sha256(model, task_type, metin) → (boyut, satır) indeksi
+
+Birden fazla süreç (MCP Server, indeksleyici, Streamlit) aynı dizini kullanabilir;
+dosyaya ekleme `flock` ile sıralanır.
+
+Ortam değişkenleri:
+    EMBED_STORE_DIR       depo dizini (varsayılan: /app/cache/embeddings)
+    EMBED_STORE_ENABLED   0 ise depo devre dışı (varsayılan: 1)
+"""
+
+import fcntl
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from logger import get_logger
+
+log = get_logger("embed_store")
+
+STORE_DIR = os.getenv("EMBED_STORE_DIR", "/app/cache/embeddings")
+ENABLED = os.getenv("EMBED_STORE_ENABLED", "1") == "1"
+
+
+def content_key(model: str, task_type: str, text: str) -> str:
+    """Model adı ("models/" öneki olmadan), görev tipi (küçük harf) ve metnin özeti."""
+    model = model.removeprefix("models/")
+    return hashlib.sha256(f"{model}\0{task_type.lower()}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Append-only memmap vektör dosyaları + SQLite anahtar indeksi."""
+
+    def __init__(self, directory: str = STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"),
+                                     check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        self._maps: dict[int, np.memmap] = {}
+        self._hits = 0
+        self._misses = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    dim INTEGER NOT NULL,
+                    row INTEGER NOT NULL
+                )
+            """)
+            self._conn.commit()
+
+    def _path(self, dim: int) -> str:
+        return os.path.join(self.directory, f"vectors_{dim}.f32")
+
+    def _matrix(self, dim: int, min_rows: int) -> np.memmap:
+        """`min_rows` satırı kapsayan memmap; dosya büyüdüyse yeniden eşlenir."""
+        mm = self._maps.get(dim)
+        if mm is None or mm.shape[0] < min_rows:
+            rows = os.path.getsize(self._path(dim)) // (dim * 4)
+            mm = np.memmap(self._path(dim), dtype=np.float32, mode="r", shape=(rows, dim))
+            self._maps[dim] = mm
+        return mm
+
+    def get_many(self, model: str, task_type: str, texts: list[str]) -> list[list[float] | None]:
+        """Her metin için saklı vektörü (yoksa None) döner; sıra korunur."""
+        keys = [content_key(model, task_type, t) for t in texts]
+        found: dict[str, tuple[int, int]] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, dim, row FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update((k, (d, r)) for k, d, r in rows)
+
+            vectors = []
+            for key in keys:
+                if key not in found:
+                    vectors.append(None)
+                    continue
+                dim, row = found[key]
+                vectors.append(self._matrix(dim, row + 1)[row].tolist())
+
+        hits = len(found)
+        self._hits += hits
+        self._misses += len(keys) - hits
+        return vectors
+
+    def put_many(self, model: str, task_type: str, texts: list[str], vectors: list[list[float]]):
+        """Vektörleri dosyanın sonuna ekleyip indekse yazar. Zaten var olanlar atlanır."""
+        if not texts:
+            return
+        by_dim: dict[int, list[tuple[str, list[float]]]] = {}
+        for text, vector in zip(texts, vectors):
+            if vector is not None:
+                by_dim.setdefault(len(vector), []).append((content_key(model, task_type, text), vector))
+
+        with self._lock:
+            for dim, items in by_dim.items():
+                existing = {
+                    k for (k,) in self._conn.execute(
+                        f"SELECT key FROM embeddings WHERE key IN ({','.join('?' * len(items))})",
+                        [k for k, _ in items],
+                    )
+                }
+                new = list({k: v for k, v in items if k not in existing}.items())
+                if not new:
+                    continue
+                data = np.asarray([v for _, v in new], dtype=np.float32)
+                with open(self._path(dim), "ab") as f:
+                    # Diğer süreçlerle aynı anda eklemeyi önle; satır numarası kilit altında belirlenir
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    try:
+                        f.seek(0, os.SEEK_END)
+                        start_row = f.tell() // (dim * 4)
+                        f.write(data.tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                    finally:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, dim, row) VALUES (?, ?, ?)",
+                    [(k, dim, start_row + i) for i, (k, _) in enumerate(new)],
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        total = self._hits + self._misses
+        return {
+            "kayit": count,
+            "isabet": self._hits,
+            "iskalama": self._misses,
+            "isabet_orani": round(self._hits / total, 3) if total else 0.0,
+        }
+
+
+def embed_with_store(model: str, task_type: str, texts: list[str], embed_fn) -> list[list[float]]:
+    """Depoda olmayan metinleri `embed_fn(texts)` ile embed edip depoya yazar (senkron)."""
+    store = get_embedding_store()
+    if store is None:
+        return embed_fn(texts)
+    vectors = store.get_many(model, task_type, texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = embed_fn([texts[i] for i in missing])
+        store.put_many(model, task_type, [texts[i] for i in missing], fresh)
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+    return vectors
+
+
+_store: EmbeddingStore | None = None
+_store_failed = False
+
+
+def get_embedding_store() -> EmbeddingStore | None:
+    """Süreç genelinde tek depo; devre dışıysa veya açılamazsa None."""
+    global _store, _store_failed
+    if _store is None and ENABLED and not _store_failed:
+        try:
+            _store = EmbeddingStore()
+        except Exception as e:
+            _store_failed = True
+            log.warning(f"Embedding deposu açılamadı, devre dışı: {e}")
+    return _store
@@ -0,0 +1,203 @@
+"""
+Gemini Kayıt / Tekrar Oynatma Katmanı
+=====================================
+Generate, embed ve vision çağrılarını saran ince katman.
+- off    : doğrudan API çağrısı (varsayılan)
+- record : API çağrılır, istek + cevap + gecikme diske yazılır
+- replay : cevap diskten okunur, ağ kullanılmaz; gecikme simüle edilir
+
+Ortam değişkenleri:
+    GENAI_REPLAY_MODE      off | record | replay
+    GENAI_REPLAY_DIR       kayıt dizini (varsayılan: /app/replay)
+    GENAI_REPLAY_LATENCY   "recorded" (kayıttaki süre) veya sabit milisaniye, örn. "250"
+
+Anahtar, isteğin kanonik JSON'unun SHA-256 özetidir; görsel baytları
+kendi özetleriyle temsil edilir.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import google.generativeai as genai
+
+from logger import get_logger
+
+log = get_logger("replay")
+
+MODE = os.getenv("GENAI_REPLAY_MODE", "off").lower()
+REPLAY_DIR = os.getenv("GENAI_REPLAY_DIR", "/app/replay")
+LATENCY = os.getenv("GENAI_REPLAY_LATENCY", "recorded")
+
+
+class ReplayMissError(KeyError):
+    """Replay modunda kaydı olmayan bir istek geldi."""
+
+
+# ─────────────── ANAHTAR + DEPOLAMA ───────────────
+
+def _canonical(obj):
+    """İsteği deterministik, JSON'a çevrilebilir bir yapıya indirger."""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return {"__bytes__": hashlib.sha256(bytes(obj)).hexdigest(), "len": len(obj)}
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if hasattr(obj, "model_dump"):  # google-genai pydantic tipleri
+        return _canonical(obj.model_dump(exclude_none=True))
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    return repr(obj)
+
+
+def request_key(kind: str, request: dict) -> str:
+    raw = json.dumps({"kind": kind, "request": _canonical(request)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _path(kind: str, key: str) -> str:
+    return os.path.join(REPLAY_DIR, kind, key[:2], f"{key}.json")
+
+
+def _save(kind: str, key: str, request: dict, response, latency_ms: float):
+    path = _path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    record = {
+        "kind": kind,
+        "request": _canonical(request),
+        "response": response,
+        "latency_ms": round(latency_ms, 1),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _load(kind: str, key: str) -> dict:
+    path = _path(kind, key)
+    if not os.path.exists(path):
+        raise ReplayMissError(f"Replay kaydı yok ({kind}): {key[:12]}")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _delay_sec(record: dict) -> float:
+    if LATENCY == "recorded":
+        return record.get("latency_ms", 0.0) / 1000
+    try:
+        return float(LATENCY) / 1000
+    except ValueError:
+        return 0.0
+
+
+def _call(kind: str, request: dict, fn, dump, restore):
+    """Senkron çağrıyı mod'a göre çalıştırır / kaydeder / oynatır."""
+    if MODE == "off":
+        return fn()
+    key = request_key(kind, request)
+    if MODE == "replay":
+        record = _load(kind, key)
+        time.sleep(_delay_sec(record))
+        return restore(record["response"])
+    start = time.perf_counter()
+    response = fn()
+    _save(kind, key, request, dump(response), (time.perf_counter() - start) * 1000)
+    return response
+
+
+async def _acall(kind: str, request: dict, fn, dump, restore):
+    """Async çağrının `_call` karşılığı."""
+    if MODE == "off":
+        return await fn()
+    key = request_key(kind, request)
+    if MODE == "replay":
+        record = _load(kind, key)
+        await asyncio.sleep(_delay_sec(record))
+        return restore(record["response"])
+    start = time.perf_counter()
+    response = await fn()
+    _save(kind, key, request, dump(response), (time.perf_counter() - start) * 1000)
+    return response
+
+
+# ─────────────── google.generativeai (eski SDK) ───────────────
+
+def embed_content(**kwargs) -> dict:
+    """`genai.embed_content` yerine geçer."""
+    return _call(
+        "embed", kwargs,
+        lambda: genai.embed_content(**kwargs),
+        dump=lambda r: {"embedding": r["embedding"]},
+        restore=lambda d: d,
+    )
+
+
+def generate_content(model, contents, kind: str = "generate"):
+    """`GenerativeModel.generate_content` yerine geçer; dönen nesnede sadece `.text` vardır."""
+    request = {"model": model.model_name, "system": getattr(model, "_system_instruction", None),
+               "contents": contents}
+    return _call(
+        kind, request,
+        lambda: model.generate_content(contents),
+        dump=lambda r: {"text": r.text},
+        restore=lambda d: SimpleNamespace(text=d["text"]),
+    )
+
+
+def send_message(chat, content):
+    """`ChatSession.send_message` yerine geçer (anahtar chat geçmişini de içerir)."""
+    request = {"model": chat.model.model_name,
+               "history": [{"role": c.role, "parts": [str(p) for p in c.parts]} for c in chat.history],
+               "content": content}
+
+    def restore(d):
+        # Gerçek çağrı gibi kullanıcı ve model turlarını geçmişe ekle; yoksa sonraki turun
+        # anahtarı kayıttakinden farklı olur
+        from google.generativeai.types import content_types
+
+        user_turn = content_types.to_content(content)
+        if not user_turn.role:
+            user_turn.role = "user"
+        model_turn = genai.protos.Content(role="model", parts=[genai.protos.Part(text=d["text"])])
+        chat.history = [*chat.history, user_turn, model_turn]
+        return SimpleNamespace(text=d["text"])
+
+    return _call(
+        "chat", request,
+        lambda: chat.send_message(content),
+        dump=lambda r: {"text": r.text},
+        restore=restore,
+    )
+
+
+# ─────────────── google.genai (yeni SDK, async) ───────────────
+
+async def aio_generate_content(client, model: str, contents, config=None):
+    """`client.aio.models.generate_content` yerine geçer."""
+    from google.genai import types
+
+    return await _acall(
+        "aio_generate", {"model": model, "contents": contents, "config": config},
+        lambda: client.aio.models.generate_content(model=model, contents=contents, config=config),
+        dump=lambda r: r.model_dump(mode="json", exclude_none=True),
+        restore=types.GenerateContentResponse.model_validate,
+    )
+
+
+async def aio_embed_content(client, model: str, contents, config=None):
+    """`client.aio.models.embed_content` yerine geçer."""
+    from google.genai import types
+
+    return await _acall(
+        "aio_embed", {"model": model, "contents": contents, "config": config},
+        lambda: client.aio.models.embed_content(model=model, contents=contents, config=config),
+        dump=lambda r: r.model_dump(mode="json", exclude_none=True),
+        restore=types.EmbedContentResponse.model_validate,
+    )
@@ -0,0 +1,131 @@
+"""
+MCP Session Havuzu
+==================
+MCP Server'a açık tutulan SSE oturumlarından oluşan süreç genelinde havuz.
+- Tüm oturumlar tek bir arka plan event loop'unda (daemon thread) yaşar
+- Her bağlantıyı kendi "keeper" task'ı açar ve kapatır (anyio cancel scope kuralı)
+- Bozulan oturumlar atılır, bir sonraki istekte yenisi açılır
+Senkron kod (Streamlit) coroutine'leri `run()` / `submit()` ile havuz loop'una gönderir.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from contextlib import asynccontextmanager
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+from logger import get_logger
+
+log = get_logger("mcp_pool")
+
+
+class MCPSessionPool:
+    """Sabit üst sınırlı, tembel açılan MCP ClientSession havuzu."""
+
+    def __init__(self, sse_url: str, size: int = 4, connect_timeout: float = 10.0):
+        self.sse_url = sse_url
+        self.size = size
+        self.connect_timeout = connect_timeout
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._idle: asyncio.Queue | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._tools = None
+
+    # ── Loop yönetimi ──
+
+    def start(self):
+        """Arka plan event loop'unu başlatır (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-pool", daemon=True)
+        self._thread.start()
+        log.info(f"MCP havuzu başlatıldı (boyut={self.size}): {self.sse_url}")
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Coroutine'i havuz loop'unda çalıştırır, thread-safe Future döner."""
+        if self._loop is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout: float | None = None):
+        """Senkron koddan coroutine çalıştırıp sonucunu bekler."""
+        return self.submit(coro).result(timeout)
+
+    # ── Bağlantılar ──
+
+    async def _keeper(self, ready: asyncio.Future, closed: asyncio.Event):
+        """Tek bir SSE bağlantısını açık tutar; `closed` set edilince kapatır."""
+        try:
+            async with sse_client(self.sse_url) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    ready.set_result(session)
+                    await closed.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                log.warning(f"MCP bağlantısı koptu: {e}")
+
+    async def _open(self) -> dict:
+        ready = asyncio.get_running_loop().create_future()
+        closed = asyncio.Event()
+        task = asyncio.create_task(self._keeper(ready, closed))
+        try:
+            session = await asyncio.wait_for(ready, self.connect_timeout)
+        except Exception:
+            closed.set()
+            task.cancel()
+            raise
+        log.info("MCP session açıldı")
+        return {"session": session, "closed": closed, "task": task}
+
+    @staticmethod
+    def _discard(entry: dict):
+        entry["closed"].set()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Havuzdan bir ClientSession ödünç alır; hata olursa oturum atılır."""
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            entry = None
+            while not self._idle.empty():
+                candidate = self._idle.get_nowait()
+                if candidate["task"].done():
+                    continue
+                entry = candidate
+                break
+            if entry is None:
+                entry = await self._open()
+
+            try:
+                yield entry["session"]
+            except BaseException:
+                self._discard(entry)
+                raise
+            else:
+                self._idle.put_nowait(entry)
+
+    async def call_tool(self, name: str, arguments: dict):
+        async with self.acquire() as session:
+            return await session.call_tool(name, arguments)
+
+    async def list_tools(self) -> list:
+        """Sunucudaki tool tanımları (ilk çağrıdan sonra önbellekten)."""
+        if self._tools is None:
+            async with self.acquire() as session:
+                result = await session.list_tools()
+                self._tools = result.tools
+        return self._tools
+
+    async def close(self):
+        while self._idle is not None and not self._idle.empty():
+            self._discard(self._idle.get_nowait())
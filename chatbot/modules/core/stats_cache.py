@@ -0,0 +1,76 @@
+"""
+Arka Plan İstatistik Önbelleği
+==============================
+Sidebar istatistiklerini süreç genelinde tutar.
+Ayrı bir daemon thread kendi event loop'unda belirli aralıklarla yeniler;
+okuyucular (Streamlit oturumları) hiçbir zaman ağ çağrısı beklemez.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable
+
+from logger import get_logger
+
+log = get_logger("stats")
+
+
+class StatsCache:
+    """Son başarılı istatistik anlık görüntüsünü tutan, arka planda yenilenen önbellek."""
+
+    def __init__(self, fetch: Callable[[], Awaitable[dict]], interval_sec: float = 300.0,
+                 retry_sec: float = 15.0):
+        self._fetch = fetch
+        self.interval_sec = interval_sec
+        self.retry_sec = retry_sec
+        self._data: dict = {}
+        self._updated_at: float | None = None
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Yenileme thread'ini başlatır (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="stats-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self) -> dict:
+        """Son anlık görüntüyü döner; henüz yüklenmediyse boş dict."""
+        with self._lock:
+            return dict(self._data)
+
+    @property
+    def age_sec(self) -> float | None:
+        with self._lock:
+            return None if self._updated_at is None else time.monotonic() - self._updated_at
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            while not self._stop.is_set():
+                ok = loop.run_until_complete(self._refresh())
+                self._stop.wait(self.interval_sec if ok else self.retry_sec)
+        finally:
+            loop.close()
+
+    async def _refresh(self) -> bool:
+        start = time.perf_counter()
+        try:
+            data = await self._fetch()
+        except Exception as e:
+            log.error(f"İstatistik yenileme hatası: {e}")
+            return False
+        if not data or "hata" in data:
+            # Önceki iyi veriyi koru, kısa süre sonra tekrar dene
+            return False
+        with self._lock:
+            self._data = data
+            self._updated_at = time.monotonic()
+        log.info(f"İstatistikler yenilendi ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return True
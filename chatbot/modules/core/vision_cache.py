@@ -0,0 +1,141 @@
+"""
+Görsel Analiz Önbelleği (disk)
+==============================
+Gemini Vision analiz sonuçlarını SQLite dosyasında saklar.
+- Anahtar: URL'deki ilan numarası + seçilen görsellerin içerik özeti
+- Fotoğraflar değişmedikçe aynı ilan tekrar analiz edilmez
+- TTL ve toplam boyut sınırı ile eski/az kullanılan kayıtlar silinir
+
+Ortam değişkenleri:
+    VISION_CACHE_PATH        SQLite dosyası (varsayılan: /app/cache/vision.sqlite3)
+    VISION_CACHE_TTL_SEC     kayıt ömrü (varsayılan: 7 gün)
+    VISION_CACHE_MAX_MB      toplam boyut sınırı (varsayılan: 200 MB)
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from logger import get_logger
+
+log = get_logger("vis_cache")
+
+CACHE_PATH = os.getenv("VISION_CACHE_PATH", "/app/cache/vision.sqlite3")
+TTL_SEC = float(os.getenv("VISION_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+MAX_BYTES = int(float(os.getenv("VISION_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+_LISTING_ID = re.compile(r"/(\d{5,})(?:[/?#]|$)")
+
+
+def listing_id_from_url(url: str) -> str:
+    """arabam.com URL'sinden ilan numarasını çıkarır; bulunamazsa URL özeti döner."""
+    m = _LISTING_ID.search(url)
+    if m:
+        return m.group(1)
+    return "url:" + hashlib.sha1(url.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+def images_hash(images: list[dict]) -> str:
+    """Görsel baytlarının sıradan bağımsız içerik özeti."""
+    digests = sorted(hashlib.sha256(img["data"]).hexdigest() for img in images)
+    return hashlib.sha256("|".join(digests).encode("ascii")).hexdigest()
+
+
+class VisionCache:
+    """SQLite tabanlı, TTL + boyut sınırlı analiz önbelleği."""
+
+    def __init__(self, path: str = CACHE_PATH, ttl_sec: float = TTL_SEC, max_bytes: int = MAX_BYTES):
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS analizler (
+                    listing_id  TEXT NOT NULL,
+                    images_hash TEXT NOT NULL,
+                    result      TEXT NOT NULL,
+                    size        INTEGER NOT NULL,
+                    created     REAL NOT NULL,
+                    accessed    REAL NOT NULL,
+                    PRIMARY KEY (listing_id, images_hash)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON analizler (accessed)")
+            self._conn.commit()
+
+    def get(self, listing_id: str, img_hash: str) -> dict | None:
+        """Aynı ilan + aynı fotoğraflar için geçerli kaydı döner."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created FROM analizler WHERE listing_id = ? AND images_hash = ?",
+                (listing_id, img_hash),
+            ).fetchone()
+            if not row or now - row[1] > self.ttl_sec:
+                return None
+            self._conn.execute(
+                "UPDATE analizler SET accessed = ? WHERE listing_id = ? AND images_hash = ?",
+                (now, listing_id, img_hash),
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def get_recent(self, listing_id: str, max_age_sec: float) -> dict | None:
+        """İlanın `max_age_sec` içinde yapılmış en son analizini döner (crawl'suz kısa yol)."""
+        if max_age_sec <= 0:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM analizler WHERE listing_id = ? AND created >= ? "
+                "ORDER BY created DESC LIMIT 1",
+                (listing_id, time.time() - min(max_age_sec, self.ttl_sec)),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, listing_id: str, img_hash: str, result: dict):
+        payload = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analizler VALUES (?, ?, ?, ?, ?, ?)",
+                (listing_id, img_hash, payload, len(payload.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Süresi dolanları, sonra boyut sınırı aşılırsa en az yakın zamanda kullanılanları siler."""
+        self._conn.execute("DELETE FROM analizler WHERE created < ?", (now - self.ttl_sec,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analizler").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for listing_id, img_hash, size in self._conn.execute(
+            "SELECT listing_id, images_hash, size FROM analizler ORDER BY accessed ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(
+                "DELETE FROM analizler WHERE listing_id = ? AND images_hash = ?",
+                (listing_id, img_hash),
+            )
+            total -= size
+            removed += 1
+        log.info(f"Vision önbelleği boyut sınırı: {removed} kayıt silindi")
+
+
+_cache: VisionCache | None = None
+
+
+def get_vision_cache() -> VisionCache:
+    """Süreç genelinde tek önbellek örneği."""
+    global _cache
+    if _cache is None:
+        _cache = VisionCache()
+    return _cache
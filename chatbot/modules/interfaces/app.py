@@ -2,7 +2,8 @@
 Arabam Chatbot — Streamlit Arayüzü (MCP Client + Gemini Function Calling)
 ===========================================================================
 FastMCP Server'a MCP protokolü ile bağlanır.
-Gemini, tool'ları otomatik çağırarak kullanıcı sorularını yanıtlar.
+Gemini'nin function call'ları açık bir ajan döngüsünde, MCP session havuzu
+üzerinden paralel çalıştırılır.
 """
 
 import os
@@ -15,10 +16,14 @@ load_dotenv()
 
 from google import genai
 from google.genai import types
-from mcp import ClientSession
-from mcp.client.sse import sse_client
 
 from logger import get_logger
+from answer_cache import AnswerCache, data_version
+from stats_cache import StatsCache
+from mcp_pool import MCPSessionPool
+from agent import run_agent
+import genai_replay
+from embedding_store import get_embedding_store
 
 log = get_logger("app")
 
@@ -30,6 +35,20 @@ MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8000")
 MCP_SSE_URL = f"{MCP_SERVER_URL}/sse"
 
 MODEL_NAME = "gemini-2.5-flash"
+EMBED_MODEL = "gemini-embedding-001"
+
+# Cevap önbelleği (ilk tur sorular)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Sidebar istatistiklerinin arka plan yenileme aralığı
+STATS_REFRESH_SEC = float(os.getenv("STATS_REFRESH_SEC", "300"))
+
+# Ajan döngüsü sınırları ve MCP havuz boyutu
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "4"))
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "6"))
+AGENT_DEADLINE_SEC = float(os.getenv("AGENT_DEADLINE_SEC", "90"))
 
 SYSTEM_PROMPT = """Sen "Arabam Chatbot" adlı bir araç ilanı asistanısın. Türkçe konuş.
 Bir oto galeri danışmanı gibi davran — samimi, bilgili ve yardımsever ol.
@@ -61,6 +80,8 @@ Her soruya uygun aracı seçip çağır, sonuçları doğal ve anlaşılır Tür
 - **`marka_seri_listele`** → Marka/seri/model listesi.
 - **`veritabani_ozeti`** → Genel veritabanı bilgisi.
 - **`ilan_gorselleri_analiz_et`** → Kullanıcı bir ilan URL'si verdiğinde, o sayfadaki fotoğrafları Crawl4AI ile çeker ve Gemini Vision ile analiz eder. Boya, aşınma, sigara yanığı, panel aralıkları gibi detayları raporlar.
+- **`gorsel_analiz_durumu`** → `ilan_gorselleri_analiz_et` sonucu yerine `is_id` döndüyse analiz sürüyordur; bu tool ile aynı `is_id` kullanılarak sonuç alınır.
+- **`gorsel_durum_ara`** → Fotoğrafları önceden analiz edilmiş ilanlarda görsel duruma göre arama ("kazasız görünen", "pası olmayan", "görsel skoru yüksek" gibi sorular). `ilan_detay_getir` de varsa ön hesaplanmış görsel analizi `gorsel_analiz` alanında döner.
 
 ## TEKRAR: "Yapamıyorum" deme, her zaman önce `hibrit_arac_ara` ile dene!
 """
@@ -325,95 +346,158 @@ st.markdown("""
 # ─────────────── MCP + GEMINI ───────────────
 
 
-async def ask_gemini_with_mcp(user_message: str, chat_history: list) -> str:
+@st.cache_resource
+def get_answer_cache() -> AnswerCache:
+    """Süreç genelinde tek cevap önbelleği (tüm Streamlit oturumları paylaşır)."""
+    return AnswerCache(ttl_sec=ANSWER_CACHE_TTL, semantic_threshold=ANSWER_CACHE_THRESHOLD)
+
+
+async def embed_query(text: str) -> list[float] | None:
+    """Semantik önbellek eşleşmesi için sorgu embedding'i üretir (önce yerel depoya bakar)."""
+    store = get_embedding_store()
+    if store:
+        cached = store.get_many(EMBED_MODEL, "retrieval_query", [text])[0]
+        if cached is not None:
+            return cached
+    try:
+        result = await genai_replay.aio_embed_content(
+            genai_client,
+            model=EMBED_MODEL,
+            contents=text,
+            config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY"),
+        )
+        vector = list(result.embeddings[0].values)
+        if store:
+            store.put_many(EMBED_MODEL, "retrieval_query", [text], [vector])
+        return vector
+    except Exception as e:
+        log.warning(f"Önbellek embedding hatası: {e}")
+        return None
+
+
+async def ask_gemini_with_mcp(
+    user_message: str,
+    chat_history: list,
+    version: str | None = None,
+    pool: MCPSessionPool | None = None,
+    cache: AnswerCache | None = None,
+) -> str:
     """
-    MCP Server'a bağlanıp Gemini'ye tool'ları vererek cevap alır.
-    Gemini otomatik olarak gerekli tool'ları çağırır.
+    Gemini'ye MCP tool'larını vererek cevap alır.
+    Function call'lar açık ajan döngüsünde, havuzdaki MCP session'ları üzerinden
+    paralel çalıştırılır; adım ve süre sınırı uygulanır.
+
+    İlk tur sorularda (chat geçmişi boş) önce cevap önbelleğine bakılır;
+    hit olursa LLM ve tool'lar hiç çağrılmaz. URL içeren sorular ve veri versiyonu
+    bilinmezken (istatistikler alınamadı) sorulanlar önbelleğe alınmaz.
     """
-    try:
-        async with sse_client(MCP_SSE_URL) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                log.info("MCP session başlatıldı")
-
-                # Chat geçmişini Content formatına çevir
-                contents = []
-                for msg in chat_history:
-                    role = "user" if msg["role"] == "user" else "model"
-                    contents.append(
-                        types.Content(
-                            role=role,
-                            parts=[types.Part.from_text(text=msg["content"])]
-                        )
-                    )
-
-                # Mevcut kullanıcı mesajını ekle
-                contents.append(
-                    types.Content(
-                        role="user",
-                        parts=[types.Part.from_text(text=user_message)]
-                    )
-                )
+    cacheable = (cache is not None and version is not None
+                 and not chat_history and "http" not in user_message)
+    query_embedding = None
+    if cacheable:
+        if ANSWER_CACHE_SEMANTIC:
+            query_embedding = await embed_query(user_message)
+        cached = cache.get(user_message, version, embedding=query_embedding)
+        if cached is not None:
+            return cached
 
-                # Gemini'ye MCP session'ı tool olarak ver
-                response = await genai_client.aio.models.generate_content(
-                    model=MODEL_NAME,
-                    contents=contents,
-                    config=types.GenerateContentConfig(
-                        system_instruction=SYSTEM_PROMPT,
-                        temperature=0.7,
-                        tools=[session],
-                    ),
+    try:
+        # Chat geçmişini Content formatına çevir
+        contents = []
+        for msg in chat_history:
+            role = "user" if msg["role"] == "user" else "model"
+            contents.append(
+                types.Content(
+                    role=role,
+                    parts=[types.Part.from_text(text=msg["content"])]
                 )
-
-                log.info(f"Gemini cevap verdi: {response.text[:100] if response.text else 'boş'}...")
-                return response.text or "Üzgünüm, bir cevap oluşturamadım. Lütfen tekrar deneyin."
+            )
+
+        # Mevcut kullanıcı mesajını ekle
+        contents.append(
+            types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=user_message)]
+            )
+        )
+
+        result = await run_agent(
+            genai_client,
+            model=MODEL_NAME,
+            contents=contents,
+            system_instruction=SYSTEM_PROMPT,
+            pool=pool,
+            temperature=0.7,
+            max_steps=AGENT_MAX_STEPS,
+            deadline_sec=AGENT_DEADLINE_SEC,
+        )
+
+        answer = result["text"]
+        log.info(f"Gemini cevap verdi ({result['durum']}, {result['adim']} adım): {answer[:100]}...")
+        if cacheable and result["durum"] == "tamamlandi":
+            cache.put(user_message, version, answer, embedding=query_embedding)
+        return answer
 
     except Exception as e:
         log.error(f"MCP/Gemini hatası: {e}")
         return f"❌ Bir hata oluştu: {str(e)}\n\nMCP Server'ın çalıştığından emin olun."
 
 
-def get_sidebar_stats() -> dict:
-    """Sidebar için veritabanı istatistiklerini çeker (httpx ile, MCP session dışında)."""
-    import httpx
-    try:
-        with httpx.Client(timeout=10.0) as client:
-            # MCP SSE üzerinden doğrudan tool çağrısı yapamayız sidebar'da,
-            # bu yüzden async MCP session kullanıyoruz
-            pass
-    except Exception:
-        pass
-    return {}
-
-
-async def get_stats_via_mcp() -> dict:
-    """MCP üzerinden veritabanı istatistiklerini çeker."""
+async def get_stats_via_mcp(pool: MCPSessionPool) -> dict:
+    """MCP üzerinden veritabanı istatistiklerini çeker (havuz loop'unda çalışır)."""
     try:
-        async with sse_client(MCP_SSE_URL) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                result = await session.call_tool("veritabani_ozeti", {})
-                # MCP tool sonucu TextContent listesi olarak döner
-                if result.content and len(result.content) > 0:
-                    text = result.content[0].text
-                    return json.loads(text)
+        result = await asyncio.wrap_future(pool.submit(pool.call_tool("veritabani_ozeti", {})))
+        # MCP tool sonucu TextContent listesi olarak döner
+        if result.content and len(result.content) > 0:
+            text = result.content[0].text
+            return json.loads(text)
     except Exception as e:
         log.error(f"Stats hatası: {e}")
     return {}
 
 
+@st.cache_resource
+def get_mcp_pool() -> MCPSessionPool:
+    """Süreç genelinde tek MCP session havuzu (arka plan event loop'u ile)."""
+    pool = MCPSessionPool(MCP_SSE_URL, size=MCP_POOL_SIZE)
+    pool.start()
+    return pool
+
+
+def ask(user_message: str, chat_history: list) -> str:
+    """Senkron giriş noktası: soruyu havuz loop'unda çalıştırıp cevabı bekler."""
+    pool = get_mcp_pool()
+    return pool.run(
+        ask_gemini_with_mcp(
+            user_message,
+            chat_history,
+            version=data_version(get_sidebar_stats()),
+            pool=pool,
+            cache=get_answer_cache(),
+        ),
+        timeout=AGENT_DEADLINE_SEC + 30,
+    )
+
+
+@st.cache_resource
+def get_stats_cache() -> StatsCache:
+    """Süreç genelinde tek istatistik önbelleği; arka planda periyodik yenilenir."""
+    pool = get_mcp_pool()
+    cache = StatsCache(lambda: get_stats_via_mcp(pool), interval_sec=STATS_REFRESH_SEC)
+    cache.start()
+    return cache
+
+
+def get_sidebar_stats() -> dict:
+    """Sidebar için son istatistik anlık görüntüsü (bloklamaz, ağ çağrısı yapmaz)."""
+    return get_stats_cache().get()
+
+
 # ─────────────── SESSION ───────────────
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if "stats" not in st.session_state:
-    try:
-        st.session_state.stats = asyncio.run(get_stats_via_mcp())
-    except Exception:
-        st.session_state.stats = {}
-
 
 # ─────────────── SIDEBAR ───────────────
 
@@ -428,7 +512,7 @@ with st.sidebar:
     st.markdown('<div class="subtle-divider"></div>', unsafe_allow_html=True)
 
     # İstatistikler
-    stats = st.session_state.get("stats", {})
+    stats = get_sidebar_stats()
     mysql_stats = stats.get("mysql", {})
     qdrant_stats = stats.get("qdrant", {})
 
@@ -599,9 +683,7 @@ if st.session_state.get("vision_trigger"):
         with st.chat_message("assistant"):
             with st.spinner("📷 Fotoğraflar analiz ediliyor... Bu işlem 15-30 saniye sürebilir."):
                 try:
-                    answer = asyncio.run(
-                        ask_gemini_with_mcp(vision_prompt, st.session_state.messages[:-1])
-                    )
+                    answer = ask(vision_prompt, st.session_state.messages[:-1])
                     st.markdown(answer)
                     st.session_state.messages.append({"role": "assistant", "content": answer})
                 except Exception as e:
@@ -628,9 +710,7 @@ if prompt:
         with st.spinner("🤔 Düşünüyorum..."):
             try:
                 # Gemini + MCP ile cevap al
-                answer = asyncio.run(
-                    ask_gemini_with_mcp(prompt, st.session_state.messages[:-1])
-                )
+                answer = ask(prompt, st.session_state.messages[:-1])
 
                 st.markdown(answer)
                 st.session_state.messages.append({
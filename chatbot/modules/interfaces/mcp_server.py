@@ -8,8 +8,10 @@ Gemini bu tool'ları MCP protokolü üzerinden çağırır.
   python mcp_server.py
 """
 
+import asyncio
 import os
 import json
+
 import google.generativeai as genai
 from dotenv import load_dotenv
 from fastmcp import FastMCP
@@ -17,19 +19,48 @@ from fastmcp import FastMCP
 load_dotenv()
 
 from db import execute_query, get_db_stats, get_pool
-from vector_db import semantic_search, get_collection_info, ensure_collection
-from vision import analyze_listing
+from vector_db import semantic_search, get_collection_info, ensure_collection, get_client, COLLECTION_NAME
+from collection_alias import alias_target
+from vision_jobs import get_vision_queue
+from vision import DAMAGE_FLAGS
+from browser_pool import get_browser_pool
 from logger import get_logger
+from embedding_store import embed_with_store
+from embedding_backends import backend_for
 
 log = get_logger("mcp")
 
-# Gemini Embedding (sadece semantik arama için)
+# Gemini API anahtarı
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-EMBED_MODEL = "models/gemini-embedding-001"
+
+
+def embed_query(text: str) -> list[float]:
+    """Sorgu vektörü. Arka uç, collection'ı indeksleyenle aynıdır (EMBED_BACKEND[S]);
+    aynı sorgu daha önce embed edildiyse yerel depodan gelir."""
+    backend = backend_for(COLLECTION_NAME)
+    if not backend.cacheable:
+        return backend.embed([text], "retrieval_query")[0]
+    return embed_with_store(backend.name, "retrieval_query", [text],
+                            lambda texts: backend.embed(texts, "retrieval_query"))[0]
+
 
 # ─── FastMCP Server ───
+
 mcp = FastMCP("Arabam MCP Server")
 
+
+async def serve(port: int):
+    """Tarayıcı havuzunu süreç ömrü boyunca tek sefer açar: sunucudan önce ısıtılır,
+    sunucu durunca kapatılır. (FastMCP lifespan'ı bazı 2.x sürümlerinde SSE oturumu
+    başına çalıştığı için havuz oraya bağlanmaz.)"""
+    pool = get_browser_pool()
+    await pool.warmup()
+    log.info(f"🌐 Tarayıcı havuzu hazır: {pool.metrics()}")
+    try:
+        await mcp.run_async(transport="sse", host="0.0.0.0", port=port)
+    finally:
+        await pool.close()
+
 # ─── Ortak JOIN bloğu (normalize tablolar) ───
 
 BASE_JOIN = """
@@ -231,6 +262,22 @@ def ilan_detay_getir(ilan_id: str) -> str:
                 except Exception:
                     result["boya_detaylari"] = []
 
+                # Ön hesaplanmış görsel analiz (precompute_vision.py) — tablo yoksa atlanır
+                try:
+                    gcols, grows = execute_query(f"""
+                        SELECT g.gorsel_skor, {", ".join(f"g.{f}" for f in DAMAGE_FLAGS)},
+                               g.gorsel_sayisi, g.analiz, g.analyzed_at
+                        FROM ilan_gorsel_analizleri g
+                        WHERE g.ilan_db_id = %(db_id)s AND g.durum = 'tamamlandi'
+                    """, {"db_id": int(result["db_id"])})
+                    if grows:
+                        result["gorsel_analiz"] = {
+                            k: (str(v) if k == "analyzed_at" else v)
+                            for k, v in zip(gcols, grows[0])
+                        }
+                except Exception:
+                    pass
+
                 return json.dumps(result, ensure_ascii=False)
         except Exception as e:
             log.error(f"ilan_detay_getir hatası: {e}")
@@ -538,12 +585,7 @@ def hibrit_arac_ara(
     # ── 2. Qdrant Semantic Search ──
     semantic_results = []
     try:
-        result = genai.embed_content(
-            model=EMBED_MODEL,
-            content=sorgu,
-            task_type="retrieval_query"
-        )
-        query_vector = result['embedding']
+        query_vector = embed_query(sorgu)
 
         # Qdrant filtreleri
         qdrant_filters = {}
@@ -626,12 +668,7 @@ def benzer_arac_bul(aciklama: str, limit: int = 10) -> str:
 
     try:
         # Gemini Embedding ile soru vektörü oluştur
-        result = genai.embed_content(
-            model=EMBED_MODEL,
-            content=aciklama,
-            task_type="retrieval_query"
-        )
-        query_vector = result['embedding']
+        query_vector = embed_query(aciklama)
 
         safe_limit = min(max(1, limit), 20)
         results = semantic_search(query_vector, limit=safe_limit)
@@ -675,6 +712,7 @@ def veritabani_ozeti() -> str:
         # Qdrant bilgisi
         try:
             vector_stats = get_collection_info()
+            vector_stats["aktif_surum"] = alias_target(get_client(), COLLECTION_NAME) or COLLECTION_NAME
         except Exception:
             vector_stats = {"durum": "bağlantı yok"}
 
@@ -689,52 +727,158 @@ def veritabani_ozeti() -> str:
 
 # ─────────────── TOOL 11: ilan_gorselleri_analiz_et ───────────────
 
+VISION_WAIT_SEC = float(os.getenv("VISION_WAIT_SEC", "25"))
+
+
+def _vision_job_response(job: dict) -> dict:
+    """İş durumunu MCP yanıtına çevirir; bittiyse analiz sonucunu içerir."""
+    if job["durum"] == "hata":
+        return {"is_id": job["is_id"], "durum": "hata", "hata": job["hata"], "url": job["url"]}
+
+    if job["durum"] != "tamamlandi":
+        return {
+            "is_id": job["is_id"],
+            "durum": job["durum"],
+            "asama": job["asama"],
+            "gecen_sure_sn": job["sure_sn"],
+            "bekleyen_is": job["bekleyen_is"],
+            "mesaj": "Analiz sürüyor. Sonuç için gorsel_analiz_durumu aracını bu is_id ile çağırın.",
+        }
+
+    result = job["sonuc"]
+    if "hata" in result and result.get("gorsel_sayisi", 0) == 0:
+        return {"is_id": job["is_id"], "durum": "hata", "hata": result["hata"], "url": job["url"]}
+
+    # Screenshot baytları çok büyük olduğu için MCP response'a konmaz
+    return {
+        "is_id": job["is_id"],
+        "durum": "tamamlandi",
+        "url": job["url"],
+        "sayfa_basligi": result.get("page_title", ""),
+        "analiz_edilen_gorsel_sayisi": result.get("gorsel_sayisi", 0),
+        "gorsel_analiz": result.get("analiz", ""),
+        "gorsel_urlleri": result.get("image_urls", []),
+        "yapisal": result.get("yapisal"),
+        "onbellek": result.get("onbellek", False),
+        "sure_sn": job["sure_sn"],
+    }
+
+
 @mcp.tool
-def ilan_gorselleri_analiz_et(url: str) -> str:
+async def ilan_gorselleri_analiz_et(url: str) -> str:
     """Verilen ilan URL'sindeki fotoğrafları Crawl4AI ile çeker ve Gemini Vision ile analiz eder.
     Aracın gerçek durumunu fotoğraflardan tespit eder: boya, aşınma, sigara yanığı, panel aralıkları.
     Kullanıcı bir ilan linki verdiğinde bu tool kullanılır.
+    Analiz kısa sürede bitmezse 'is_id' döner; sonucu gorsel_analiz_durumu ile sorgulayın.
     Örnek: 'şu ilanın fotoğraflarını analiz et: https://www.arabam.com/ilan/123456'"""
     log.info(f"ilan_gorselleri_analiz_et: {url}")
 
     try:
-        import asyncio
-        result = asyncio.run(analyze_listing(url))
-
-        if "hata" in result and result.get("gorsel_sayisi", 0) == 0:
-            return json.dumps({
-                "hata": result["hata"],
-                "url": url,
-            }, ensure_ascii=False)
-
-        # Screenshot base64'ü çok büyük olduğu için MCP response'dan çıkar
-        response = {
-            "url": url,
-            "sayfa_basligi": result.get("page_title", ""),
-            "analiz_edilen_gorsel_sayisi": result.get("gorsel_sayisi", 0),
-            "gorsel_analiz": result.get("analiz", ""),
-            "gorsel_urlleri": result.get("image_urls", []),
-        }
-        return json.dumps(response, ensure_ascii=False)
+        queue = get_vision_queue()
+        job = await queue.submit(url)
+        job = await queue.wait(job["is_id"], VISION_WAIT_SEC)
+        return json.dumps(_vision_job_response(job), ensure_ascii=False)
 
     except Exception as e:
         log.error(f"ilan_gorselleri_analiz_et hatası: {e}")
         return json.dumps({"hata": str(e)}, ensure_ascii=False)
 
 
+# ─────────────── TOOL 12: gorsel_analiz_durumu ───────────────
+
+@mcp.tool
+async def gorsel_analiz_durumu(is_id: str, bekle_saniye: int = 10) -> str:
+    """ilan_gorselleri_analiz_et ile başlatılmış görsel analiz işinin durumunu döner.
+    Aşamalar: kuyrukta, sayfa_cekiliyor, gorseller_indiriliyor, gorseller_isleniyor,
+    analiz_ediliyor, tamamlandi, hata. İş bittiyse analiz sonucunu içerir.
+    bekle_saniye: iş bitmemişse en fazla bu kadar (en çok 30 sn) bekle."""
+    log.info(f"gorsel_analiz_durumu: {is_id}")
+
+    try:
+        job = await get_vision_queue().wait(is_id, max(0, min(bekle_saniye, 30)))
+        if job is None:
+            return json.dumps({"hata": f"İş bulunamadı veya süresi doldu: {is_id}"}, ensure_ascii=False)
+        return json.dumps(_vision_job_response(job), ensure_ascii=False)
+
+    except Exception as e:
+        log.error(f"gorsel_analiz_durumu hatası: {e}")
+        return json.dumps({"hata": str(e)}, ensure_ascii=False)
+
+
+# ─────────────── TOOL 13: gorsel_durum_ara ───────────────
+
+@mcp.tool
+def gorsel_durum_ara(
+    marka: str = "",
+    seri: str = "",
+    min_fiyat: int = 0,
+    max_fiyat: int = 0,
+    min_yil: int = 0,
+    max_yil: int = 0,
+    min_gorsel_skor: int = 0,
+    olmasin: str = "",
+    limit: int = 10,
+) -> str:
+    """Fotoğrafları önceden analiz edilmiş ilanlar arasında görsel duruma göre arama yapar.
+    min_gorsel_skor: 1-10 arası görsel güvenilirlik skoru alt sınırı.
+    olmasin: fotoğraflarda görülmemesi istenen kusurlar, virgülle ayrılmış.
+    Geçerli değerler: boya_farki, ezik_cizik, pas, ic_mekan_asinma, sigara_yanigi, kaza_belirtisi, tutarsizlik.
+    Örnek: 'kazasız görünen, pas yok, skoru 8 üstü BMW'ler' → marka='BMW', min_gorsel_skor=8, olmasin='kaza_belirtisi,pas'"""
+    log.info(f"gorsel_durum_ara: marka={marka}, min_skor={min_gorsel_skor}, olmasin={olmasin}")
+
+    conditions, params = build_conditions(marka=marka, seri=seri,
+                                          min_fiyat=min_fiyat, max_fiyat=max_fiyat,
+                                          min_yil=min_yil, max_yil=max_yil)
+    conditions.append("g.durum = 'tamamlandi'")
+    if min_gorsel_skor > 0:
+        conditions.append("g.gorsel_skor >= %(min_skor)s")
+        params["min_skor"] = min_gorsel_skor
+
+    unknown = []
+    for flag in (f.strip() for f in olmasin.split(",") if f.strip()):
+        if flag in DAMAGE_FLAGS:
+            # Kolon adı beyaz listeden geldiği için f-string güvenli
+            conditions.append(f"g.{flag} = FALSE")
+        else:
+            unknown.append(flag)
+
+    params["limit"] = min(max(1, limit), 50)
+    sql = f"""
+        SELECT i.ilan_id, i.baslik, m.ad AS marka, ser.ad AS seri, modl.ad AS model,
+               i.fiyat, i.yil, i.kilometre, il.ad AS il,
+               g.gorsel_skor, {", ".join(f"g.{f}" for f in DAMAGE_FLAGS)}
+        {SHORT_JOIN}
+        JOIN ilan_gorsel_analizleri g ON g.ilan_db_id = i.id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY g.gorsel_skor DESC, i.fiyat ASC
+        LIMIT %(limit)s
+    """
+    try:
+        columns, rows = execute_query(sql, params)
+        results = [dict(zip(columns, [str(v) if v is not None else None for v in row])) for row in rows]
+        response = {"sonuc_sayisi": len(results), "sonuclar": results}
+        if unknown:
+            response["bilinmeyen_kusurlar"] = unknown
+        return json.dumps(response, ensure_ascii=False)
+    except Exception as e:
+        log.error(f"gorsel_durum_ara hatası: {e}")
+        return json.dumps({"hata": str(e)}, ensure_ascii=False)
+
+
 # ─────────────── MAIN ───────────────
 
 if __name__ == "__main__":
     PORT = int(os.getenv("MCP_PORT", "8000"))
     log.info("🚀 FastMCP Server başlatılıyor…")
 
-    # Veritabanı hazırlığı
-    ensure_collection()
+    # Veritabanı hazırlığı — alias varsa collection indeksleyicinin sürümlerinden biridir
+    if alias_target(get_client(), COLLECTION_NAME) is None:
+        ensure_collection()
 
     log.info(f"✅ FastMCP Server çalışıyor: http://0.0.0.0:{PORT}/mcp")
     log.info(f"   Tools: araba_ara, ilan_detay_getir, fiyat_istatistikleri, "
              f"marka_seri_listele, ilan_sayisi, renk_dagilimi, "
              f"il_dagilimi, hibrit_arac_ara, benzer_arac_bul, veritabani_ozeti, "
-             f"ilan_gorselleri_analiz_et")
+             f"ilan_gorselleri_analiz_et, gorsel_analiz_durumu, gorsel_durum_ara")
 
-    mcp.run(transport="sse", host="0.0.0.0", port=PORT)
+    asyncio.run(serve(PORT))
@@ -0,0 +1,159 @@
+"""
+Embedding Arka Uçları Benchmark'ı
+=================================
+Scraper çıktısındaki ilanlarla embedding arka uçlarını karşılaştırır:
+  - Throughput: doküman embedding hızı (metin/sn)
+  - Erişim kalitesi: ilan alanlarından üretilen sorgularla Recall@k, MRR ve
+    ilanın kendisinin ilk sırada gelme oranı (Kendi@1)
+
+Sorgular ilan metninden farklı kelimelerle kurulur ("2021 Fiat Egea dizel manuel
+beyaz Denizli'de"); aynı marka + modeldeki ilanlar ilgili kabul edilir.
+Etiketli sorgu dosyası (--queries) verilirse onunla ölçülür:
+    {"sorgu": "...", "ilgili": ["37944989", ...]}   # her satır bir JSON
+
+Kullanım:
+    python bench_embeddings.py                                 # hashed
+    python bench_embeddings.py --backends hashed:256,hashed:1024,gemini   # gemini API çağrısı yapar
+    python bench_embeddings.py --data ../../scraping/raw/arabam_ilanlar.jsonl --k 5
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from embedding_backends import create_backend
+from logger import get_logger
+
+log = get_logger("bench_embed")
+
+DEFAULT_DATA = os.path.join(os.path.dirname(__file__), "..", "..", "..", "scraping", "raw", "arabam_ilanlar.jsonl")
+
+_VITES_SOZ = {"Düz": "manuel", "Otomatik": "otomatik vites", "Yarı Otomatik": "yarı otomatik"}
+
+
+def load_listings(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def model_of(row: dict) -> str:
+    """Model alanı yoksa başlıktan marka sonrası ilk kelime."""
+    if row.get("model"):
+        return row["model"]
+    words = (row.get("baslik") or "").split()
+    marka = row.get("marka") or ""
+    if marka in words and words.index(marka) + 1 < len(words):
+        return words[words.index(marka) + 1]
+    return ""
+
+
+def listing_text(row: dict) -> str:
+    """index_vectors.build_text ile aynı düzende, ham scraper alanlarından metin."""
+    parts = [row.get("marka"), model_of(row), row.get("paket")]
+    if row.get("yil"):
+        parts.append(f"{row['yil']} model")
+    if row.get("kilometre"):
+        parts.append(f"{row['kilometre']:,} km".replace(",", "."))
+    if row.get("fiyat"):
+        parts.append(f"{row['fiyat']:,} TL".replace(",", "."))
+    parts += [row.get("yakit_tipi"), row.get("vites_tipi"), row.get("kasa_tipi"),
+              row.get("renk"), row.get("konum_il")]
+    if row.get("tramer_tutari_tl"):
+        parts.append(f"Tramer: {int(row['tramer_tutari_tl']):,} TL".replace(",", "."))
+    if row.get("aciklama"):
+        parts.append(row["aciklama"][:500])
+    return " | ".join(p for p in parts if p)
+
+
+def synthetic_queries(rows: list[dict]) -> list[dict]:
+    """Her ilan için doğal dilde bir sorgu; ilgili = aynı marka + model."""
+    groups: dict[tuple, list[str]] = {}
+    for row in rows:
+        groups.setdefault((row.get("marka"), model_of(row)), []).append(row["ilan_id"])
+
+    queries = []
+    for row in rows:
+        words = [str(row["yil"]) if row.get("yil") else "", row.get("marka", ""), model_of(row),
+                 (row.get("yakit_tipi") or "").lower(), _VITES_SOZ.get(row.get("vites_tipi"), ""),
+                 (row.get("renk") or "").lower()]
+        if row.get("konum_il"):
+            words.append(f"{row['konum_il']}'de")
+        queries.append({
+            "sorgu": " ".join(w for w in words if w),
+            "ilgili": groups[(row.get("marka"), model_of(row))],
+            "kendi": row["ilan_id"],
+        })
+    return queries
+
+
+def embed_all(backend, texts: list[str], task_type: str) -> tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), backend.batch_size):
+        vectors.extend(backend.embed(texts[i:i + backend.batch_size], task_type))
+    elapsed = time.perf_counter() - start
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    return matrix, elapsed
+
+
+def evaluate(doc_vecs: np.ndarray, query_vecs: np.ndarray, ids: list[str],
+             queries: list[dict], k: int) -> dict:
+    scores = query_vecs @ doc_vecs.T
+    ranking = np.argsort(-scores, axis=1)
+    recalls, rrs, self_hits = [], [], []
+    for q, order in zip(queries, ranking):
+        ranked = [ids[j] for j in order]
+        relevant = set(q["ilgili"])
+        recalls.append(len(relevant & set(ranked[:k])) / min(len(relevant), k))
+        first = next((r for r, pid in enumerate(ranked, 1) if pid in relevant), None)
+        rrs.append(1 / first if first else 0.0)
+        if "kendi" in q:
+            self_hits.append(ranked[0] == q["kendi"])
+    report = {f"recall@{k}": round(float(np.mean(recalls)), 3), "mrr": round(float(np.mean(rrs)), 3)}
+    if self_hits:
+        report["kendi@1"] = round(float(np.mean(self_hits)), 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding arka uçlarını karşılaştırır")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="scraper JSONL dosyası")
+    parser.add_argument("--backends", default="hashed", help="virgülle ayrılmış arka uç tanımları")
+    parser.add_argument("--queries", help="etiketli sorgu JSONL dosyası (opsiyonel)")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = [r for r in load_listings(args.data) if r.get("ilan_id")]
+    ids = [r["ilan_id"] for r in rows]
+    docs = [listing_text(r) for r in rows]
+    queries = load_listings(args.queries) if args.queries else synthetic_queries(rows)
+    log.info(f"{len(docs)} ilan, {len(queries)} sorgu")
+
+    results = []
+    for spec in args.backends.split(","):
+        backend = create_backend(spec)
+        doc_vecs, doc_sec = embed_all(backend, docs, "retrieval_document")
+        query_vecs, _ = embed_all(backend, [q["sorgu"] for q in queries], "retrieval_query")
+        report = {
+            "arka_uc": backend.name,
+            "boyut": doc_vecs.shape[1],
+            "metin_sn": round(len(docs) / doc_sec, 1) if doc_sec else float("inf"),
+            **evaluate(doc_vecs, query_vecs, ids, queries, args.k),
+        }
+        results.append(report)
+
+    log.info("=" * 70)
+    for report in results:
+        log.info("   " + "  ".join(f"{k}={v}" for k, v in report.items()))
+    log.info("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
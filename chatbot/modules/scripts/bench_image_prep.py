@@ -0,0 +1,120 @@
+"""
+Görsel Ön İşleme Benchmark'ı
+=============================
+Orijinal ve ön işlenmiş görsellerin boyutunu ve işleme süresini karşılaştırır.
+`--gemini` verilirse aynı görseller her iki hâliyle Gemini Vision'a gönderilir
+ve model gecikmesi de ölçülür (API çağrısı yapar).
+
+Kullanım:
+    python bench_image_prep.py foto1.jpg foto2.jpg         # yerel dosyalar
+    python bench_image_prep.py galeri/                     # dizindeki tüm görseller
+    python bench_image_prep.py --url https://www.arabam.com/ilan/...   # ilandan indir
+    python bench_image_prep.py galeri/ --gemini
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from image_prep import preprocess_image, preprocess_images, MAX_EDGE, OUTPUT_FORMAT, QUALITY
+from vision import crawl_listing_images, analyze_images_with_gemini, detect_mime
+from logger import get_logger
+
+log = get_logger("bench_img")
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def load_files(paths: list[str]) -> list[dict]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(IMAGE_EXTS)
+            )
+        else:
+            files.append(path)
+
+    blobs = []
+    for path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        mime = detect_mime(data)
+        if mime:
+            blobs.append({"mime_type": mime, "data": data})
+        else:
+            log.warning(f"Tanınmayan format, atlandı: {path}")
+    return blobs
+
+
+async def bench(blobs: list[dict], with_gemini: bool) -> dict:
+    # Tek tek (sıralı) süre — görsel başına maliyet
+    per_image_ms = []
+    processed = []
+    for blob in blobs:
+        start = time.perf_counter()
+        processed.append(preprocess_image(blob))
+        per_image_ms.append((time.perf_counter() - start) * 1000)
+
+    # Thread havuzunda paralel süre — üretimdeki yol
+    start = time.perf_counter()
+    await preprocess_images(blobs)
+    parallel_ms = (time.perf_counter() - start) * 1000
+
+    before = sum(len(b["data"]) for b in blobs)
+    after = sum(len(b["data"]) for b in processed)
+    report = {
+        "gorsel": len(blobs),
+        "ayar": f"{OUTPUT_FORMAT} q={QUALITY} max_edge={MAX_EDGE}",
+        "once_kb": round(before / 1024, 1),
+        "sonra_kb": round(after / 1024, 1),
+        "kazanc_yuzde": round(100 * (1 - after / before), 1) if before else 0.0,
+        "sirali_ms": round(sum(per_image_ms), 1),
+        "gorsel_basi_ms": round(sum(per_image_ms) / len(per_image_ms), 1) if per_image_ms else 0.0,
+        "paralel_ms": round(parallel_ms, 1),
+    }
+
+    if with_gemini:
+        for label, payload in (("orijinal", blobs), ("islenmis", processed)):
+            start = time.perf_counter()
+            await analyze_images_with_gemini(images=payload, screenshot=None)
+            report[f"gemini_{label}_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    return report
+
+
+async def main_async(args):
+    if args.url:
+        crawl = await crawl_listing_images(args.url)
+        blobs = crawl["images"]
+    else:
+        blobs = load_files(args.paths)
+
+    if not blobs:
+        log.error("Ölçülecek görsel yok.")
+        return
+
+    report = await bench(blobs, args.gemini)
+    log.info("=" * 50)
+    for key, value in report.items():
+        log.info(f"   {key:<18} {value}")
+    log.info("=" * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Görsel ön işleme benchmark'ı")
+    parser.add_argument("paths", nargs="*", help="görsel dosyaları veya dizinleri")
+    parser.add_argument("--url", help="görselleri bu ilan URL'sinden indir")
+    parser.add_argument("--gemini", action="store_true", help="Gemini Vision gecikmesini de ölç")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+İndeksleme Throughput Benchmark'ı
+=================================
+index_vectors.py boru hattını (okuma → metin → embedding → yükleme) sentetik
+ilanlarla çalıştırır; MySQL ve Gemini gerekmez. Her corpus boyutu ayrı bir
+alt süreçte çalışır ki tepe bellek (RSS) ölçümleri birbirine karışmasın.
+
+Rapor (boyut başına):
+  - ilan/sn ve embedding/sn (duvar saati)
+  - aşamaların meşgul süre payları ve darboğaz aşama
+  - tepe RSS (MB)
+
+Embedding:
+    stub     metin özetinden tohumlanan rastgele vektör (varsayılan); --embed-gecikme-ms
+             ile çağrı başına API gecikmesi taklit edilebilir
+    hashed   yerel hashed n-gram arka ucu (gerçek CPU maliyeti)
+
+Qdrant: varsayılan olarak süreç içi bellek modu (`QdrantClient(":memory:")`);
+--qdrant-url ile yerel bir Qdrant sunucusu kullanılır (collection'lar bench_ önekli
+oluşturulur ve sonunda silinir). Bellek içi modda 1M ilan × 768 boyut birkaç GB RAM
+ister; büyük boyutlarda --boyut 128 ya da yerel sunucu tercih edin.
+
+Kullanım:
+    python bench_indexing.py                                   # 10k, 100k, 1M
+    python bench_indexing.py --boyutlar 10000,50000 --embed hashed
+    python bench_indexing.py --qdrant-url http://localhost:6333 --bulk --embed-gecikme-ms 300
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from typing import Iterator
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Modül yüklenirken Gemini arka ucu kurulmasın; arka uç aşağıda değiştirilir
+os.environ.setdefault("EMBED_BACKEND", "hashed")
+
+import index_vectors
+from index_vectors import Checkpoint, run_pipeline, READ_CHUNK
+from embedding_backends import EmbeddingBackend, HashedNgramBackend
+from qdrant_client import QdrantClient
+from qdrant_client.models import VectorParams, Distance
+from logger import get_logger
+
+log = get_logger("bench_index")
+
+DEFAULT_SIZES = "10000,100000,1000000"
+
+_MARKALAR = {
+    "Fiat": (["Egea", "Linea", "Doblo"], ["1.3 Multijet", "1.4 Fire", "1.6 Multijet"]),
+    "Renault": (["Clio", "Megane", "Fluence"], ["1.5 dCi", "1.3 TCe", "1.6 16V"]),
+    "Volkswagen": (["Passat", "Golf", "Polo"], ["1.6 TDI", "1.5 TSI", "1.0 TSI"]),
+    "Toyota": (["Corolla", "Yaris", "C-HR"], ["1.6", "1.8 Hybrid", "1.5"]),
+    "Ford": (["Focus", "Fiesta", "Kuga"], ["1.5 TDCi", "1.0 EcoBoost", "1.6 Ti-VCT"]),
+    "Hyundai": (["i20", "Accent Blue", "Tucson"], ["1.4 MPI", "1.6 CRDi", "1.0 T-GDI"]),
+}
+_YAKIT = ["Benzin", "Dizel", "LPG & Benzin", "Hibrit"]
+_VITES = ["Düz", "Otomatik", "Yarı Otomatik"]
+_KASA = ["Sedan", "Hatchback/5", "SUV", "Station wagon"]
+_RENK = ["Beyaz", "Siyah", "Gri", "Gümüş Gri", "Kırmızı", "Lacivert"]
+_IL = ["İstanbul", "Ankara", "İzmir", "Bursa", "Antalya", "Denizli", "Konya"]
+_KELIMELER = (
+    "aracım temiz bakımlı masrafsız ilk sahibinden garaj arabası yetkili servis bakımlı "
+    "lastikler yeni triger seti değişti hatasız boyasız orijinal km takas olur acil satılık "
+    "sigara içilmedi ekspertiz raporu mevcut kaporta temiz motor sessiz şanzıman sorunsuz "
+    "klima buz gibi cam tavan geri görüş kamerası park sensörü navigasyon deri koltuk"
+).split()
+
+
+def synthetic_listings(n: int, chunk_size: int = READ_CHUNK, seed: int = 42) -> Iterator[list[dict]]:
+    """LISTING_SELECT satırlarıyla aynı alanlara sahip sentetik ilanları parça parça üretir."""
+    rng = random.Random(seed)
+    for start in range(1, n + 1, chunk_size):
+        chunk = []
+        for i in range(start, min(start + chunk_size, n + 1)):
+            marka = rng.choice(list(_MARKALAR))
+            seriler, modeller = _MARKALAR[marka]
+            seri, model = rng.choice(seriler), rng.choice(modeller)
+            yil = rng.randint(2005, 2024)
+            chunk.append({
+                "id": i,
+                "ilan_id": str(30_000_000 + i),
+                "baslik": f"{marka} {seri} {model} {rng.choice(_KELIMELER)} {rng.choice(_KELIMELER)}",
+                "fiyat": rng.randrange(300_000, 3_000_000, 5_000),
+                "yil": yil,
+                "kilometre": rng.randrange(0, 350_000, 1_000),
+                "motor_hacmi_cc": rng.choice([999, 1248, 1368, 1461, 1598]),
+                "motor_gucu_hp": rng.choice([75, 90, 110, 130, 150]),
+                "tramer_tl": rng.choice([None, None, rng.randrange(1_000, 120_000, 500)]),
+                "boya_degisen_ozet": rng.choice(["", "Sol ön çamurluk boyalı", "Tamamı orijinal"]),
+                "aciklama": " ".join(rng.choices(_KELIMELER, k=rng.randint(15, 80)))[:500],
+                "marka": marka,
+                "seri": seri,
+                "model": model,
+                "yakit_tipi": rng.choice(_YAKIT),
+                "vites_tipi": rng.choice(_VITES),
+                "kasa_tipi": rng.choice(_KASA),
+                "renk": rng.choice(_RENK),
+                "il": rng.choice(_IL),
+            })
+        yield chunk
+
+
+class StubBackend(EmbeddingBackend):
+    """Ağsız sahte embedding: her metin için özetinden tohumlanan rastgele birim vektör.
+
+    `latency_ms` > 0 ise her çağrı o kadar bekler (uzak API gecikmesi taklidi).
+    """
+
+    batch_size = 20  # Gemini arka ucuyla aynı çağrı boyutu
+
+    def __init__(self, dim: int = 768, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.name = f"stub-{dim}"
+
+    def embed(self, texts: list[str], task_type: str) -> list[list[float]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        matrix = np.stack([
+            np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(self.dim, dtype=np.float32)
+            for t in texts
+        ])
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix.tolist()
+
+
+class SerializedClient:
+    """Bellek içi QdrantClient thread-safe değil; paralel yükleyicilerin çağrılarını sıraya sokar."""
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+def peak_rss_mb() -> float:
+    # Linux'ta ru_maxrss KB cinsindendir
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def bench_one(n: int, args) -> dict:
+    """Tek bir corpus boyutu için boru hattını baştan sona çalıştırır."""
+    backend = HashedNgramBackend(args.boyut) if args.embed == "hashed" else \
+        StubBackend(args.boyut, args.embed_gecikme_ms)
+    index_vectors.BACKEND = backend
+    index_vectors.EMBED_BATCH = backend.batch_size
+
+    client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else SerializedClient(QdrantClient(":memory:"))
+    collection = f"bench_{n}"
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    client.create_collection(collection_name=collection,
+                             vectors_config=VectorParams(size=backend.dim, distance=Distance.COSINE))
+    checkpoint = Checkpoint(collection, path=os.path.join(tempfile.gettempdir(), f"bench_index_{os.getpid()}.json"))
+
+    started = time.perf_counter()
+    run = await run_pipeline(synthetic_listings(n), {}, client, collection, checkpoint, n, args.bulk)
+    wall = time.perf_counter() - started
+    checkpoint.clear()
+
+    points = client.count(collection_name=collection, exact=True).count
+    if args.qdrant_url:
+        client.delete_collection(collection)
+
+    busy = {m.name: m.busy_sec for m in run["metrics"]}
+    busy_total = sum(busy.values()) or 1e-9
+    return {
+        "ilan": n,
+        "nokta": points,
+        "sure_sn": round(wall, 2),
+        "ilan_sn": round(n / wall, 1),
+        "embedding_sn": round(run["scheduler"].stats()["metin"] / wall, 1),
+        "pay": {name: round(sec / busy_total, 3) for name, sec in busy.items()},
+        "darbogaz": max(busy, key=busy.get),
+        "tepe_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_subprocess(n: int) -> dict | None:
+    """Boyutu ayrı süreçte çalıştırır; sonuç stdout'un son satırındaki JSON'dur."""
+    proc = subprocess.run([sys.executable, __file__, *sys.argv[1:], "--tek", str(n)],
+                          stdout=subprocess.PIPE, text=True)
+    if proc.returncode != 0 or not proc.stdout.strip():
+        log.error(f"❌ {n} ilanlık çalıştırma başarısız (çıkış kodu {proc.returncode})")
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="İndeksleme boru hattı throughput benchmark'ı")
+    parser.add_argument("--boyutlar", default=DEFAULT_SIZES, help="virgülle ayrılmış corpus boyutları")
+    parser.add_argument("--embed", choices=["stub", "hashed"], default="stub")
+    parser.add_argument("--boyut", type=int, default=768, help="vektör boyutu")
+    parser.add_argument("--embed-gecikme-ms", type=float, default=0.0, help="stub çağrı başına gecikme")
+    parser.add_argument("--qdrant-url", help="yerel Qdrant (verilmezse bellek içi)")
+    parser.add_argument("--bulk", action="store_true", help="paralel, boyuta göre batch'lenen yükleme")
+    parser.add_argument("--tek", type=int, help=argparse.SUPPRESS)  # alt süreç: tek boyut
+    args = parser.parse_args()
+
+    if args.tek:
+        print(json.dumps(asyncio.run(bench_one(args.tek, args)), ensure_ascii=False))
+        return
+
+    results = []
+    for n in (int(x) for x in args.boyutlar.split(",")):
+        log.info(f"▶️ {n} ilan ({args.embed}, {args.boyut} boyut, "
+                 f"{'Qdrant ' + args.qdrant_url if args.qdrant_url else 'bellek içi Qdrant'})")
+        result = run_subprocess(n)
+        if result:
+            results.append(result)
+
+    log.info("=" * 90)
+    log.info(f"   {'ilan':>9} {'sure_sn':>9} {'ilan/sn':>9} {'embed/sn':>9} {'rss_mb':>8}  aşama payları (darboğaz)")
+    for r in results:
+        shares = " ".join(f"{name}={share:.0%}" for name, share in r["pay"].items())
+        log.info(f"   {r['ilan']:>9} {r['sure_sn']:>9} {r['ilan_sn']:>9} {r['embedding_sn']:>9} "
+                 f"{r['tepe_rss_mb']:>8}  {shares} ({r['darbogaz']})")
+    log.info("=" * 90)
+
+
+if __name__ == "__main__":
+    main()
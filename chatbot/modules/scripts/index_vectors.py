@@ -3,31 +3,104 @@ MySQL → Qdrant Vektör İndeksleme
 ==================================
 Tüm ilanları MySQL'den çekip Gemini Embedding ile vektörleştirip Qdrant'a yükler.
 
+Artımlı senkronizasyon: her noktada embed edilen metnin ve payload'ın özeti
+saklanır. Sadece yeni/metni değişen ilanlar embed edilir, sadece payload'ı
+değişenlerin payload'ı güncellenir, MySQL'den silinen ilanların noktaları silinir.
+
+Okuma, embedding ve Qdrant yüklemesi sınırlı kuyruklarla bağlı eşzamanlı
+aşamalardır; toplam süre en yavaş aşamanın süresine yaklaşır.
+
+Yeniden indeksleme (blue/green): `--force` canlı collection'a dokunmaz; ilanları yeni
+bir sürüm collection'ına yazar, nokta sayısını ve örnek sorguları doğrular, sonra
+`COLLECTION_NAME` alias'ını atomik olarak yeni sürüme çevirir ve eski sürümleri siler.
+Arama yeniden indeksleme boyunca kesintisiz çalışır.
+
 Kullanım:
-    python index_vectors.py              # Tüm ilanları indeksle
-    python index_vectors.py --force      # Collection'ı sıfırlayıp yeniden indeksle
+    python index_vectors.py              # Değişenleri canlı collection'a senkronize et
+    python index_vectors.py --force      # Yeni sürüme yeniden indeksle, doğrula, alias'ı çevir
+    python index_vectors.py --retry-failed   # Sadece başarısız listesindeki ilanları tekrar dene
+    python index_vectors.py --rollback   # Alias'ı bir önceki sürüme geri çevir
+    python index_vectors.py --force --bulk   # Toplu yükleme: gRPC, paralel ve büyük batch'ler
+    python index_vectors.py --force --allow-migration-outage   # Alias öncesi kurulumdan ilk geçiş
+
+Alias öncesi kurulumda `COLLECTION_NAME` gerçek bir collection'dır. İlk alias geçişinde
+o collection silinip yerine alias oluşturulur; bu iki adım atomik değildir ve arada
+arama boş döner. Bu yüzden ilk geçiş `--allow-migration-outage` verilmedikçe reddedilir.
+
+Toplu yükleme modunda (`--bulk`) noktalar gRPC portundan, INDEX_BULK_WORKERS paralel
+yükleyiciyle ve payload boyutuna göre ayarlanan batch'lerle gönderilir. Yeni sürüme
+yazarken HNSW indeksleme yükleme boyunca kapatılır, sonunda bir kerede kurulur.
+
+Yarıda kesilen çalıştırma, tekrar başlatıldığında kontrol noktasındaki son
+tamamlanan parçadan devam eder. Embedding'i başarısız olan ilanlar sahte
+vektörle yazılmaz; id'leri başarısız listesine (dead-letter) eklenir.
 """
 
+import asyncio
+import hashlib
+import json
 import os
 import sys
 import time
-import google.generativeai as genai
+from typing import Iterator
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from db import get_pool
-from vector_db import get_client, ensure_collection, upsert_batch, COLLECTION_NAME
-from qdrant_client.models import PointStruct
+from vector_db import get_client, COLLECTION_NAME
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct, PointIdsList, OptimizersConfigDiff, CollectionStatus
 from logger import get_logger
+from embed_scheduler import EmbedScheduler
+from embedding_store import get_embedding_store
+from embedding_backends import backend_for
+from collection_alias import (
+    alias_target, resolve, is_version_of, version_name, create_version,
+    is_legacy_collection, switch_alias, previous_version, gc_versions,
+)
 
 log = get_logger("indexer")
 
-# Gemini Embedding ayarları
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-EMBED_MODEL = "models/gemini-embedding-001"
+# Embedding arka ucu collection'a göre seçilir (EMBED_BACKEND / EMBED_BACKENDS)
+BACKEND = backend_for(COLLECTION_NAME)
+TASK_TYPE = "retrieval_document"
 BATCH_SIZE = 50  # Qdrant batch boyutu
-EMBED_BATCH = 20  # Gemini embed batch boyutu (rate limit)
+EMBED_BATCH = BACKEND.batch_size  # tek embed çağrısındaki metin sayısı
+READ_CHUNK = int(os.getenv("INDEX_READ_CHUNK", "500"))  # MySQL'den tek sorguda okunan ilan
+SCROLL_BATCH = 1000  # Qdrant'tan mevcut özetleri okurken sayfa boyutu
+
+# Boru hattı: okuma → embedding → yükleme
+EMBED_WORKERS = int(os.getenv("INDEX_EMBED_WORKERS", "2"))  # aynı anda embed edilen okuma parçası
+EMBED_QUEUE_SIZE = 2  # embed bekleyen okuma parçası
+UPLOAD_QUEUE_SIZE = 8  # yüklenmeyi bekleyen BATCH_SIZE'lık grup
+UPSERT_BARRIER_EVERY = int(os.getenv("INDEX_UPSERT_BARRIER", "10"))  # kaç wait=False yüklemede bir bekle
+REPORT_EVERY_SEC = 10.0
+
+# Kaldığı yerden devam ve başarısız ilanlar
+CHECKPOINT_PATH = os.getenv("INDEX_CHECKPOINT_PATH", "/app/cache/index_checkpoint.json")
+DEAD_LETTER_PATH = os.getenv("INDEX_DEAD_LETTER_PATH", "/app/cache/index_failed.jsonl")
+
+# Toplu yükleme (--bulk)
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+BULK_UPLOAD_WORKERS = int(os.getenv("INDEX_BULK_WORKERS", "4"))  # paralel yükleyici
+BULK_BATCH_BYTES = int(os.getenv("INDEX_BULK_BATCH_KB", "4096")) * 1024  # tek istekteki hedef boyut
+BULK_MAX_BATCH = 1000  # payload ne kadar küçük olursa olsun tek istekteki en fazla nokta
+BULK_DEFER_INDEXING = os.getenv("INDEX_BULK_DEFER_HNSW", "1") == "1"
+HNSW_INDEXING_THRESHOLD = int(os.getenv("INDEX_HNSW_THRESHOLD", "20000"))  # Qdrant varsayılanı (KB)
+HNSW_WAIT_TIMEOUT_SEC = int(os.getenv("INDEX_HNSW_WAIT_SEC", "1800"))
+
+# Yeni sürümün alias'a geçmeden önceki doğrulaması
+VALIDATION_MIN_COVERAGE = float(os.getenv("INDEX_MIN_COVERAGE", "0.99"))  # nokta sayısı / MySQL ilan sayısı
+VALIDATION_SAMPLE = int(os.getenv("INDEX_VALIDATION_SAMPLE", "20"))  # kendini bulması gereken nokta
+VALIDATION_MIN_SELF_HIT = 0.95
+VALIDATION_QUERIES = [
+    "ekonomik dizel aile aracı",
+    "az kilometreli otomatik vites SUV",
+    "hasarsız beyaz sedan",
+    "düşük yakıt tüketimli şehir arabası",
+]
 
 
 def build_text(row: dict) -> str:
@@ -68,51 +141,95 @@ def build_text(row: dict) -> str:
 
 
 def embed_texts(texts: list[str]) -> list[list[float]]:
-    """Gemini ile metinleri vektörleştirir."""
-    result = genai.embed_content(
-        model=EMBED_MODEL,
-        content=texts,
-        task_type="retrieval_document"
-    )
-    return result['embedding']
+    """Collection'ın embedding arka ucuyla metinleri vektörleştirir."""
+    return BACKEND.embed(texts, TASK_TYPE)
+
+
+LISTING_SELECT = """
+    SELECT
+        i.id,
+        i.ilan_id,
+        i.baslik,
+        i.fiyat,
+        i.yil,
+        i.kilometre,
+        i.motor_hacmi_cc,
+        i.motor_gucu_hp,
+        i.tramer_tl,
+        i.boya_degisen_ozet,
+        LEFT(i.ilan_aciklamasi, 500) AS aciklama,
+        m.ad AS marka,
+        s.ad AS seri,
+        md.ad AS model,
+        yt.ad AS yakit_tipi,
+        vt.ad AS vites_tipi,
+        kt.ad AS kasa_tipi,
+        r.ad AS renk,
+        il.ad AS il
+    FROM ilanlar i
+    LEFT JOIN markalar m ON i.marka_id = m.id
+    LEFT JOIN seriler s ON i.seri_id = s.id
+    LEFT JOIN modeller md ON i.model_id = md.id
+    LEFT JOIN yakit_tipleri yt ON i.yakit_tipi_id = yt.id
+    LEFT JOIN vites_tipleri vt ON i.vites_tipi_id = vt.id
+    LEFT JOIN kasa_tipleri kt ON i.kasa_tipi_id = kt.id
+    LEFT JOIN renkler r ON i.renk_id = r.id
+    LEFT JOIN iller il ON i.il_id = il.id
+"""
 
 
-def fetch_all_listings() -> list[dict]:
-    """MySQL'den tüm ilanları JOIN'lerle çeker."""
+def count_listings() -> int:
+    """Toplam ilan sayısı (ilerleme göstergesi için)."""
+    conn = get_pool().get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM ilanlar")
+        total = cursor.fetchone()[0]
+        cursor.close()
+        return total
+    finally:
+        conn.close()
+
+
+def iter_listings(chunk_size: int = READ_CHUNK, after_id: int = 0) -> Iterator[list[dict]]:
+    """İlanları id sırasıyla parça parça okur (keyset sayfalama).
+
+    Her parça ayrı bir kısa sorgudur; bellekte aynı anda tek parça bulunur ve
+    ilk parça gelir gelmez embedding başlayabilir. `after_id` ile kaldığı yerden okur.
+    """
+    last_id = after_id
+    while True:
+        rows = _fetch_listings(
+            "WHERE i.id > %(last_id)s ORDER BY i.id LIMIT %(limit)s",
+            {"last_id": last_id, "limit": chunk_size},
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]["id"]
+        if len(rows) < chunk_size:
+            return
+
+
+def iter_listings_by_ids(ids: list[int], chunk_size: int = READ_CHUNK) -> Iterator[list[dict]]:
+    """Verilen id'lerdeki ilanları (örn. başarısız listesi) id sırasıyla parça parça okur."""
+    ids = sorted(set(ids))
+    for i in range(0, len(ids), chunk_size):
+        part = ids[i:i + chunk_size]
+        placeholders = ", ".join(f"%(id{k})s" for k in range(len(part)))
+        rows = _fetch_listings(
+            f"WHERE i.id IN ({placeholders}) ORDER BY i.id",
+            {f"id{k}": v for k, v in enumerate(part)},
+        )
+        if rows:
+            yield rows
+
+
+def _fetch_listings(where: str, params: dict) -> list[dict]:
     conn = get_pool().get_connection()
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT
-                i.id,
-                i.ilan_id,
-                i.baslik,
-                i.fiyat,
-                i.yil,
-                i.kilometre,
-                i.motor_hacmi_cc,
-                i.motor_gucu_hp,
-                i.tramer_tl,
-                i.boya_degisen_ozet,
-                i.ilan_aciklamasi AS aciklama,
-                m.ad AS marka,
-                s.ad AS seri,
-                md.ad AS model,
-                yt.ad AS yakit_tipi,
-                vt.ad AS vites_tipi,
-                kt.ad AS kasa_tipi,
-                r.ad AS renk,
-                il.ad AS il
-            FROM ilanlar i
-            LEFT JOIN markalar m ON i.marka_id = m.id
-            LEFT JOIN seriler s ON i.seri_id = s.id
-            LEFT JOIN modeller md ON i.model_id = md.id
-            LEFT JOIN yakit_tipleri yt ON i.yakit_tipi_id = yt.id
-            LEFT JOIN vites_tipleri vt ON i.vites_tipi_id = vt.id
-            LEFT JOIN kasa_tipleri kt ON i.kasa_tipi_id = kt.id
-            LEFT JOIN renkler r ON i.renk_id = r.id
-            LEFT JOIN iller il ON i.il_id = il.id
-        """)
+        cursor.execute(LISTING_SELECT + " " + where, params)
         rows = cursor.fetchall()
         cursor.close()
         return rows
@@ -120,120 +237,688 @@ def fetch_all_listings() -> list[dict]:
         conn.close()
 
 
-def main():
-    force = "--force" in sys.argv
-
-    log.info("=" * 50)
-    log.info("🚀 Vektör indeksleme başlıyor…")
-    log.info("=" * 50)
-
-    # Force modunda collection'ı sil ve yeniden oluştur
-    if force:
-        client = get_client()
+def build_point(listing: dict) -> dict:
+    """İlandan embed edilecek metni ve Qdrant payload'ını hazırlar."""
+    text = build_text(listing)
+
+    # Payload (Qdrant'ta saklanacak metadata)
+    payload = {
+        "ilan_id": listing["ilan_id"],
+        "baslik": listing.get("baslik", ""),
+        "marka": listing.get("marka", ""),
+        "seri": listing.get("seri", ""),
+        "model": listing.get("model", ""),
+        "yil": listing.get("yil", 0),
+        "kilometre": listing.get("kilometre", 0),
+        "fiyat": listing.get("fiyat", 0),
+        "yakit_tipi": listing.get("yakit_tipi", ""),
+        "vites_tipi": listing.get("vites_tipi", ""),
+        "kasa_tipi": listing.get("kasa_tipi", ""),
+        "renk": listing.get("renk", ""),
+        "il": listing.get("il", ""),
+        "tramer_tl": float(listing["tramer_tl"]) if listing.get("tramer_tl") else None,
+        "boya_degisen_ozet": listing.get("boya_degisen_ozet", ""),
+        "text": text  # aranacak metin
+    }
+    # Model değişirse de yeniden embed edilsin diye model adı özete dahil
+    payload["text_hash"] = hashlib.sha1(f"{BACKEND.name}\n{text}".encode("utf-8")).hexdigest()
+    payload["payload_hash"] = hashlib.sha1(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+    return {
+        "id": listing["id"],
+        "text": text,
+        "payload": payload
+    }
+
+
+def backend_dim() -> int:
+    return BACKEND.dim or len(embed_texts(["boyut"])[0])
+
+
+def check_dimension(client, collection: str):
+    """Canlı collection'ın vektör boyutu arka uçla uyumlu mu?"""
+    vectors = client.get_collection(collection).config.params.vectors
+    size = getattr(vectors, "size", None)
+    dim = backend_dim()
+    if size is not None and size != dim:
+        raise SystemExit(
+            f"❌ {collection} vektör boyutu {size}, arka uç {BACKEND.name} ise {dim} üretiyor. "
+            f"--force ile yeni sürüme yeniden indeksleyin."
+        )
+
+
+def load_existing_hashes(client, collection: str) -> dict[int, tuple[str | None, str | None]]:
+    """Qdrant'taki noktaların {id: (text_hash, payload_hash)} haritası (vektörsüz scroll)."""
+    hashes = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            limit=SCROLL_BATCH,
+            offset=offset,
+            with_payload=["text_hash", "payload_hash"],
+            with_vectors=False,
+        )
+        for point in points:
+            payload = point.payload or {}
+            hashes[point.id] = (payload.get("text_hash"), payload.get("payload_hash"))
+        if offset is None:
+            return hashes
+
+
+def update_payloads(client, collection: str, batch_points: list[dict]):
+    """Metni aynı kalan ilanların sadece payload'ını günceller (embedding yok).
+
+    Son güncelleme beklenir; döndüğünde hepsi uygulanmıştır.
+    """
+    for k, point in enumerate(batch_points):
+        client.overwrite_payload(
+            collection_name=collection,
+            payload=point["payload"],
+            points=[point["id"]],
+            wait=k == len(batch_points) - 1,
+        )
+
+
+def delete_stale(client, collection: str, ids: list[int]):
+    """MySQL'de artık olmayan ilanların noktalarını siler."""
+    for i in range(0, len(ids), SCROLL_BATCH):
+        client.delete(
+            collection_name=collection,
+            points_selector=PointIdsList(points=ids[i:i + SCROLL_BATCH]),
+        )
+
+
+async def embed_points(batch_points: list[dict], scheduler: EmbedScheduler) -> list[PointStruct]:
+    """Bir grup ilanı eşzamanlı embed edip Qdrant noktalarına çevirir.
+
+    Önce yerel embedding deposuna bakılır; sadece depoda olmayan metinler arka uca gider.
+    Embedding'i başarısız olan ilanlar atlanır (sonraki çalıştırmada yeni sayılıp tekrar denenir).
+    """
+    texts = [p["text"] for p in batch_points]
+    store = get_embedding_store() if BACKEND.cacheable else None
+    vectors = store.get_many(BACKEND.name, TASK_TYPE, texts) if store else [None] * len(texts)
+
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = await scheduler.embed_many([texts[i] for i in missing], EMBED_BATCH)
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+        if store:
+            done = [i for i in missing if vectors[i] is not None]
+            store.put_many(BACKEND.name, TASK_TYPE, [texts[i] for i in done], [vectors[i] for i in done])
+
+    return [
+        PointStruct(id=point["id"], vector=vector, payload=point["payload"])
+        for point, vector in zip(batch_points, vectors)
+        if vector is not None
+    ]
+
+
+# ─────────────── KONTROL NOKTASI VE BAŞARISIZ İLANLAR ───────────────
+
+class Checkpoint:
+    """Parça bazlı kontrol noktası.
+
+    Parçalar boru hattında sırasız bitebilir; dosyaya yalnızca kesintisiz biten
+    en uzun ön ekin son id'si yazılır. Yarıda kalan çalıştırma bu id'den devam eder.
+
+    `persist=False` ise ilerleme sadece bellekte izlenir; dosyaya dokunulmaz
+    (başarısız listesi tekrarı id aralığı taramadığı için kaldığı yer anlamsızdır).
+    """
+
+    def __init__(self, collection: str, path: str = CHECKPOINT_PATH, persist: bool = True):
+        self.path = path
+        self.collection = collection
+        self.persist = persist
+        self.last_id = 0
+        self._next_seq = 0
+        self._pending: dict[int, list] = {}  # seq → [bekleyen parça sayısı, son id]
+
+    @staticmethod
+    def _read(path: str) -> dict:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def stored_collection(cls, path: str = CHECKPOINT_PATH) -> str | None:
+        """Kontrol noktasının ait olduğu collection (yoksa None)."""
+        return cls._read(path).get("collection")
+
+    def load(self) -> int:
+        """Aynı collection için yarım kalmış çalıştırmanın son id'si (yoksa 0)."""
+        data = self._read(self.path)
+        if data.get("collection") != self.collection:
+            return 0
+        self.last_id = int(data.get("last_id", 0))
+        return self.last_id
+
+    def register(self, seq: int, last_id: int, parts: int):
+        """Okunan parçayı kaydeder; `parts` kadar tamamlanma bildirimi bekler."""
+        self._pending[seq] = [parts, last_id]
+        if parts == 0:
+            self._advance()
+
+    def add_parts(self, seq: int, parts: int):
+        """Parça embed edildikten sonra ortaya çıkan ek yükleme gruplarını bekleneceklere ekler."""
+        self._pending[seq][0] += parts
+
+    def complete(self, seq: int):
+        self._pending[seq][0] -= 1
+        self._advance()
+
+    def _advance(self):
+        moved = False
+        while self._next_seq in self._pending and self._pending[self._next_seq][0] == 0:
+            self.last_id = self._pending.pop(self._next_seq)[1]
+            self._next_seq += 1
+            moved = True
+        if moved:
+            self._save()
+
+    def _save(self):
+        if not self.persist:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection, "last_id": self.last_id,
+                       "updated": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if not self.persist:
+            return
         try:
-            client.delete_collection(COLLECTION_NAME)
-            log.info(f"🗑️ Collection silindi: {COLLECTION_NAME}")
-        except Exception:
+            os.remove(self.path)
+        except FileNotFoundError:
             pass
 
-    ensure_collection()
 
-    # Mevcut vektör sayısı
-    client = get_client()
-    info = client.get_collection(COLLECTION_NAME)
-    existing_count = info.points_count or 0
-    log.info(f"📊 Mevcut vektör sayısı: {existing_count}")
+# Tekrar denemede dosyanın bu bayta kadarki kısmı denenmekte olan kayıtlardır; yeniden
+# başarısız olanlar, o kısım silineceği için tekrar yazılmalıdır
+_dead_letter_retry_offset = 0
 
-    # MySQL'den ilanları çek
-    log.info("📂 MySQL'den ilanlar çekiliyor…")
-    listings = fetch_all_listings()
-    log.info(f"   {len(listings)} ilan yüklendi")
 
-    if existing_count >= len(listings) and not force:
-        log.info("✅ Tüm ilanlar zaten indekslenmiş. --force ile yeniden indeksleyebilirsiniz.")
+def _read_dead_letter(offset: int = 0) -> tuple[list[int], int]:
+    """`offset`'ten sonraki kayıtların id'leri (tekrarsız, sıra korunur) ve dosya boyutu."""
+    try:
+        with open(DEAD_LETTER_PATH, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    lines = data[offset:].decode("utf-8").splitlines()
+    ids = dict.fromkeys(json.loads(line)["id"] for line in lines if line.strip())
+    return list(ids), len(data)
+
+
+def record_failures(ids: list[int], error: str):
+    """Embedding'i başarısız ilanları dead-letter dosyasına ekler; zaten kayıtlı olanlar atlanır."""
+    known = set(_read_dead_letter(_dead_letter_retry_offset)[0])
+    new = [i for i in dict.fromkeys(ids) if i not in known]
+    if not new:
         return
+    os.makedirs(os.path.dirname(DEAD_LETTER_PATH) or ".", exist_ok=True)
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+        for listing_id in new:
+            f.write(json.dumps({"id": listing_id, "hata": error, "zaman": now}, ensure_ascii=False) + "\n")
+    log.warning(f"⚠️ {len(new)} ilan başarısız listesine yazıldı")
+
+
+def read_failed_ids() -> tuple[list[int], int]:
+    """Dead-letter dosyasındaki id'ler (tekrarsız) ve okunan bayt sayısı.
+
+    Dosya tekrar deneme başarıyla bitene kadar yerinde kalır; yarıda kesilen
+    tekrar denemede hiçbir id kaybolmaz. Bu çalıştırmada yeniden başarısız olanlar
+    okunan kısmın sonrasına yazılır.
+    """
+    global _dead_letter_retry_offset
+    ids, size = _read_dead_letter()
+    _dead_letter_retry_offset = size
+    return ids, size
+
+
+def drop_retried_failures(offset: int):
+    """Tekrar denenen ilk `offset` baytı siler; tekrar denemede yeniden başarısız olup
+    `record_failures` ile sona eklenen kayıtlar kalır."""
+    with open(DEAD_LETTER_PATH, "rb") as f:
+        f.seek(offset)
+        remaining = f.read()
+    if not remaining:
+        os.remove(DEAD_LETTER_PATH)
+        return
+    tmp = DEAD_LETTER_PATH + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(remaining)
+    os.replace(tmp, DEAD_LETTER_PATH)
+
+
+# ─────────────── TOPLU YÜKLEME ───────────────
+
+def bulk_client() -> QdrantClient:
+    """Yükleme için gRPC tercih eden istemci (docker-compose 6334'ü açar)."""
+    return QdrantClient(
+        host=os.getenv("QDRANT_HOST", "localhost"),
+        port=int(os.getenv("QDRANT_PORT", "6333")),
+        grpc_port=QDRANT_GRPC_PORT,
+        prefer_grpc=True,
+        timeout=120,
+    )
+
+
+def point_bytes(point: PointStruct) -> int:
+    """Noktanın istekteki yaklaşık boyutu: float32 vektör + JSON payload."""
+    payload = json.dumps(point.payload, ensure_ascii=False, default=str)
+    return 4 * len(point.vector) + len(payload.encode("utf-8")) + 32
+
+
+def group_points(points: list[PointStruct], max_bytes: int = BULK_BATCH_BYTES,
+                 max_count: int = BULK_MAX_BATCH) -> list[list[PointStruct]]:
+    """Noktaları toplam boyutu `max_bytes`'ı aşmayan (ve en fazla `max_count`'luk) gruplara böler.
+
+    Uzun açıklamalı ilanlar küçük batch'lere, kısa olanlar büyük batch'lere düşer.
+    """
+    groups, current, size = [], [], 0
+    for point in points:
+        n = point_bytes(point)
+        if current and (size + n > max_bytes or len(current) >= max_count):
+            groups.append(current)
+            current, size = [], 0
+        current.append(point)
+        size += n
+    if current:
+        groups.append(current)
+    return groups
+
+
+def set_indexing_threshold(client, collection: str, threshold: int):
+    """0: HNSW kurulmaz (toplu yükleme); sonra normal eşiğe dönünce optimizer indeksi kurar."""
+    client.update_collection(
+        collection_name=collection,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold),
+    )
+
 
-    # Batch olarak işle
-    total = len(listings)
-    indexed = 0
-    batch_points = []
-
-    for i, listing in enumerate(listings):
-        text = build_text(listing)
-
-        # Payload (Qdrant'ta saklanacak metadata)
-        payload = {
-            "ilan_id": listing["ilan_id"],
-            "baslik": listing.get("baslik", ""),
-            "marka": listing.get("marka", ""),
-            "seri": listing.get("seri", ""),
-            "model": listing.get("model", ""),
-            "yil": listing.get("yil", 0),
-            "kilometre": listing.get("kilometre", 0),
-            "fiyat": listing.get("fiyat", 0),
-            "yakit_tipi": listing.get("yakit_tipi", ""),
-            "vites_tipi": listing.get("vites_tipi", ""),
-            "kasa_tipi": listing.get("kasa_tipi", ""),
-            "renk": listing.get("renk", ""),
-            "il": listing.get("il", ""),
-            "tramer_tl": float(listing["tramer_tl"]) if listing.get("tramer_tl") else None,
-            "boya_degisen_ozet": listing.get("boya_degisen_ozet", ""),
-            "text": text  # aranacak metin
-        }
-
-        batch_points.append({
-            "id": listing["id"],
-            "text": text,
-            "payload": payload
-        })
-
-        # Batch dolduğunda embed + upsert
-        if len(batch_points) >= BATCH_SIZE or i == total - 1:
-            texts = [p["text"] for p in batch_points]
-
-            # Gemini rate limit'e takılmamak için parçala
-            all_vectors = []
-            for j in range(0, len(texts), EMBED_BATCH):
-                chunk = texts[j:j + EMBED_BATCH]
-                try:
-                    vectors = embed_texts(chunk)
-                    all_vectors.extend(vectors)
-                except Exception as e:
-                    log.error(f"Embedding hatası: {e}")
-                    time.sleep(5)
-                    try:
-                        vectors = embed_texts(chunk)
-                        all_vectors.extend(vectors)
-                    except Exception as e2:
-                        log.error(f"Embedding tekrar hatası: {e2}")
-                        # Boş vektörlerle doldur (skip edilecek)
-                        all_vectors.extend([[0.0] * 768] * len(chunk))
-
-                time.sleep(0.5)  # Rate limit koruması
-
-            # Qdrant'a yükle
-            points = [
-                PointStruct(
-                    id=batch_points[k]["id"],
-                    vector=all_vectors[k],
-                    payload=batch_points[k]["payload"]
-                )
-                for k in range(len(batch_points))
-                if all_vectors[k][0] != 0.0  # Boş vektörleri atla
+def wait_until_indexed(client, collection: str, timeout: float = HNSW_WAIT_TIMEOUT_SEC) -> bool:
+    """Optimizer indeksi kurup collection yeşile dönene kadar bekler."""
+    deadline = time.monotonic() + timeout
+    while True:
+        info = client.get_collection(collection)
+        if info.status == CollectionStatus.GREEN:
+            return True
+        if time.monotonic() > deadline:
+            log.warning(f"⚠️ {collection} {timeout:.0f} sn içinde indekslenemedi (durum: {info.status})")
+            return False
+        log.info(f"  🧱 HNSW kuruluyor: {info.indexed_vectors_count or 0}/{info.points_count or 0} vektör")
+        time.sleep(5)
+
+
+# ─────────────── SÜRÜMLER: yeniden indeksleme ve doğrulama ───────────────
+
+def pending_version(client) -> str | None:
+    """Yarıda kalmış `--force` çalıştırmasının sürümü (hâlâ duruyor ve alias'a geçmemişse)."""
+    name = Checkpoint.stored_collection()
+    if (name and is_version_of(COLLECTION_NAME, name)
+            and name != alias_target(client, COLLECTION_NAME) and client.collection_exists(name)):
+        return name
+    return None
+
+
+def validate_version(client, collection: str, expected: int) -> list[str]:
+    """Yeni sürümü alias'a geçmeden önce kontrol eder; bulunan sorunları döner (boşsa geçerli).
+
+    - Nokta sayısı MySQL'deki ilan sayısının en az VALIDATION_MIN_COVERAGE oranı olmalı
+    - Örnek noktalar kendi vektörleriyle aranınca ilk 5'te çıkmalı (HNSW sağlam mı)
+    - Örnek sorguların hepsi sonuç döndürmeli
+    """
+    problems = []
+    count = client.count(collection_name=collection, exact=True).count
+    log.info(f"🔎 Doğrulama: {collection} — {count} nokta, MySQL'de {expected} ilan")
+    if count == 0 or count < expected * VALIDATION_MIN_COVERAGE:
+        problems.append(f"nokta sayısı yetersiz: {count}/{expected}")
+
+    sample, _ = client.scroll(collection_name=collection, limit=VALIDATION_SAMPLE,
+                              with_payload=False, with_vectors=True)
+    if sample:
+        found = sum(
+            any(hit.id == point.id for hit in client.query_points(
+                collection_name=collection, query=point.vector, limit=5, with_payload=False).points)
+            for point in sample
+        )
+        ratio = found / len(sample)
+        log.info(f"   Kendini bulma: {found}/{len(sample)}")
+        if ratio < VALIDATION_MIN_SELF_HIT:
+            problems.append(f"örnek noktaların sadece %{ratio * 100:.0f}'i kendini buldu")
+
+    live = alias_target(client, COLLECTION_NAME)
+    query_vectors = BACKEND.embed(VALIDATION_QUERIES, "retrieval_query")
+    for query, vector in zip(VALIDATION_QUERIES, query_vectors):
+        new_ids = [h.id for h in client.query_points(
+            collection_name=collection, query=vector, limit=10, with_payload=False).points]
+        if not new_ids:
+            problems.append(f"sorgu sonuç döndürmedi: {query!r}")
+            continue
+        if live and live != collection:
+            try:
+                old_ids = [h.id for h in client.query_points(
+                    collection_name=live, query=vector, limit=10, with_payload=False).points]
+                log.info(f"   {query!r}: canlı sürümle ilk 10 örtüşme {len(set(new_ids) & set(old_ids))}/10")
+            except Exception as e:  # farklı boyutlu arka uca geçişte karşılaştırma yapılamaz
+                log.info(f"   {query!r}: canlı sürümle karşılaştırılamadı ({e})")
+    return problems
+
+
+# ─────────────── BORU HATTI: okuma → embedding → yükleme ───────────────
+
+class StageMetrics:
+    """Aşama başına işlenen öğe ve meşgul süre; throughput = öğe / meşgul süre."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_sec = 0.0
+
+    def record(self, items: int, started: float):
+        self.items += items
+        self.busy_sec += time.perf_counter() - started
+
+    def summary(self) -> str:
+        rate = self.items / self.busy_sec if self.busy_sec else 0.0
+        return f"{self.name}: {self.items} ({rate:.0f}/sn, meşgul {self.busy_sec:.0f} sn)"
+
+
+async def reader_stage(chunks: Iterator[list[dict]], existing: dict, embed_q: asyncio.Queue,
+                       upload_q: asyncio.Queue, stats: dict, metrics: StageMetrics,
+                       build_metrics: StageMetrics, checkpoint: Checkpoint):
+    """MySQL'den parça parça okur, değişiklik türüne göre embed veya yükleme kuyruğuna atar.
+
+    Okuma (MySQL) ve metin/payload hazırlama (build_text) süreleri ayrı ölçülür.
+    """
+    seq = 0
+    while True:
+        started = time.perf_counter()
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        metrics.record(len(chunk), started)
+
+        started = time.perf_counter()
+        batch_points, payload_only = [], []
+        for listing in chunk:
+            point = build_point(listing)
+            old_text_hash, old_payload_hash = existing.pop(point["id"], (None, None))
+            if old_text_hash is None:
+                stats["yeni"] += 1
+            elif old_text_hash != point["payload"]["text_hash"]:
+                stats["metin_degisen"] += 1
+            else:
+                if old_payload_hash != point["payload"]["payload_hash"]:
+                    stats["payload_degisen"] += 1
+                    payload_only.append(point)
+                else:
+                    stats["ayni"] += 1
+                continue
+            batch_points.append(point)
+        build_metrics.record(len(chunk), started)
+        checkpoint.register(seq, chunk[-1]["id"], bool(batch_points) + bool(payload_only))
+
+        # Kuyruk doluysa burada beklenir (geri basınç)
+        if batch_points:
+            await embed_q.put((seq, batch_points))
+        if payload_only:
+            await upload_q.put(("payload", seq, payload_only))
+        seq += 1
+
+
+async def embedder_stage(scheduler: EmbedScheduler, embed_q: asyncio.Queue, upload_q: asyncio.Queue,
+                         metrics: StageMetrics, checkpoint: Checkpoint, bulk: bool = False):
+    while (item := await embed_q.get()) is not None:
+        seq, batch_points = item
+        started = time.perf_counter()
+        points = await embed_points(batch_points, scheduler)
+        metrics.record(len(batch_points), started)
+
+        done = {p.id for p in points}
+        failed = [p["id"] for p in batch_points if p["id"] not in done]
+        if failed:
+            record_failures(failed, "embedding başarısız")
+
+        if bulk:
+            # Paralel yükleyicilerde sıra yok; parça, tüm grupları yüklenince tamamlanır
+            groups = group_points(points) or [[]]
+            checkpoint.add_parts(seq, len(groups) - 1)
+            for group in groups:
+                await upload_q.put(("upsert", seq, group))
+            continue
+
+        # Parçanın son grubu beklemeli yüklenir; bitince parça tamamlanmış sayılır
+        groups = [points[i:i + BATCH_SIZE] for i in range(0, len(points), BATCH_SIZE)] or [[]]
+        for k, group in enumerate(groups):
+            await upload_q.put(("upsert", seq if k == len(groups) - 1 else None, group))
+
+
+async def uploader_stage(client, collection: str, upload_q: asyncio.Queue, metrics: StageMetrics,
+                         checkpoint: Checkpoint, bulk: bool = False) -> int:
+    """Qdrant'a wait=False ile yükler; her UPSERT_BARRIER_EVERY yüklemede ve her parçanın
+    son grubunda bekleyerek eşitlenir. Beklenen yükleme dönünce parça kontrol noktasına işlenir.
+
+    Toplu modda birden fazla yükleyici paralel çalışır ve her yükleme beklenir
+    (gecikmeyi paralellik gizler).
+    """
+    uploaded = 0
+    pending = 0
+    while (item := await upload_q.get()) is not None:
+        kind, seq, points = item
+        started = time.perf_counter()
+        if kind == "payload":
+            await asyncio.to_thread(update_payloads, client, collection, points)
+        elif points:
+            pending += 1
+            # Bariyer: wait=True olan istek, önceki tüm işlemler uygulanınca döner
+            barrier = bulk or pending >= UPSERT_BARRIER_EVERY or seq is not None
+            await asyncio.to_thread(client.upsert, collection_name=collection,
+                                    points=points, wait=barrier)
+            pending = 0 if barrier else pending
+            uploaded += len(points)
+        metrics.record(len(points), started)
+        if seq is not None:
+            checkpoint.complete(seq)
+    return uploaded
+
+
+async def report_progress(metrics: list[StageMetrics], queues: dict[str, asyncio.Queue],
+                          scheduler: EmbedScheduler, total: int):
+    while True:
+        await asyncio.sleep(REPORT_EVERY_SEC)
+        depth = ", ".join(f"{name}={q.qsize()}/{q.maxsize}" for name, q in queues.items())
+        log.info(f"  ⏱️ {metrics[0].items}/{total} okundu | "
+                 f"{' | '.join(m.summary() for m in metrics)} | kuyruk: {depth} | "
+                 f"embed hızı {scheduler.stats()['metin_sn']} metin/sn")
+
+
+def make_scheduler() -> EmbedScheduler:
+    # Yerel arka uçta kota yok; hız sınırlayıcı pratikte devre dışı
+    if BACKEND.remote:
+        return EmbedScheduler(embed_texts)
+    return EmbedScheduler(embed_texts, concurrency=EMBED_WORKERS, rate=1e6, max_rate=1e6)
+
+
+async def run_pipeline(chunks: Iterator[list[dict]], existing: dict, upload_client, collection: str,
+                       checkpoint: Checkpoint, total: int, bulk: bool = False) -> dict:
+    """Okuma → metin → embedding → yükleme aşamalarını sınırlı kuyruklarla bağlayıp çalıştırır."""
+    upload_workers = BULK_UPLOAD_WORKERS if bulk else 1
+    scheduler = make_scheduler()
+    stats = {"yeni": 0, "metin_degisen": 0, "payload_degisen": 0, "ayni": 0}
+    embed_q: asyncio.Queue = asyncio.Queue(maxsize=EMBED_QUEUE_SIZE)
+    upload_q: asyncio.Queue = asyncio.Queue(maxsize=max(UPLOAD_QUEUE_SIZE, 2 * upload_workers))
+    metrics = [StageMetrics("okuma"), StageMetrics("metin"), StageMetrics("embedding"), StageMetrics("yükleme")]
+
+    async def feed():
+        await reader_stage(chunks, existing, embed_q, upload_q, stats, metrics[0], metrics[1], checkpoint)
+        for _ in range(EMBED_WORKERS):
+            await embed_q.put(None)
+
+    async def embed_all():
+        await asyncio.gather(*(
+            embedder_stage(scheduler, embed_q, upload_q, metrics[2], checkpoint, bulk)
+            for _ in range(EMBED_WORKERS)
+        ))
+        for _ in range(upload_workers):
+            await upload_q.put(None)
+
+    reporter = asyncio.create_task(
+        report_progress(metrics, {"embed": embed_q, "yukleme": upload_q}, scheduler, total))
+    try:
+        # Bir aşama hata verirse TaskGroup diğerlerini iptal eder (kuyrukta takılı kalınmaz)
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(feed())
+            tg.create_task(embed_all())
+            uploaders = [
+                tg.create_task(uploader_stage(upload_client, collection, upload_q, metrics[3], checkpoint, bulk))
+                for _ in range(upload_workers)
             ]
+    finally:
+        reporter.cancel()
+
+    return {
+        "indexed": sum(u.result() for u in uploaders),
+        "stats": stats,
+        "metrics": metrics,
+        "scheduler": scheduler,
+    }
+
+
+async def main_async():
+    force = "--force" in sys.argv
+    retry_failed = "--retry-failed" in sys.argv
+    bulk = "--bulk" in sys.argv
+    allow_outage = "--allow-migration-outage" in sys.argv
+    client = get_client()
 
-            if points:
-                upsert_batch(points)
+    # Alias öncesi kurulumdan geçiş kesinti gerektirir; uzun yeniden indekslemeden önce sorulur
+    if is_legacy_collection(client, COLLECTION_NAME) and (force or "--rollback" in sys.argv):
+        if not allow_outage:
+            raise SystemExit(
+                f"❌ {COLLECTION_NAME} alias değil gerçek bir collection. Alias'a geçişte silinecek ve "
+                f"alias oluşturulana kadar arama boş dönecek. Kesintiyi kabul ediyorsanız "
+                f"--allow-migration-outage ile tekrar çalıştırın."
+            )
+        log.warning(f"⚠️ --allow-migration-outage: {COLLECTION_NAME} alias geçişinde silinecek; "
+                    f"geçiş anında arama kısa süre boş dönecek")
+
+    if "--rollback" in sys.argv:
+        previous = previous_version(client, COLLECTION_NAME)
+        if previous is None:
+            raise SystemExit("❌ Geri dönülecek önceki sürüm yok")
+        switch_alias(client, COLLECTION_NAME, previous, allow_outage=allow_outage)
+        return
 
-            indexed += len(points)
-            log.info(f"  ✅ {indexed}/{total} ilan indekslendi")
-            batch_points = []
+    # Hedef: yeniden indekslemede yeni (ya da yarım kalmış) sürüm, aksi hâlde canlı collection
+    live = resolve(client, COLLECTION_NAME)
+    rebuild = force or not client.collection_exists(live)
+    if rebuild and retry_failed:
+        raise SystemExit("❌ --retry-failed canlı collection'a yazar; --force ile birlikte kullanılamaz")
+    if rebuild:
+        target = pending_version(client)
+        if target is None:
+            target = version_name(COLLECTION_NAME)
+            create_version(client, COLLECTION_NAME, target, backend_dim())
+    else:
+        target = live
+        check_dimension(client, target)
+
+    # HNSW sadece alias'a henüz geçmemiş yeni sürümde kapatılabilir (canlıda arama yavaşlardı)
+    defer_indexing = bulk and rebuild and BULK_DEFER_INDEXING
+    if defer_indexing:
+        set_indexing_threshold(client, target, 0)
+        log.info(f"🧱 {target}: yükleme boyunca HNSW indeksleme kapalı")
+    upload_client = bulk_client() if bulk else client
+
+    log.info("=" * 50)
+    log.info("🚀 Vektör indeksleme başlıyor…")
+    log.info(f"   Collection: {COLLECTION_NAME} → {target}, embedding: {BACKEND.name}")
+    if bulk:
+        log.info(f"   Toplu yükleme: gRPC :{QDRANT_GRPC_PORT}, {BULK_UPLOAD_WORKERS} yükleyici, "
+                 f"batch ≤ {BULK_BATCH_BYTES // 1024} KB / {BULK_MAX_BATCH} nokta")
+    log.info("=" * 50)
+
+    # Tekrar denemede mevcut kontrol noktası (yarım kalmış tam tur olabilir) korunur
+    checkpoint = Checkpoint(target, persist=not retry_failed)
+
+    # Kaynak: başarısız listesi, yarım kalan çalıştırmanın devamı ya da baştan
+    if retry_failed:
+        failed_ids, failed_offset = read_failed_ids()
+        log.info(f"🔁 Başarısız listesinden {len(failed_ids)} ilan tekrar denenecek")
+        chunks = iter_listings_by_ids(failed_ids)
+        resume_from = None
+    else:
+        resume_from = checkpoint.load()
+        if resume_from:
+            log.info(f"⏩ Yarım kalan çalıştırma: {target}, id > {resume_from} ilanlardan devam ediliyor")
+        chunks = iter_listings(after_id=resume_from)
+
+    existing = load_existing_hashes(client, target)
+    log.info(f"📊 Mevcut vektör sayısı: {len(existing)}")
+
+    total = count_listings()
+    log.info(f"📂 MySQL'de {total} ilan var")
+
+    started = time.perf_counter()
+    run = await run_pipeline(chunks, existing, upload_client, target, checkpoint, total, bulk)
+    indexed, stats, metrics, scheduler = run["indexed"], run["stats"], run["metrics"], run["scheduler"]
+    if retry_failed and failed_offset:
+        drop_retried_failures(failed_offset)
+
+    # Geriye kalanlar MySQL'de artık olmayan ilanlar. Devam eden çalıştırmada sadece
+    # taranan aralık (id > resume_from) kesin bilinir; tekrar denemede silme yapılmaz.
+    stale = [] if retry_failed else [pid for pid in existing if pid > resume_from]
+    if stale:
+        delete_stale(client, target, stale)
+        log.info(f"🗑️ {len(stale)} silinmiş ilanın vektörü kaldırıldı")
+
+    if rebuild:
+        # Yeni sürüm ancak doğrulanırsa canlıya alınır; aksi hâlde alias eski sürümde kalır
+        checkpoint.clear()
+        # Yarım kalmış toplu yüklemenin devamı --bulk'sız çalışsa da indeksleme geri açılır
+        if client.get_collection(target).config.optimizer_config.indexing_threshold == 0:
+            hnsw_started = time.perf_counter()
+            set_indexing_threshold(client, target, HNSW_INDEXING_THRESHOLD)
+            await asyncio.to_thread(wait_until_indexed, client, target)
+            log.info(f"🧱 HNSW kuruldu: {time.perf_counter() - hnsw_started:.0f} sn")
+        problems = validate_version(client, target, total)
+        if problems:
+            for problem in problems:
+                log.error(f"   ❌ {problem}")
+            raise SystemExit(f"❌ {target} doğrulanamadı; alias değiştirilmedi (sürüm inceleme için bırakıldı)")
+        switch_alias(client, COLLECTION_NAME, target, allow_outage=allow_outage)
+        gc_versions(client, COLLECTION_NAME)
+    elif not retry_failed:
+        checkpoint.clear()  # Tam tur bitti; sonraki çalıştırma baştan senkronize eder
+
+    log.info(f"📊 Yeni: {stats['yeni']}, metni değişen: {stats['metin_degisen']}, "
+             f"payload'ı değişen: {stats['payload_degisen']}, değişmeyen: {stats['ayni']}, "
+             f"silinen: {len(stale)}")
 
     log.info(f"\n{'=' * 50}")
     log.info(f"🏁 İndeksleme tamamlandı!")
-    log.info(f"   Toplam: {indexed} vektör")
+    log.info(f"   Toplam: {indexed} vektör, {time.perf_counter() - started:.0f} sn")
+    for m in metrics:
+        log.info(f"   {m.summary()}")
+    log.info(f"   Embedding: {scheduler.stats()}")
+    if get_embedding_store():
+        log.info(f"   Embedding deposu: {get_embedding_store().stats()}")
     log.info(f"{'=' * 50}")
 
 
+def main():
+    asyncio.run(main_async())
+
+
 if __name__ == "__main__":
     main()
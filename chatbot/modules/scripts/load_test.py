@@ -0,0 +1,230 @@
+"""
+Uçtan Uca Yük Testi (Yerel Sahte LLM ile)
+==========================================
+Çalışan bir mcp_server.py'ye karşı `ask_gemini_with_mcp` ile aynı akışı sürer:
+açık ajan döngüsü + MCP session havuzu + paralel tool çağrıları.
+Gemini yerine senaryolardan kayıtlı function call'ları üreten sahte bir model
+kullanılır; ağ bağlantısı ve API maliyeti yoktur. MySQL ve Qdrant yerel çalışmalıdır.
+
+Rapor: toplam throughput (tur/sn) + tool bazında ve tur bazında p50/p95/p99.
+
+Kullanım:
+    python load_test.py                                # 10 kullanıcı × 5 tur
+    python load_test.py --users 50 --turns 10 --pool 8
+    python load_test.py --scenarios senaryolar.json --llm-ms 800
+
+Senaryo dosyası formatı:
+    [
+      {"soru": "En ucuz 5 BMW",
+       "adimlar": [[{"ad": "araba_ara", "args": {"marka": "BMW", "limit": 5}}]],
+       "cevap": "İşte en ucuz BMW'ler..."}
+    ]
+Her `adimlar` elemanı bir model turudur; içindeki çağrılar paralel çalışır.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from google.genai import types
+
+from mcp_pool import MCPSessionPool
+from agent import run_agent
+from logger import get_logger
+
+log = get_logger("loadtest")
+
+# Varsayılan senaryolar — sadece SQL tool'ları (embedding gerektirmez, tamamen offline)
+DEFAULT_SCENARIOS = [
+    {
+        "soru": "En ucuz 5 BMW'yi listele",
+        "adimlar": [[{"ad": "araba_ara", "args": {"marka": "BMW", "limit": 5}}]],
+        "cevap": "En ucuz 5 BMW listelendi.",
+    },
+    {
+        "soru": "Hangi renk en popüler?",
+        "adimlar": [[{"ad": "renk_dagilimi", "args": {}}]],
+        "cevap": "En popüler renk listelendi.",
+    },
+    {
+        "soru": "İstanbul'daki otomatik araçların ortalama fiyatı ve ilan sayısı?",
+        "adimlar": [[
+            {"ad": "fiyat_istatistikleri", "args": {"il": "İstanbul", "vites_tipi": "Otomatik"}},
+            {"ad": "ilan_sayisi", "args": {"il": "İstanbul", "vites_tipi": "Otomatik"}},
+        ]],
+        "cevap": "İstanbul otomatik araç istatistikleri hazır.",
+    },
+    {
+        "soru": "Fiat serileri ve şehir dağılımı",
+        "adimlar": [
+            [{"ad": "marka_seri_listele", "args": {"marka": "Fiat"}}],
+            [{"ad": "il_dagilimi", "args": {"marka": "Fiat", "limit": 5}}],
+        ],
+        "cevap": "Fiat serileri ve şehir dağılımı hazır.",
+    },
+    {
+        "soru": "Genel veritabanı özeti",
+        "adimlar": [[{"ad": "veritabani_ozeti", "args": {}}]],
+        "cevap": "Veritabanı özeti hazır.",
+    },
+]
+
+
+# ─────────────── SAHTE MODEL ───────────────
+
+class _FakeModels:
+    def __init__(self, scenario: dict, llm_ms: float, jitter: float):
+        self._steps = list(scenario["adimlar"])
+        self._answer = scenario.get("cevap", "Tamam.")
+        self._llm_ms = llm_ms
+        self._jitter = jitter
+
+    async def generate_content(self, model: str, contents: list, config=None):
+        delay = self._llm_ms * (1 + random.uniform(-self._jitter, self._jitter)) / 1000
+        await asyncio.sleep(max(0.0, delay))
+        if self._steps:
+            calls = self._steps.pop(0)
+            parts = [
+                types.Part(function_call=types.FunctionCall(name=c["ad"], args=c.get("args", {})))
+                for c in calls
+            ]
+        else:
+            parts = [types.Part.from_text(text=self._answer)]
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts))]
+        )
+
+
+class FakeGenaiClient:
+    """`genai.Client` yerine geçen, senaryodaki function call'ları sırayla üreten istemci."""
+
+    def __init__(self, scenario: dict, llm_ms: float = 300.0, jitter: float = 0.2):
+        self.aio = type("Aio", (), {})()
+        self.aio.models = _FakeModels(scenario, llm_ms, jitter)
+
+
+# ─────────────── ÖLÇÜM ───────────────
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank yüzdelik."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "adet": len(samples),
+        "p50": round(percentile(samples, 50), 1),
+        "p95": round(percentile(samples, 95), 1),
+        "p99": round(percentile(samples, 99), 1),
+        "max": round(max(samples), 1) if samples else 0.0,
+    }
+
+
+async def _user(uid: int, turns: int, scenarios: list[dict], pool: MCPSessionPool,
+                args, turn_ms: list, tool_ms: dict, errors: list):
+    for t in range(turns):
+        scenario = random.choice(scenarios)
+        client = FakeGenaiClient(scenario, llm_ms=args.llm_ms, jitter=args.jitter)
+        contents = [types.Content(role="user", parts=[types.Part.from_text(text=scenario["soru"])])]
+        start = time.perf_counter()
+        try:
+            result = await run_agent(
+                client, model="fake", contents=contents, system_instruction="",
+                pool=pool, max_steps=args.max_steps, deadline_sec=args.deadline,
+            )
+        except Exception as e:
+            errors.append(f"kullanıcı {uid}, tur {t}: {e}")
+            continue
+        turn_ms.append((time.perf_counter() - start) * 1000)
+        for rec in result["trace"]:
+            if rec["tur"] == "tool":
+                tool_ms.setdefault(rec["ad"], []).append(rec["sure_ms"])
+                if rec["durum"] != "ok":
+                    errors.append(f"{rec['ad']}: {rec['durum']}")
+        if result["durum"] != "tamamlandi":
+            errors.append(f"tur durumu: {result['durum']}")
+
+
+async def run_load(args, scenarios: list[dict], pool: MCPSessionPool) -> dict:
+    # Isınma: tool listesini çek ve havuzu aç
+    await pool.list_tools()
+
+    turn_ms, tool_ms, errors = [], {}, []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _user(u, args.turns, scenarios, pool, args, turn_ms, tool_ms, errors)
+        for u in range(args.users)
+    ))
+    wall = time.perf_counter() - start
+
+    return {
+        "kullanici": args.users,
+        "havuz": args.pool,
+        "sure_sn": round(wall, 2),
+        "tur_sayisi": len(turn_ms),
+        "throughput_tur_sn": round(len(turn_ms) / wall, 2) if wall else 0.0,
+        "tur_ms": summarize(turn_ms),
+        "tool_ms": {name: summarize(v) for name, v in sorted(tool_ms.items())},
+        "hata_sayisi": len(errors),
+        "ornek_hatalar": errors[:5],
+    }
+
+
+def print_report(report: dict):
+    log.info("=" * 60)
+    log.info(f"🏁 Yük testi: {report['kullanici']} kullanıcı, havuz={report['havuz']}, "
+             f"{report['tur_sayisi']} tur, {report['sure_sn']} sn")
+    log.info(f"   Throughput: {report['throughput_tur_sn']} tur/sn, hata: {report['hata_sayisi']}")
+    t = report["tur_ms"]
+    log.info(f"   Tur      p50={t['p50']:>8} p95={t['p95']:>8} p99={t['p99']:>8} ms")
+    for name, s in report["tool_ms"].items():
+        log.info(f"   {name:<22} n={s['adet']:<5} p50={s['p50']:>8} p95={s['p95']:>8} p99={s['p99']:>8} ms")
+    for err in report["ornek_hatalar"]:
+        log.warning(f"   ⚠️ {err}")
+    log.info("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arabam chatbot uçtan uca yük testi")
+    parser.add_argument("--url", default=os.getenv("MCP_SERVER_URL", "http://localhost:8000"))
+    parser.add_argument("--users", type=int, default=10, help="eşzamanlı kullanıcı sayısı")
+    parser.add_argument("--turns", type=int, default=5, help="kullanıcı başına tur sayısı")
+    parser.add_argument("--pool", type=int, default=4, help="MCP session havuz boyutu")
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="sahte model gecikmesi (ms)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="gecikme oynaklığı (oran)")
+    parser.add_argument("--max-steps", type=int, default=6)
+    parser.add_argument("--deadline", type=float, default=90.0)
+    parser.add_argument("--scenarios", help="senaryo JSON dosyası")
+    parser.add_argument("--json", help="raporu JSON olarak bu dosyaya yaz")
+    args = parser.parse_args()
+
+    scenarios = DEFAULT_SCENARIOS
+    if args.scenarios:
+        with open(args.scenarios, "r", encoding="utf-8") as f:
+            scenarios = json.load(f)
+
+    pool = MCPSessionPool(f"{args.url}/sse", size=args.pool)
+    pool.start()
+    report = pool.run(run_load(args, scenarios, pool))
+    pool.run(pool.close())
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Toplu Görsel Analiz (Ön Hesaplama)
+===================================
+MySQL'deki ilanların fotoğraflarını Crawl4AI + Gemini Vision ile analiz edip
+yapısal sonuçları (skor + hasar bayrakları) `ilan_gorsel_analizleri` tablosuna yazar.
+Chatbot durum sorularını bu tablodan anında cevaplar ve SQL ile filtreler.
+
+Kaldığı yerden devam eder: tablo kontrol noktası işlevi görür; zaten analiz
+edilmiş ilanlar atlanır (--yenile-gun ile eskiyenler yeniden analiz edilir).
+
+İlanlar MySQL'den parça parça okunup sınırlı bir kuyruğa konur; `--concurrency`
+kadar işçi kuyruktan sürekli ilan çeker. Parça sınırında en yavaş ilanı beklemek
+yerine boşalan işçi hemen sıradakine geçer, throughput sabit kalır.
+
+Kullanım:
+    python precompute_vision.py                         # analiz edilmemiş tüm ilanlar
+    python precompute_vision.py --limit 200 --concurrency 4
+    python precompute_vision.py --retry-failed          # hatalı kayıtları tekrar dene
+    python precompute_vision.py --yenile-gun 30         # 30 günden eski analizleri yenile
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from db import get_pool
+from vision import analyze_listing, DAMAGE_FLAGS
+from browser_pool import get_browser_pool
+from logger import get_logger
+
+log = get_logger("vis_batch")
+
+CHUNK_SIZE = 200  # MySQL'den tek seferde okunan ilan sayısı
+QUEUE_PER_WORKER = 2  # kuyrukta işçi başına bekleyen ilan (MySQL okuması sırasında tampon)
+PROGRESS_EVERY = 50  # bu kadar ilanda bir ilerleme logu
+
+TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS ilan_gorsel_analizleri (
+        ilan_db_id INT PRIMARY KEY,
+        durum VARCHAR(20) NOT NULL,
+        gorsel_skor TINYINT,
+        {", ".join(f"{flag} BOOLEAN" for flag in DAMAGE_FLAGS)},
+        gorsel_sayisi INT,
+        analiz TEXT,
+        hata TEXT,
+        analyzed_at DATETIME NOT NULL,
+        FOREIGN KEY (ilan_db_id) REFERENCES ilanlar(id) ON DELETE CASCADE,
+        INDEX idx_skor (gorsel_skor),
+        INDEX idx_durum (durum)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+def _execute(sql: str, params: dict | tuple = (), fetch: bool = False) -> list[dict]:
+    conn = get_pool().get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall() if fetch else []
+        conn.commit()
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
+
+
+def ensure_table():
+    _execute(TABLE_SQL)
+
+
+def fetch_pending(after_id: int, limit: int, retry_failed: bool, refresh_days: int) -> list[dict]:
+    """Henüz analiz edilmemiş (veya yeniden denenecek) ilanları id sırasıyla döner."""
+    redo = ["g.ilan_db_id IS NULL"]
+    if retry_failed:
+        redo.append("g.durum = 'hata'")
+    if refresh_days > 0:
+        redo.append("g.analyzed_at < NOW() - INTERVAL %(gun)s DAY")
+    return _execute(f"""
+        SELECT i.id, i.ilan_url
+        FROM ilanlar i
+        LEFT JOIN ilan_gorsel_analizleri g ON g.ilan_db_id = i.id
+        WHERE i.id > %(after)s AND i.ilan_url IS NOT NULL AND i.ilan_url <> ''
+          AND ({" OR ".join(redo)})
+        ORDER BY i.id
+        LIMIT %(limit)s
+    """, {"after": after_id, "limit": limit, "gun": refresh_days}, fetch=True)
+
+
+def save_result(ilan_db_id: int, result: dict | None, error: str | None = None):
+    structured = (result or {}).get("yapisal") or {}
+    if error is None and result is not None:
+        if "hata" in result:
+            error = result["hata"]
+        elif result.get("analiz", "").startswith("❌"):
+            error = result["analiz"]
+    columns = ["ilan_db_id", "durum", "gorsel_skor", *DAMAGE_FLAGS, "gorsel_sayisi", "analiz", "hata"]
+    values = [
+        ilan_db_id,
+        "hata" if error else "tamamlandi",
+        structured.get("skor"),
+        *[structured.get(flag) for flag in DAMAGE_FLAGS],
+        (result or {}).get("gorsel_sayisi", 0),
+        None if error else result.get("analiz"),
+        error,
+    ]
+    placeholders = ", ".join(["%s"] * len(columns))
+    updates = ", ".join(f"{c} = VALUES({c})" for c in columns[1:])
+    _execute(
+        f"INSERT INTO ilan_gorsel_analizleri ({', '.join(columns)}, analyzed_at) "
+        f"VALUES ({placeholders}, NOW()) ON DUPLICATE KEY UPDATE {updates}, analyzed_at = NOW()",
+        tuple(values),
+    )
+
+
+async def process(row: dict, stats: dict):
+    start = time.perf_counter()
+    try:
+        result = await analyze_listing(row["ilan_url"])
+        await asyncio.to_thread(save_result, row["id"], result)
+        ok = "hata" not in result and not result.get("analiz", "").startswith("❌")
+    except Exception as e:
+        log.error(f"  ❌ {row['id']}: {e}")
+        await asyncio.to_thread(save_result, row["id"], None, str(e))
+        ok = False
+    stats["tamamlandi" if ok else "hata"] += 1
+    log.info(f"  {'✅' if ok else '❌'} ilan {row['id']} ({time.perf_counter() - start:.1f} sn)")
+
+
+async def produce(queue: asyncio.Queue, args, workers: int):
+    """Bekleyen ilanları keyset sayfalama ile okuyup kuyruğa koyar; sonunda her işçiye bitiş işareti."""
+    last_id, queued = 0, 0
+    try:
+        while args.limit <= 0 or queued < args.limit:
+            size = CHUNK_SIZE if args.limit <= 0 else min(CHUNK_SIZE, args.limit - queued)
+            rows = await asyncio.to_thread(fetch_pending, last_id, size, args.retry_failed, args.yenile_gun)
+            if not rows:
+                break
+            for row in rows:
+                await queue.put(row)
+            last_id = rows[-1]["id"]
+            queued += len(rows)
+    finally:
+        # Okuma hata verse de işçiler kuyruktakileri bitirip durur
+        for _ in range(workers):
+            await queue.put(None)
+
+
+async def work(queue: asyncio.Queue, stats: dict, start: float):
+    while (row := await queue.get()) is not None:
+        await process(row, stats)
+        done = stats["tamamlandi"] + stats["hata"]
+        if done % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            log.info(f"📊 {done} ilan işlendi ({done / elapsed * 60:.1f} ilan/dk) — "
+                     f"{json.dumps(stats, ensure_ascii=False)}")
+
+
+async def main_async(args):
+    await asyncio.to_thread(ensure_table)
+    await get_browser_pool().warmup(args.concurrency)
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * QUEUE_PER_WORKER)
+    stats = {"tamamlandi": 0, "hata": 0}
+    start = time.perf_counter()
+
+    try:
+        await asyncio.gather(
+            produce(queue, args, args.concurrency),
+            *(work(queue, stats, start) for _ in range(args.concurrency)),
+        )
+    finally:
+        await get_browser_pool().close()
+
+    log.info("=" * 50)
+    log.info(f"🏁 Toplu görsel analiz bitti: {stats['tamamlandi']} başarılı, {stats['hata']} hatalı")
+    log.info(f"   Süre: {time.perf_counter() - start:.0f} sn")
+    log.info("=" * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="İlan fotoğraflarını toplu analiz eder")
+    parser.add_argument("--limit", type=int, default=0, help="en fazla bu kadar ilan (0 = hepsi)")
+    parser.add_argument("--concurrency", type=int, default=3, help="eşzamanlı analiz sayısı")
+    parser.add_argument("--retry-failed", action="store_true", help="hatalı kayıtları yeniden dene")
+    parser.add_argument("--yenile-gun", type=int, default=0,
+                        help="bu kadar günden eski analizleri yenile (0 = yenileme)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
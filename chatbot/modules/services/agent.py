@@ -0,0 +1,163 @@
+"""
+Gemini Function Calling Döngüsü
+===============================
+SDK'nın otomatik function calling'i yerine açık ajan döngüsü:
+- Bir model turundaki tüm function call'lar MCP havuzu üzerinden paralel çalışır
+- Maksimum adım sayısı ve toplam süre (deadline) sınırı uygulanır
+- Her adım için süre izi (trace) tutulur
+Çok tool'lu bir turun maliyeti tool sürelerinin toplamı değil, en yavaş tool'dur.
+"""
+
+import asyncio
+import time
+
+from google.genai import types
+
+from logger import get_logger
+import genai_replay
+
+log = get_logger("agent")
+
+TIMEOUT_MESSAGE = "⏱️ Yanıt süresi aşıldı. Lütfen sorunuzu daha dar kapsamlı tekrar sorun."
+EMPTY_MESSAGE = "Üzgünüm, bir cevap oluşturamadım. Lütfen tekrar deneyin."
+
+
+def mcp_tools_to_gemini(mcp_tools: list) -> types.Tool:
+    """MCP tool tanımlarını Gemini function declaration'larına çevirir."""
+    declarations = [
+        types.FunctionDeclaration(
+            name=t.name,
+            description=t.description or "",
+            parameters_json_schema=t.inputSchema,
+        )
+        for t in mcp_tools
+    ]
+    return types.Tool(function_declarations=declarations)
+
+
+def _tool_result_to_response(result) -> dict:
+    """MCP CallToolResult → Gemini function response dict."""
+    text = "\n".join(c.text for c in (result.content or []) if getattr(c, "text", None))
+    if getattr(result, "isError", False):
+        return {"error": text}
+    return {"result": text}
+
+
+async def _run_tool(pool, call, deadline: float) -> tuple[dict, dict]:
+    """Tek bir function call'u çalıştırır; (response, trace kaydı) döner."""
+    start = time.perf_counter()
+    args = dict(call.args or {})
+    try:
+        result = await asyncio.wait_for(
+            pool.call_tool(call.name, args),
+            timeout=max(0.0, deadline - time.monotonic()),
+        )
+        response = _tool_result_to_response(result)
+        status = "hata" if "error" in response else "ok"
+    except asyncio.TimeoutError:
+        response = {"error": "tool zaman aşımı"}
+        status = "zaman_asimi"
+    except Exception as e:
+        log.error(f"Tool hatası ({call.name}): {e}")
+        response = {"error": str(e)}
+        status = "hata"
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return response, {"tur": "tool", "ad": call.name, "sure_ms": round(elapsed_ms, 1), "durum": status}
+
+
+async def run_agent(
+    client,
+    model: str,
+    contents: list,
+    system_instruction: str,
+    pool,
+    temperature: float = 0.7,
+    max_steps: int = 6,
+    deadline_sec: float = 90.0,
+) -> dict:
+    """
+    Açık function calling döngüsünü çalıştırır.
+
+    Returns:
+        {
+            "text": str,
+            "durum": "tamamlandi" | "adim_limiti" | "zaman_asimi",
+            "adim": int,
+            "trace": list[dict]   # her LLM ve tool çağrısının süresi
+        }
+    """
+    started = time.perf_counter()
+    deadline = time.monotonic() + deadline_sec
+    contents = list(contents)
+    trace = []
+
+    gemini_tool = mcp_tools_to_gemini(await pool.list_tools())
+    base_config = dict(
+        system_instruction=system_instruction,
+        temperature=temperature,
+        automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
+    )
+    tools_config = types.GenerateContentConfig(tools=[gemini_tool], **base_config)
+    # Son adımda tool kapatılır → model eldeki sonuçlarla cevap vermek zorunda
+    final_config = types.GenerateContentConfig(
+        tools=[gemini_tool],
+        tool_config=types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(mode="NONE")
+        ),
+        **base_config,
+    )
+
+    def _finish(text: str, status: str, step: int) -> dict:
+        total_ms = (time.perf_counter() - started) * 1000
+        log.info(f"Ajan bitti: durum={status}, adım={step}, toplam={total_ms:.0f} ms, "
+                 f"trace={[(t['ad'], t['sure_ms']) for t in trace]}")
+        return {"text": text, "durum": status, "adim": step, "trace": trace}
+
+    for step in range(1, max_steps + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return _finish(TIMEOUT_MESSAGE, "zaman_asimi", step - 1)
+
+        last_step = step == max_steps
+        llm_start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                genai_replay.aio_generate_content(
+                    client,
+                    model=model,
+                    contents=contents,
+                    config=final_config if last_step else tools_config,
+                ),
+                timeout=remaining,
+            )
+        except asyncio.TimeoutError:
+            trace.append({"adim": step, "tur": "llm", "ad": model,
+                          "sure_ms": round((time.perf_counter() - llm_start) * 1000, 1),
+                          "durum": "zaman_asimi"})
+            return _finish(TIMEOUT_MESSAGE, "zaman_asimi", step)
+
+        calls = response.function_calls or []
+        trace.append({"adim": step, "tur": "llm", "ad": model,
+                      "sure_ms": round((time.perf_counter() - llm_start) * 1000, 1),
+                      "durum": "ok", "tool_cagrisi": len(calls)})
+
+        if not calls:
+            # Son adımda gelen nihai cevap da tamamlanmış sayılır
+            return _finish(response.text or EMPTY_MESSAGE, "tamamlandi", step)
+        if last_step:
+            # Tool kapalıyken bile çağrı döndü → adım hakkı bitti, çağrılar çalıştırılmaz
+            return _finish(response.text or EMPTY_MESSAGE, "adim_limiti", step)
+
+        # Modelin function call turunu geçmişe ekle, tüm çağrıları paralel çalıştır
+        contents.append(response.candidates[0].content)
+        log.info(f"Adım {step}: {len(calls)} tool paralel çağrılıyor: {[c.name for c in calls]}")
+        results = await asyncio.gather(*(_run_tool(pool, c, deadline) for c in calls))
+
+        parts = []
+        for call, (tool_response, record) in zip(calls, results):
+            record["adim"] = step
+            trace.append(record)
+            parts.append(types.Part.from_function_response(name=call.name, response=tool_response))
+        contents.append(types.Content(role="user", parts=parts))
+
+    return _finish(EMPTY_MESSAGE, "adim_limiti", max_steps)
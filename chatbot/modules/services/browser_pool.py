@@ -0,0 +1,131 @@
+"""
+Headless Tarayıcı Havuzu — Crawl4AI
+====================================
+MCP Server sürecine ait, uzun ömürlü AsyncWebCrawler havuzu.
+- Eşzamanlı kullanım üst sınırı (havuz boyutu)
+- Belirli sayıda sayfadan sonra tarayıcı geri dönüşümü (bellek sızıntılarına karşı)
+- Çöken tarayıcı atılır, sonraki istekte yenisi açılır
+- Tarayıcı başlatma süresi metriği
+
+Sunucu açılışında `warmup()` ile ısıtılır; istek başına tarayıcı soğuk başlatması olmaz.
+Havuz tek bir event loop'a bağlıdır (MCP Server'ın loop'u).
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from logger import get_logger
+
+log = get_logger("browsers")
+
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+MAX_PAGES_PER_BROWSER = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+
+# Bu hata mesajları tarayıcının kendisinin çöktüğünü gösterir
+_CRASH_MARKERS = ("target closed", "browser has been closed", "browser closed", "connection closed")
+
+
+def looks_crashed(error_message: str | None) -> bool:
+    msg = (error_message or "").lower()
+    return any(marker in msg for marker in _CRASH_MARKERS)
+
+
+class BrowserPool:
+    """Sabit boyutlu, tembel başlatılan AsyncWebCrawler havuzu."""
+
+    def __init__(self, size: int = POOL_SIZE, max_pages: int = MAX_PAGES_PER_BROWSER):
+        self.size = size
+        self.max_pages = max_pages
+        self._idle: asyncio.Queue | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._metrics = {
+            "baslatma_sayisi": 0,
+            "toplam_baslatma_ms": 0.0,
+            "son_baslatma_ms": 0.0,
+            "geri_donusum": 0,
+            "cokme": 0,
+            "sayfa": 0,
+        }
+
+    def _ensure_primitives(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.size)
+
+    async def _launch(self) -> dict:
+        from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+        start = time.perf_counter()
+        crawler = AsyncWebCrawler(config=BrowserConfig(headless=True, verbose=False))
+        await crawler.start()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self._metrics["baslatma_sayisi"] += 1
+        self._metrics["toplam_baslatma_ms"] += elapsed_ms
+        self._metrics["son_baslatma_ms"] = round(elapsed_ms, 1)
+        log.info(f"🌐 Tarayıcı başlatıldı ({elapsed_ms:.0f} ms)")
+        return {"crawler": crawler, "pages": 0}
+
+    @staticmethod
+    async def _close(entry: dict):
+        try:
+            await entry["crawler"].close()
+        except Exception as e:
+            log.warning(f"Tarayıcı kapatma hatası: {e}")
+
+    async def warmup(self, count: int | None = None):
+        """Havuzu önceden doldurur (sunucu açılışında)."""
+        self._ensure_primitives()
+        for _ in range(min(count or self.size, self.size) - self._idle.qsize()):
+            try:
+                self._idle.put_nowait(await self._launch())
+            except Exception as e:
+                log.error(f"Tarayıcı ısıtma hatası: {e}")
+                break
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Havuzdan bir crawler ödünç alır. İçeride exception olursa tarayıcı atılır."""
+        self._ensure_primitives()
+        async with self._slots:
+            entry = self._idle.get_nowait() if not self._idle.empty() else await self._launch()
+            try:
+                yield entry["crawler"]
+            except BaseException:
+                self._metrics["cokme"] += 1
+                log.warning("Tarayıcı hatalı kabul edildi, kapatılıyor")
+                await self._close(entry)
+                raise
+
+            entry["pages"] += 1
+            self._metrics["sayfa"] += 1
+            if entry["pages"] >= self.max_pages:
+                self._metrics["geri_donusum"] += 1
+                log.info(f"♻️ Tarayıcı {entry['pages']} sayfa sonrası geri dönüştürülüyor")
+                await self._close(entry)
+            else:
+                self._idle.put_nowait(entry)
+
+    def metrics(self) -> dict:
+        m = dict(self._metrics)
+        total_ms = m.pop("toplam_baslatma_ms")
+        m["ort_baslatma_ms"] = round(total_ms / m["baslatma_sayisi"], 1) if m["baslatma_sayisi"] else 0.0
+        m["bos_tarayici"] = self._idle.qsize() if self._idle else 0
+        return m
+
+    async def close(self):
+        while self._idle is not None and not self._idle.empty():
+            await self._close(self._idle.get_nowait())
+
+
+_pool: BrowserPool | None = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Süreç genelinde tek tarayıcı havuzu."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
@@ -0,0 +1,113 @@
+"""
+Görsel Ön İşleme — Pillow
+==========================
+Gemini Vision'a gönderilmeden önce görselleri küçültür ve yeniden sıkıştırır:
+  1. EXIF yönünü uygula, metadata'yı at
+  2. Uzun kenarı hedef boyuta indir (büyütme yapılmaz)
+  3. JPEG veya WebP olarak belirli kalitede yeniden kodla
+
+CPU işi thread havuzunda çalışır (Pillow resize/encode sırasında GIL'i bırakır),
+event loop bloklanmaz.
+"""
+
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from logger import get_logger
+
+log = get_logger("img_prep")
+
+MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", "1280"))
+SCREENSHOT_MAX_EDGE = int(os.getenv("VISION_SCREENSHOT_MAX_EDGE", "2048"))
+OUTPUT_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "JPEG").upper()  # JPEG | WEBP
+QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "80"))
+SCREENSHOT_MAX_BYTES = int(float(os.getenv("VISION_SCREENSHOT_MAX_KB", "400")) * 1024)
+
+_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("VISION_PREP_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    thread_name_prefix="img-prep",
+)
+
+
+def preprocess_image(blob: dict, max_edge: int = MAX_EDGE, fmt: str = OUTPUT_FORMAT,
+                     quality: int = QUALITY) -> dict:
+    """Tek görseli küçültüp yeniden kodlar. Hata olursa orijinali döner."""
+    data = blob["data"]
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            resized = max(img.size) > max_edge
+            if resized:
+                img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+
+            out = io.BytesIO()
+            # exif/icc parametreleri verilmediği için metadata yazılmaz
+            img.save(out, format=fmt, quality=quality, optimize=True)
+            encoded = out.getvalue()
+    except Exception as e:
+        log.warning(f"Görsel ön işleme hatası, orijinal kullanılıyor: {e}")
+        return blob
+
+    # Küçültme gerekmediyse ve yeniden kodlama büyüttüyse orijinali koru
+    if not resized and len(encoded) >= len(data):
+        return blob
+    return {"mime_type": _MIME.get(fmt, "image/jpeg"), "data": encoded}
+
+
+async def preprocess_images(blobs: list[dict], max_edge: int = MAX_EDGE) -> list[dict]:
+    """Görselleri thread havuzunda paralel ön işler; sıra korunur."""
+    if not blobs:
+        return []
+    loop = asyncio.get_running_loop()
+    before = sum(len(b["data"]) for b in blobs)
+    results = await asyncio.gather(*(
+        loop.run_in_executor(_executor, preprocess_image, b, max_edge) for b in blobs
+    ))
+    after = sum(len(b["data"]) for b in results)
+    log.info(f"Ön işleme: {len(blobs)} görsel, {before / 1024:.0f} KB → {after / 1024:.0f} KB")
+    return list(results)
+
+
+def fit_to_budget(blob: dict, max_bytes: int = SCREENSHOT_MAX_BYTES, max_edge: int = SCREENSHOT_MAX_EDGE,
+                  fmt: str = OUTPUT_FORMAT) -> dict | None:
+    """Görseli bayt bütçesine sığana kadar önce kaliteyi, sonra boyutu düşürerek kodlar.
+
+    En düşük ayarda bile sığmazsa veya çözülemezse None döner (görsel atılır).
+    """
+    try:
+        with Image.open(io.BytesIO(blob["data"])) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            edge = min(max_edge, max(img.size))
+            while edge >= 480:
+                scaled = img.copy()
+                scaled.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+                for quality in (QUALITY, 65, 50, 35):
+                    out = io.BytesIO()
+                    scaled.save(out, format=fmt, quality=quality, optimize=True)
+                    if out.tell() <= max_bytes:
+                        return {"mime_type": _MIME.get(fmt, "image/jpeg"), "data": out.getvalue()}
+                edge = int(edge * 0.75)
+    except Exception as e:
+        log.warning(f"Screenshot kodlama hatası: {e}")
+        return None
+    log.warning(f"Screenshot {max_bytes / 1024:.0f} KB bütçeye sığmadı, atlandı")
+    return None
+
+
+async def fit_screenshot(blob: dict | None, max_bytes: int = SCREENSHOT_MAX_BYTES) -> dict | None:
+    """Screenshot'ı thread havuzunda bayt bütçesine sığdırır."""
+    if blob is None:
+        return None
+    fitted = await asyncio.get_running_loop().run_in_executor(_executor, fit_to_budget, blob, max_bytes)
+    if fitted:
+        log.info(f"Screenshot: {len(blob['data']) / 1024:.0f} KB → {len(fitted['data']) / 1024:.0f} KB")
+    return fitted
@@ -0,0 +1,121 @@
+"""
+Galeri Görseli Seçimi — Algısal Hash
+=====================================
+İndirilen aday görsellerden Gemini'ye gidecek küçük, çeşitli bir alt küme seçer:
+  1. Her görsel için dHash (64 bit fark hash'i) hesapla
+  2. Hamming mesafesi eşiğin altındaki neredeyse aynı kareleri ele
+  3. Önce her kategoriden (dış, iç, jant, motor) birer kare al,
+     sonra kalan bütçeyi seçilenlere en uzak karelerle doldur (greedy max-min)
+
+Kategori ipuçları URL ve alt metinden gelir; ipucu yoksa seçim yalnızca
+görsel farklılığa dayanır. Seçilenler galerideki orijinal sırasıyla döner.
+"""
+
+import asyncio
+import io
+import os
+
+from PIL import Image
+
+from logger import get_logger
+
+log = get_logger("img_select")
+
+DUP_THRESHOLD = int(os.getenv("VISION_DUP_THRESHOLD", "10"))  # 64 bitten kaç bit farka kadar "aynı"
+
+_CATEGORY_KEYWORDS = {
+    "ic": ("ic-mekan", "icmekan", "interior", "koltuk", "torpido", "gosterge", "direksiyon", "kabin"),
+    "jant": ("jant", "lastik", "wheel", "tekerlek"),
+    "motor": ("motor", "engine", "kaput-ici"),
+    "dis": ("dis-gorunum", "exterior", "on-gorunum", "arka-gorunum", "yan-gorunum", "kaporta"),
+}
+
+_TR_ASCII = str.maketrans("çğıöşüÇĞİÖŞÜ ", "cgiosuCGIOSU-")
+
+
+def category_hint(url: str, alt: str = "") -> str | None:
+    """URL ve alt metindeki anahtar kelimelerden kare kategorisini tahmin eder."""
+    text = f"{url} {alt}".translate(_TR_ASCII).lower()
+    for category, keywords in _CATEGORY_KEYWORDS.items():
+        if any(k in text for k in keywords):
+            return category
+    return None
+
+
+def dhash(data: bytes, size: int = 8) -> int | None:
+    """Görselin fark hash'i: gri tonlamalı (size+1)×size küçültmede yatay komşu karşılaştırması."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("L", (size * 4, size * 4))  # JPEG'de tam çözmeden küçük ölçekli okuma
+            small = img.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+            pixels = list(small.getdata())
+    except Exception as e:
+        log.warning(f"dHash hesaplanamadı: {e}")
+        return None
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def select_diverse(hashes: list[int | None], categories: list[str | None], budget: int,
+                   threshold: int = DUP_THRESHOLD) -> list[int]:
+    """Aday indekslerinden neredeyse aynıları eleyip çeşitli en fazla `budget` tanesini seçer.
+
+    Hash'i hesaplanamayan adaylar tekil kabul edilir. Dönen indeksler artan sıradadır.
+    """
+    # 1. Neredeyse aynıları ele (galeri sırası öncelikli: ilk görülen kalır)
+    unique = []
+    for i, h in enumerate(hashes):
+        if h is not None and any(hashes[j] is not None and hamming(h, hashes[j]) <= threshold for j in unique):
+            continue
+        unique.append(i)
+    if len(unique) <= budget:
+        return unique
+
+    def distance(i: int, chosen: list[int]) -> int:
+        if hashes[i] is None:
+            return 0
+        known = [hashes[j] for j in chosen if hashes[j] is not None]
+        return min((hamming(hashes[i], h) for h in known), default=64)
+
+    # 2. Her kategoriden ilk kare (kapak fotoğrafı her zaman ilk sırada)
+    chosen = [unique[0]]
+    seen = {categories[unique[0]]}
+    for i in unique[1:]:
+        if len(chosen) >= budget:
+            break
+        if categories[i] is not None and categories[i] not in seen:
+            chosen.append(i)
+            seen.add(categories[i])
+
+    # 3. Kalan bütçe: seçilenlere en uzak aday (greedy max-min)
+    rest = [i for i in unique if i not in chosen]
+    while len(chosen) < budget and rest:
+        best = max(rest, key=lambda i: distance(i, chosen))
+        chosen.append(best)
+        rest.remove(best)
+
+    return sorted(chosen)
+
+
+async def select_images(images: list[dict], urls: list[str], budget: int,
+                        alts: dict[str, str] | None = None) -> tuple[list[dict], list[str]]:
+    """İndirilmiş aday görsellerden çeşitli bir alt küme seçer; (görseller, url'ler) döner."""
+    if len(images) <= 1:
+        return images[:budget], urls[:budget]
+
+    hashes = await asyncio.gather(*(asyncio.to_thread(dhash, img["data"]) for img in images))
+    categories = [category_hint(u, (alts or {}).get(u, "")) for u in urls]
+    picked = select_diverse(list(hashes), categories, budget)
+
+    log.info(f"Görsel seçimi: {len(images)} aday → {len(picked)} görsel "
+             f"(kategoriler: {[categories[i] or '-' for i in picked]})")
+    return [images[i] for i in picked], [urls[i] for i in picked]
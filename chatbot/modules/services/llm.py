@@ -9,6 +9,7 @@ import os
 import re
 import google.generativeai as genai
 from logger import get_logger
+import genai_replay
 
 log = get_logger("llm")
 
@@ -116,5 +117,5 @@ Bu sonuçları kullanıcıya Türkçe olarak doğal ve anlaşılır bir şekilde
 - Eğer veriden ilginç bir çıkarım yapılabiliyorsa ekle.
 - Emoji kullanabilirsin."""
 
-    response = chat.send_message(summary_prompt)
+    response = genai_replay.send_message(chat, summary_prompt)
     return response.text
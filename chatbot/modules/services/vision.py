@@ -5,43 +5,288 @@ Kullanıcının verdiği ilan URL'sindeki fotoğrafları Crawl4AI ile çeker,
 Gemini 2.0 Flash Vision ile analiz eder.
 
 Akış:
-  1. Crawl4AI → URL'ye git, screenshot + görselleri topla
-  2. Görselleri base64'e çevir
-  3. Gemini Vision'a gönder → detaylı Türkçe analiz al
+  1. Önce statik HTML (httpx + BeautifulSoup) → galeri URL'leri
+     Yetmezse Crawl4AI → URL'ye git, screenshot + görselleri topla
+  2. Görselleri ham bayt + MIME tipi olarak taşı (base64 yok)
+  3. Pillow ile küçült + yeniden sıkıştır (image_prep)
+  4. Gemini Vision'a gönder → detaylı Türkçe analiz al
+
+Görseller boru hattı boyunca {"mime_type": str, "data": bytes} dict'leri olarak
+taşınır; bu, Gemini SDK'nın doğrudan kabul ettiği blob formatıdır.
 """
 
 import os
+import re
 import asyncio
 import base64
+import io
 import json
+from typing import Callable
+
 import httpx
+from bs4 import BeautifulSoup
+from PIL import Image
 from logger import get_logger
+import genai_replay
+from image_prep import preprocess_images, fit_screenshot
+from image_select import select_images
+from vision_cache import get_vision_cache, listing_id_from_url, images_hash
+from browser_pool import get_browser_pool, looks_crashed
 
 log = get_logger("vision")
 
 
+# Görsel indirme sınırları
+MAX_IMAGE_BYTES = int(os.getenv("VISION_MAX_IMAGE_BYTES", str(5 * 1024 * 1024)))
+DOWNLOAD_CONCURRENCY = int(os.getenv("VISION_DOWNLOAD_CONCURRENCY", "5"))
+DOWNLOAD_BUDGET_SEC = float(os.getenv("VISION_DOWNLOAD_BUDGET_SEC", "8"))
+
+# Bu süre içinde analiz edilmiş ilan için sayfa hiç crawl edilmez
+VISION_RECHECK_SEC = float(os.getenv("VISION_RECHECK_SEC", "900"))
+
+# Statik HTML hızlı yolu: en az bu kadar galeri görseli bulunursa tarayıcı açılmaz
+STATIC_FIRST = os.getenv("VISION_STATIC_FIRST", "1") == "1"
+STATIC_MIN_IMAGES = int(os.getenv("VISION_STATIC_MIN_IMAGES", "3"))
+MAX_SELECTED_IMAGES = 5
+# Seçim öncesi indirilen aday sayısı; algısal hash ile MAX_SELECTED_IMAGES'e indirilir
+CANDIDATE_IMAGES = int(os.getenv("VISION_CANDIDATE_IMAGES", "12"))
+
+# Screenshot modu: off | viewport | region (ilan içerik alanı) | full (tam sayfa)
+SCREENSHOT_MODE = os.getenv("VISION_SCREENSHOT_MODE", "region").lower()
+SCREENSHOT_SELECTOR = os.getenv(
+    "VISION_SCREENSHOT_SELECTOR",
+    ".product-detail-wrapper, .classified-detail, #classifiedDetail, main",
+)
+SCREENSHOT_QUALITY = int(os.getenv("VISION_SCREENSHOT_QUALITY", "70"))
+
+UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+      "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+
+def detect_mime(data: bytes) -> str | None:
+    """Görsel baytlarının MIME tipi: önce dosya imzası, tanınmazsa Pillow'un okuyabildiği format."""
+    head = data[:12]
+    if head[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return Image.MIME.get(img.format)
+    except Exception:
+        return None
+
+
+def _no_progress(stage: str):
+    pass
+
+
+def _empty_crawl(error: str) -> dict:
+    return {
+        "hata": error,
+        "screenshot": None,
+        "images": [],
+        "image_urls": [],
+        "page_title": "",
+        "page_text": "",
+    }
+
+
+def _is_junk_image(src: str) -> bool:
+    """Logo, ikon, placeholder ve avatarları eler."""
+    low = src.lower()
+    return not src or any(w in low for w in ("logo", "icon", "placeholder", "avatar"))
+
+
+# ─────────────── STATİK HTML HIZLI YOLU ───────────────
+
+# arabam.com galeri fotoğrafları: .../ilanfotograflari/YYYY/MM/DD/<ilan_no>/<ad>_<G>x<Y>.jpg
+_PHOTO_URL = re.compile(
+    r"https?://[^\s\"'<>]+?/ilanfotograflari/[^\s\"'<>]+?\.(?:jpe?g|png|webp)", re.IGNORECASE
+)
+_SIZE_SUFFIX = re.compile(r"_(\d+)x(\d+)(\.\w+)$")
+
+
+def _size_base(url: str) -> str:
+    """Boyut ekini (_800x600) atılmış URL; aynı fotoğrafın varyantlarını eşler."""
+    m = _SIZE_SUFFIX.search(url)
+    return url[:m.start()] + m.group(3) if m else url
+
+
+def _pick_gallery_urls(candidates: list[str], max_width: int = 1920) -> list[str]:
+    """Aynı fotoğrafın farklı boyutlarından en büyük uygun olanı seçer, sırayı korur."""
+    best: dict[str, tuple[int, str]] = {}
+    order = []
+    for url in candidates:
+        if _is_junk_image(url):
+            continue
+        m = _SIZE_SUFFIX.search(url)
+        base = _size_base(url)
+        width = int(m.group(1)) if m else 0
+        if base not in best:
+            order.append(base)
+            best[base] = (width, url)
+        elif best[base][0] < width <= max_width or best[base][0] > max_width >= width:
+            best[base] = (width, url)
+    return [best[b][1] for b in order]
+
+
+def _extract_description(soup: BeautifulSoup) -> str:
+    """'Açıklama' başlığı altındaki metni çıkarır (scraper ile aynı mantık)."""
+    for h in soup.find_all(["h5", "h4", "h3", "h2"]):
+        if h.get_text(strip=True) == "Açıklama":
+            texts = []
+            for sib in h.find_next_siblings():
+                if sib.name in ["h2", "h3", "h4", "h5"]:
+                    break
+                txt = sib.get_text(separator="\n", strip=True)
+                if txt:
+                    texts.append(txt)
+            if texts:
+                return "\n".join(texts)
+    for sel in ["#TextContent", ".detail-description", "[class*='description']"]:
+        el = soup.select_one(sel)
+        if el:
+            return el.get_text(separator="\n", strip=True)
+    return ""
+
+
+async def fetch_listing_static(url: str) -> dict | None:
+    """
+    İlan sayfasını düz HTTP ile çekip galeri URL'lerini HTML'den / gömülü JSON'dan çıkarır.
+    Yeterli görsel bulunamazsa None döner (tarayıcıya düşülür).
+    """
+    try:
+        async with httpx.AsyncClient(
+            timeout=10.0, follow_redirects=True,
+            headers={"User-Agent": UA, "Accept-Language": "tr-TR,tr;q=0.9"},
+        ) as client:
+            resp = await client.get(url)
+        if resp.status_code != 200:
+            log.info(f"Statik yol HTTP {resp.status_code}, tarayıcıya düşülüyor")
+            return None
+        html = resp.text
+    except Exception as e:
+        log.info(f"Statik yol hatası ({e}), tarayıcıya düşülüyor")
+        return None
+
+    soup = BeautifulSoup(html, "lxml")
+
+    candidates = []
+    alts = {}
+    # 1. <img> etiketleri (lazy-load nitelikleri dahil)
+    for img in soup.find_all("img"):
+        for attr in ("data-src", "data-lazy", "data-original", "src"):
+            src = img.get(attr)
+            if src and "/ilanfotograflari/" in src:
+                candidates.append(src)
+                if img.get("alt"):
+                    alts[_size_base(src)] = img["alt"]
+                break
+    # 2. JSON-LD "image" alanı
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except (ValueError, TypeError):
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            image = item.get("image") if isinstance(item, dict) else None
+            candidates.extend([image] if isinstance(image, str) else (image or []))
+    # 3. Sayfaya gömülü JSON / script içindeki fotoğraf URL'leri
+    candidates.extend(_PHOTO_URL.findall(html.replace("\\/", "/")))
+
+    listing_no = re.search(r"/(\d{5,})(?:[/?#]|$)", url)
+    if listing_no:
+        own = [c for c in candidates if isinstance(c, str) and listing_no.group(1) in c]
+        candidates = own or candidates
+
+    image_urls = _pick_gallery_urls([c for c in candidates if isinstance(c, str)])
+    if len(image_urls) < STATIC_MIN_IMAGES:
+        log.info(f"Statik yol: {len(image_urls)} görsel yetersiz, tarayıcıya düşülüyor")
+        return None
+
+    h1 = soup.find("h1")
+    title = h1.get_text(strip=True) if h1 else (soup.title.get_text(strip=True) if soup.title else "")
+    log.info(f"⚡ Statik yol: {len(image_urls)} galeri görseli bulundu")
+    return {
+        "image_urls": image_urls,
+        "image_alts": {u: alts[_size_base(u)] for u in image_urls if _size_base(u) in alts},
+        "page_title": title,
+        "page_text": _extract_description(soup),
+    }
+
+
 # ─────────────── CRAWL4AI İLE GÖRSEL TOPLAMA ───────────────
 
-async def crawl_listing_images(url: str) -> dict:
+async def crawl_listing_images(url: str, progress: Callable[[str], None] | None = None) -> dict:
     """
-    Verilen ilan URL'sine Crawl4AI ile gidip görselleri ve screenshot'u toplar.
+    İlan URL'sindeki görselleri toplar. Önce statik HTML hızlı yolu denenir;
+    yeterli görsel çıkmazsa Crawl4AI ile tarayıcıda açılır (screenshot dahil).
 
     Returns:
         {
-            "screenshot_b64": str | None,
-            "images_b64": list[str],
+            "screenshot": {"mime_type": str, "data": bytes} | None,
+            "images": list[{"mime_type": str, "data": bytes}],
             "image_urls": list[str],
             "page_title": str,
             "page_text": str       # ilan açıklama metni (markdown)
         }
+
+    `progress` verilirse aşama adlarıyla çağrılır ("sayfa_cekiliyor", "gorseller_indiriliyor").
     """
-    from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, CacheMode
+    progress = progress or _no_progress
+    progress("sayfa_cekiliyor")
+    if STATIC_FIRST:
+        static = await fetch_listing_static(url)
+        if static:
+            progress("gorseller_indiriliyor")
+            images, image_urls = await _download_images(static["image_urls"][:CANDIDATE_IMAGES])
+            images, image_urls = await select_images(
+                images, image_urls, MAX_SELECTED_IMAGES, static["image_alts"])
+            if images:
+                return {
+                    "screenshot": None,
+                    "images": images,
+                    "image_urls": image_urls,
+                    "page_title": static["page_title"],
+                    "page_text": static["page_text"][:2000],
+                }
+            log.info("Statik yol görselleri indirilemedi, tarayıcıya düşülüyor")
+
+    return await _crawl_with_browser(url, progress)
+
+
+async def _crawl_with_browser(url: str, progress: Callable[[str], None] | None = None) -> dict:
+    """Crawl4AI ile sayfayı tarayıcıda açar. Tarayıcı ısıtılmış havuzdan ödünç alınır."""
+    from crawl4ai import CrawlerRunConfig, CacheMode
+
+    log.info(f"Crawl başlatılıyor: {url} (screenshot: {SCREENSHOT_MODE})")
 
-    log.info(f"Crawl başlatılıyor: {url}")
+    # viewport/region modunda Crawl4AI'nin tam sayfa PNG'si yerine hook içinde JPEG alınır
+    captured: dict = {}
+
+    # Bazı crawl4ai sürümleri html'i konumsal, bazıları anahtar kelimeyle geçirir
+    async def capture_screenshot(page, *args, **kwargs):
+        try:
+            if SCREENSHOT_MODE == "region":
+                region = page.locator(SCREENSHOT_SELECTOR).first
+                if await region.count():
+                    captured["data"] = await region.screenshot(
+                        type="jpeg", quality=SCREENSHOT_QUALITY, timeout=5000)
+                    return page
+            await page.evaluate("window.scrollTo(0, 0)")
+            captured["data"] = await page.screenshot(type="jpeg", quality=SCREENSHOT_QUALITY)
+        except Exception as e:
+            log.warning(f"Screenshot alınamadı: {e}")
+        return page
 
     run_config = CrawlerRunConfig(
         cache_mode=CacheMode.BYPASS,
-        screenshot=True,
+        screenshot=SCREENSHOT_MODE == "full",
         screenshot_wait_for=2.0,
         wait_for_images=True,
         scan_full_page=True,
@@ -50,106 +295,191 @@ async def crawl_listing_images(url: str) -> dict:
     )
 
     try:
-        async with AsyncWebCrawler() as crawler:
+        async with get_browser_pool().acquire() as crawler:
+            # Crawler bu istek boyunca bize ait; hook her istekte yeniden bağlanır
+            crawler.crawler_strategy.set_hook(
+                "before_return_html",
+                capture_screenshot if SCREENSHOT_MODE in ("viewport", "region") else None,
+            )
             result = await crawler.arun(url=url, config=run_config)
 
-            if not result.success:
-                log.error(f"Crawl başarısız: {result.error_message}")
-                return {
-                    "hata": f"Sayfa yüklenemedi: {result.error_message}",
-                    "screenshot_b64": None,
-                    "images_b64": [],
-                    "image_urls": [],
-                    "page_title": "",
-                    "page_text": "",
-                }
-
-            # Screenshot (base64)
-            screenshot_b64 = result.screenshot if result.screenshot else None
-            log.info(f"Screenshot: {'✅' if screenshot_b64 else '❌'}")
-
-            # Sayfa başlığı ve metni
-            page_title = ""
-            if hasattr(result, 'metadata') and result.metadata:
-                page_title = result.metadata.get("title", "")
-            page_text = result.markdown_v2.raw_markdown if hasattr(result, 'markdown_v2') and result.markdown_v2 else (result.markdown or "")
-
-            # Görselleri topla
-            all_images = result.media.get("images", []) if result.media else []
-            log.info(f"Toplam {len(all_images)} görsel bulundu")
-
-            # Kaliteli görselleri filtrele (score > 3, küçük ikonları atla)
-            quality_images = []
-            for img in all_images:
-                src = img.get("src", "")
-                score = img.get("score", 0)
-                # Küçük ikonları, logo'ları ve placeholder'ları atla
-                if not src or "logo" in src.lower() or "icon" in src.lower():
-                    continue
-                if "placeholder" in src.lower() or "avatar" in src.lower():
-                    continue
-                if score is not None and score >= 2:
-                    quality_images.append(img)
-                elif score is None:
-                    # Score yoksa da ekle
-                    quality_images.append(img)
-
-            # En iyi 5 görseli seç (skora göre)
-            quality_images.sort(key=lambda x: x.get("score", 0), reverse=True)
-            selected = quality_images[:5]
-            log.info(f"Seçilen görsel sayısı: {len(selected)}")
-
-            # Görselleri indir ve base64'e çevir
-            image_urls = [img["src"] for img in selected]
-            images_b64 = await _download_images_as_base64(image_urls)
-
-            return {
-                "screenshot_b64": screenshot_b64,
-                "images_b64": images_b64,
-                "image_urls": image_urls,
-                "page_title": page_title,
-                "page_text": page_text[:2000],  # İlk 2000 karakter yeterli
-            }
-
+            # Tarayıcı çöktüyse havuzun onu atması için exception fırlat
+            if not result.success and looks_crashed(result.error_message):
+                raise RuntimeError(f"Tarayıcı çöktü: {result.error_message}")
     except Exception as e:
         log.error(f"Crawl hatası: {e}")
-        return {
-            "hata": str(e),
-            "screenshot_b64": None,
-            "images_b64": [],
-            "image_urls": [],
-            "page_title": "",
-            "page_text": "",
-        }
+        return _empty_crawl(str(e))
+
+    # Buradan sonrası tarayıcıyı tutmaz; havuza geri verildi
+    if not result.success:
+        log.error(f"Crawl başarısız: {result.error_message}")
+        return _empty_crawl(f"Sayfa yüklenemedi: {result.error_message}")
+
+    # Screenshot — hook'tan JPEG ya da (full modda) Crawl4AI'nin base64 PNG'si;
+    # her durumda bayt bütçesine sığdırılır, ham hâli hemen bırakılır
+    screenshot = None
+    shot_bytes = captured.pop("data", None)
+    if shot_bytes is None and result.screenshot:
+        try:
+            shot_bytes = base64.b64decode(result.screenshot)
+        except Exception as e:
+            log.warning(f"Screenshot decode hatası: {e}")
+    result.screenshot = None
+    if shot_bytes:
+        screenshot = await fit_screenshot(
+            {"mime_type": detect_mime(shot_bytes) or "image/png", "data": shot_bytes})
+        del shot_bytes
+    log.info(f"Screenshot: {'✅' if screenshot else '❌'}")
+
+    # Sayfa başlığı ve metni
+    page_title = ""
+    if hasattr(result, 'metadata') and result.metadata:
+        page_title = result.metadata.get("title", "")
+    page_text = result.markdown_v2.raw_markdown if hasattr(result, 'markdown_v2') and result.markdown_v2 else (result.markdown or "")
+
+    # Görselleri topla
+    all_images = result.media.get("images", []) if result.media else []
+    log.info(f"Toplam {len(all_images)} görsel bulundu")
+
+    # Kaliteli görselleri filtrele (score >= 2, küçük ikonları atla)
+    quality_images = []
+    for img in all_images:
+        if _is_junk_image(img.get("src", "")):
+            continue
+        score = img.get("score", 0)
+        if score is None or score >= 2:
+            # Score yoksa da ekle
+            quality_images.append(img)
+
+    # Skora göre en iyi adayları indir, sonra algısal hash ile çeşitli alt küme seç
+    quality_images.sort(key=lambda x: x.get("score") or 0, reverse=True)
+    candidates = quality_images[:CANDIDATE_IMAGES]
+    log.info(f"Aday görsel sayısı: {len(candidates)}")
+
+    (progress or _no_progress)("gorseller_indiriliyor")
+    images, image_urls = await _download_images([img["src"] for img in candidates])
+    alts = {img["src"]: img.get("alt") or "" for img in candidates}
+    images, image_urls = await select_images(images, image_urls, MAX_SELECTED_IMAGES, alts)
+
+    return {
+        "screenshot": screenshot,
+        "images": images,
+        "image_urls": image_urls,
+        "page_title": page_title,
+        "page_text": page_text[:2000],  # İlk 2000 karakter yeterli
+    }
 
 
-async def _download_images_as_base64(urls: list[str]) -> list[str]:
-    """Görsel URL'lerini indirip base64 string olarak döner."""
-    results = []
-    async with httpx.AsyncClient(timeout=15.0, follow_redirects=True) as client:
-        for url in urls:
-            try:
-                resp = await client.get(url)
-                if resp.status_code == 200 and resp.headers.get("content-type", "").startswith("image"):
-                    b64 = base64.b64encode(resp.content).decode("utf-8")
-                    results.append(b64)
-                    log.info(f"  ✅ İndirildi: {url[:80]}...")
-                else:
+async def _fetch_image(client: httpx.AsyncClient, sem: asyncio.Semaphore, url: str) -> bytes | None:
+    """Tek görseli stream ederek indirir; bayt sınırı aşılırsa yarıda keser."""
+    async with sem:
+        try:
+            async with client.stream("GET", url) as resp:
+                if resp.status_code != 200 or not resp.headers.get("content-type", "").startswith("image"):
                     log.warning(f"  ⚠️ Atlandı ({resp.status_code}): {url[:80]}...")
-            except Exception as e:
-                log.warning(f"  ❌ İndirme hatası: {e} — {url[:80]}")
-    return results
+                    return None
+                declared = int(resp.headers.get("content-length") or 0)
+                if declared > MAX_IMAGE_BYTES:
+                    log.warning(f"  ⚠️ Çok büyük ({declared} bayt): {url[:80]}...")
+                    return None
+                chunks, size = [], 0
+                async for chunk in resp.aiter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > MAX_IMAGE_BYTES:
+                        log.warning(f"  ⚠️ Bayt sınırı aşıldı (>{MAX_IMAGE_BYTES}): {url[:80]}...")
+                        return None
+                log.info(f"  ✅ İndirildi ({size} bayt): {url[:80]}...")
+                return b"".join(chunks)
+        except Exception as e:
+            log.warning(f"  ❌ İndirme hatası: {e} — {url[:80]}")
+            return None
+
+
+async def _download_images(urls: list[str]) -> tuple[list[dict], list[str]]:
+    """Görsel URL'lerini eşzamanlı indirir.
+
+    En fazla DOWNLOAD_CONCURRENCY görsel aynı anda indirilir; toplam süre
+    DOWNLOAD_BUDGET_SEC'i aşarsa bitmemiş görseller atılır. Sıra korunur.
+
+    Returns:
+        ({"mime_type", "data"} listesi, başarıyla indirilen URL'ler) — aynı sırada
+    """
+    if not urls:
+        return [], []
+    sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    async with httpx.AsyncClient(timeout=15.0, follow_redirects=True) as client:
+        tasks = [asyncio.create_task(_fetch_image(client, sem, url)) for url in urls]
+        done, pending = await asyncio.wait(tasks, timeout=DOWNLOAD_BUDGET_SEC)
+        if pending:
+            log.warning(f"  ⏱️ Süre bütçesi ({DOWNLOAD_BUDGET_SEC}s) doldu, {len(pending)} görsel atlandı")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    results, ok_urls = [], []
+    for url, task in zip(urls, tasks):
+        data = task.result() if task in done else None
+        if not data:
+            continue
+        mime = detect_mime(data)
+        if mime is None:
+            # Atmak galeriyi sessizce boşaltabilir; eski davranış gibi JPEG varsayılır
+            log.warning(f"  ⚠️ Tanınmayan görsel formatı, image/jpeg varsayıldı: {url}")
+            mime = "image/jpeg"
+        results.append({"mime_type": mime, "data": data})
+        ok_urls.append(url)
+    return results, ok_urls
 
 
 # ─────────────── GEMİNİ VİSİON ANALİZİ ───────────────
 
+# Analizin sonundaki JSON bloğunda istenen hasar/durum bayrakları
+DAMAGE_FLAGS = (
+    "boya_farki", "ezik_cizik", "pas", "ic_mekan_asinma",
+    "sigara_yanigi", "kaza_belirtisi", "tutarsizlik",
+)
+
+_JSON_SCHEMA_HINT = "{" + ", ".join(
+    ['"skor": <1-10 tamsayı>'] + [f'"{f}": <true|false|null>' for f in DAMAGE_FLAGS]
+) + "}"
+
+_JSON_BLOCK = re.compile(r"```json\s*(\{.*?\})\s*```\s*$", re.DOTALL)
+
+
+def parse_structured(analysis: str) -> tuple[str, dict | None]:
+    """Analiz metninin sonundaki JSON bloğunu ayırır: (okunur metin, {"skor", bayraklar...}).
+
+    Blok yoksa veya bozuksa metin olduğu gibi, yapısal alan None döner.
+    """
+    m = _JSON_BLOCK.search(analysis.strip())
+    if not m:
+        return analysis, None
+    try:
+        data = json.loads(m.group(1))
+    except ValueError:
+        return analysis, None
+
+    structured = {}
+    try:
+        skor = int(data.get("skor"))
+        structured["skor"] = skor if 1 <= skor <= 10 else None
+    except (TypeError, ValueError):
+        structured["skor"] = None
+    for flag in DAMAGE_FLAGS:
+        value = data.get(flag)
+        structured[flag] = value if isinstance(value, bool) else None
+    return analysis.strip()[:m.start()].rstrip(), structured
+
+
 async def analyze_images_with_gemini(
-    images_b64: list[str],
-    screenshot_b64: str | None,
+    images: list[dict],
+    screenshot: dict | None,
     page_text: str = "",
 ) -> str:
     """
     Görselleri Gemini 2.0 Flash Vision'a gönderip Türkçe analiz alır.
+    Görseller {"mime_type", "data"} blob'ları olarak doğrudan SDK'ya verilir.
     """
     import google.generativeai as genai
 
@@ -178,38 +508,15 @@ Görselleri dikkatle incele ve şu başlıklarda detaylı analiz yap:
 - Net ve dürüst ol, abartma ama gizleme de
 - Emoji kullanarak okunabilirliği artır
 - Sonuçta 1-10 arası bir "Görsel Güvenilirlik Skoru" ver
+- En sona şu alanlarla tek bir ```json kod bloğu ekle (tespit edildiyse true, görülmediyse false, emin değilsen null):
+  {_JSON_SCHEMA_HINT}
 """
 
-    # Görselleri hazırla
+    # Görselleri hazırla (screenshot + en fazla 5 galeri görseli)
     parts = [prompt]
-
-    # Screenshot'u ekle
-    if screenshot_b64:
-        try:
-            img_bytes = base64.b64decode(screenshot_b64)
-            parts.append({
-                "mime_type": "image/png",
-                "data": img_bytes,
-            })
-        except Exception as e:
-            log.warning(f"Screenshot decode hatası: {e}")
-
-    # Galeri görsellerini ekle
-    for i, img_b64 in enumerate(images_b64[:5]):
-        try:
-            img_bytes = base64.b64decode(img_b64)
-            # MIME type tahmini (çoğu JPEG olacak)
-            mime = "image/jpeg"
-            if img_bytes[:4] == b'\x89PNG':
-                mime = "image/png"
-            elif img_bytes[:4] == b'RIFF':
-                mime = "image/webp"
-            parts.append({
-                "mime_type": mime,
-                "data": img_bytes,
-            })
-        except Exception as e:
-            log.warning(f"Görsel {i} decode hatası: {e}")
+    if screenshot:
+        parts.append(screenshot)
+    parts.extend(images[:5])
 
     if len(parts) < 2:
         return "❌ Analiz edilecek görsel bulunamadı."
@@ -217,7 +524,8 @@ Görselleri dikkatle incele ve şu başlıklarda detaylı analiz yap:
     log.info(f"Gemini Vision'a {len(parts) - 1} görsel gönderiliyor...")
 
     try:
-        response = model.generate_content(parts)
+        # Senkron SDK çağrısı event loop'u bloklamasın
+        response = await asyncio.to_thread(genai_replay.generate_content, model, parts, "vision")
         analysis = response.text
         log.info(f"Gemini analiz tamamlandı ({len(analysis)} karakter)")
         return analysis
@@ -228,7 +536,7 @@ Görselleri dikkatle incele ve şu başlıklarda detaylı analiz yap:
 
 # ─────────────── ÜST SEVİYE FONKSİYON ───────────────
 
-async def analyze_listing(url: str) -> dict:
+async def analyze_listing(url: str, progress: Callable[[str], None] | None = None) -> dict:
     """
     Üst seviye fonksiyon: URL'den görselleri çek + Gemini Vision ile analiz et.
 
@@ -237,17 +545,33 @@ async def analyze_listing(url: str) -> dict:
             "url": str,
             "page_title": str,
             "gorsel_sayisi": int,
-            "screenshot_b64": str | None,
+            "screenshot": {"mime_type": str, "data": bytes} | None,
             "analiz": str,
-            "image_urls": list[str]
+            "image_urls": list[str],
+            "yapisal": {"skor": int|None, <DAMAGE_FLAGS>: bool|None} | None,
+            "onbellek": bool        # sonuç önbellekten mi geldi
         }
+
+    Sonuçlar ilan numarası + görsel içerik özeti ile diskte önbelleklenir;
+    fotoğraflar değişmediyse Gemini çağrılmaz. `progress` verilirse her aşamada
+    aşama adıyla çağrılır (iş kuyruğu durum takibi için).
     """
+    progress = progress or _no_progress
     log.info(f"=== İlan Görsel Analizi Başlıyor: {url} ===")
 
+    cache = get_vision_cache()
+    listing_id = listing_id_from_url(url)
+
+    # 0. Yakın zamanda analiz edildiyse crawl'u da atla
+    recent = cache.get_recent(listing_id, VISION_RECHECK_SEC)
+    if recent:
+        log.info(f"=== Önbellekten (yakın zamanlı): {listing_id} ===")
+        return {**recent, "url": url, "screenshot": None, "onbellek": True}
+
     # 1. Görselleri crawl et
-    crawl_data = await crawl_listing_images(url)
+    crawl_data = await crawl_listing_images(url, progress)
 
-    if "hata" in crawl_data and not crawl_data["images_b64"] and not crawl_data["screenshot_b64"]:
+    if "hata" in crawl_data and not crawl_data["images"] and not crawl_data["screenshot"]:
         return {
             "url": url,
             "hata": crawl_data["hata"],
@@ -255,21 +579,42 @@ async def analyze_listing(url: str) -> dict:
             "analiz": f"❌ Sayfa crawl edilemedi: {crawl_data['hata']}",
         }
 
-    # 2. Gemini Vision ile analiz et
+    # Fotoğraflar değişmediyse önceki analizi kullan
+    img_hash = images_hash(crawl_data["images"]) if crawl_data["images"] else None
+    if img_hash:
+        cached = cache.get(listing_id, img_hash)
+        if cached:
+            log.info(f"=== Önbellekten (aynı fotoğraflar): {listing_id} ===")
+            return {**cached, "url": url, "screenshot": None, "onbellek": True}
+
+    # 2. Görselleri küçült + yeniden sıkıştır (thread havuzunda)
+    progress("gorseller_isleniyor")
+    images = await preprocess_images(crawl_data["images"])
+    screenshot = crawl_data["screenshot"]  # crawl sırasında bütçeye sığdırıldı
+
+    # 3. Gemini Vision ile analiz et
+    progress("analiz_ediliyor")
     analysis = await analyze_images_with_gemini(
-        images_b64=crawl_data["images_b64"],
-        screenshot_b64=crawl_data["screenshot_b64"],
+        images=images,
+        screenshot=screenshot,
         page_text=crawl_data["page_text"],
     )
 
+    analysis, structured = parse_structured(analysis)
+
     result = {
         "url": url,
         "page_title": crawl_data["page_title"],
-        "gorsel_sayisi": len(crawl_data["images_b64"]),
-        "screenshot_b64": crawl_data["screenshot_b64"],
+        "gorsel_sayisi": len(crawl_data["images"]),
+        "screenshot": screenshot,
         "analiz": analysis,
+        "yapisal": structured,
         "image_urls": crawl_data["image_urls"],
+        "onbellek": False,
     }
 
-    log.info(f"=== Analiz Tamamlandı: {len(crawl_data['images_b64'])} görsel ===")
+    if img_hash and not analysis.startswith("❌"):
+        cache.put(listing_id, img_hash, {k: v for k, v in result.items() if k != "screenshot"})
+
+    log.info(f"=== Analiz Tamamlandı: {len(crawl_data['images'])} görsel ===")
     return result
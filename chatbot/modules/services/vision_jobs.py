@@ -0,0 +1,159 @@
+"""
+Görsel Analiz İş Kuyruğu
+========================
+Vision analizlerini MCP Server içinde arka plan işleri olarak çalıştırır.
+- Sınırlı sayıda worker (eşzamanlı analiz üst sınırı)
+- Aynı URL için devam eden / yeni bitmiş iş tekrar başlatılmaz (deduplikasyon)
+- İş durumu ve aşaması sorgulanabilir, sonuç beklenebilir
+
+Kuyruk MCP Server'ın event loop'unda yaşar; worker'lar ilk işte başlatılır.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+
+from vision import analyze_listing
+from logger import get_logger
+
+log = get_logger("vis_jobs")
+
+WORKERS = int(os.getenv("VISION_WORKERS", "2"))
+RESULT_TTL_SEC = float(os.getenv("VISION_JOB_TTL_SEC", "3600"))
+
+# Durumlar
+QUEUED, RUNNING, DONE, FAILED = "kuyrukta", "calisiyor", "tamamlandi", "hata"
+
+
+def _normalize_url(url: str) -> str:
+    return url.strip().split("#")[0].rstrip("/").lower()
+
+
+class VisionJobQueue:
+    """In-process, sınırlı eşzamanlılıklı görsel analiz kuyruğu."""
+
+    def __init__(self, workers: int = WORKERS, result_ttl_sec: float = RESULT_TTL_SEC):
+        self.workers = workers
+        self.result_ttl_sec = result_ttl_sec
+        self._jobs: dict[str, dict] = {}
+        self._by_url: dict[str, str] = {}
+        self._events: dict[str, asyncio.Event] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [t for t in self._tasks if not t.done()]
+        for i in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"vision-worker-{i}"))
+
+    def _prune(self):
+        """Süresi dolmuş bitmiş işleri unutur."""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job["durum"] in (DONE, FAILED) and now - (job["bitis"] or now) > self.result_ttl_sec:
+                self._jobs.pop(job_id, None)
+                self._events.pop(job_id, None)
+                if self._by_url.get(job["_key"]) == job_id:
+                    self._by_url.pop(job["_key"], None)
+
+    @staticmethod
+    def _reusable(job: dict | None) -> bool:
+        """Devam eden ya da başarıyla bitmiş iş yeniden kullanılır; hatalı olan tekrar denenir."""
+        if job is None or job["durum"] == FAILED:
+            return False
+        return job["durum"] != DONE or "hata" not in (job["sonuc"] or {})
+
+    async def submit(self, url: str) -> dict:
+        """İş ekler; aynı URL için aktif veya geçerli bir iş varsa onu döner."""
+        self._ensure_workers()
+        self._prune()
+
+        key = _normalize_url(url)
+        existing = self._by_url.get(key)
+        if existing and self._reusable(self._jobs.get(existing)):
+            log.info(f"Tekrarlanan iş, mevcut iş döndü: {existing}")
+            return self.get(existing)
+
+        job_id = uuid.uuid4().hex[:12]
+        self._jobs[job_id] = {
+            "is_id": job_id,
+            "url": url,
+            "durum": QUEUED,
+            "asama": QUEUED,
+            "olusturma": time.time(),
+            "baslama": None,
+            "bitis": None,
+            "sonuc": None,
+            "hata": None,
+            "_key": key,
+        }
+        self._events[job_id] = asyncio.Event()
+        self._by_url[key] = job_id
+        self._queue.put_nowait(job_id)
+        log.info(f"Görsel analiz işi kuyruğa eklendi: {job_id} ({self._queue.qsize()} bekleyen)")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        """İşin dışa açık anlık görüntüsü (sure_sn ve kuyruk sırası dahil)."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = {k: v for k, v in job.items() if not k.startswith("_")}
+        end = job["bitis"] or time.time()
+        snapshot["sure_sn"] = round(end - job["olusturma"], 1)
+        snapshot["bekleyen_is"] = self._queue.qsize() if self._queue else 0
+        return snapshot
+
+    async def wait(self, job_id: str, timeout: float) -> dict | None:
+        """İş bitene ya da süre dolana kadar bekler; iş iptal edilmez."""
+        event = self._events.get(job_id)
+        if event is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(event.wait()), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                self._queue.task_done()
+                continue
+
+            def progress(stage: str, _job=job):
+                _job["asama"] = stage
+
+            job["durum"] = RUNNING
+            job["baslama"] = time.time()
+            try:
+                result = await analyze_listing(job["url"], progress=progress)
+                # Screenshot baytları sonuç saklama süresince bellekte tutulmaz
+                job["sonuc"] = {k: v for k, v in result.items() if k != "screenshot"}
+                job["durum"] = DONE
+            except Exception as e:
+                log.error(f"Görsel analiz işi hatası ({job_id}): {e}")
+                job["hata"] = str(e)
+                job["durum"] = FAILED
+            finally:
+                job["asama"] = job["durum"]
+                job["bitis"] = time.time()
+                self._events[job_id].set()
+                self._queue.task_done()
+                log.info(f"Görsel analiz işi bitti: {job_id} ({job['durum']}, "
+                         f"{job['bitis'] - job['olusturma']:.1f} sn)")
+
+
+_queue: VisionJobQueue | None = None
+
+
+def get_vision_queue() -> VisionJobQueue:
+    """Süreç genelinde tek iş kuyruğu."""
+    global _queue
+    if _queue is None:
+        _queue = VisionJobQueue()
+    return _queue
@@ -0,0 +1,19 @@
+"""
+Test yapılandırması
+===================
+Modüller Docker imajındaki gibi düz adla import edilir (core/, services/, scripts/
+sys.path'e eklenir). Logger içe aktarılırken LOG_DIR oluşturulduğu için geçici bir
+dizine yönlendirilir; embedding arka ucu ağsız `hashed`, disk deposu kapalıdır.
+"""
+
+import os
+import sys
+import tempfile
+
+MODULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "modules")
+for sub in ("core", "services", "scripts"):
+    sys.path.insert(0, os.path.normpath(os.path.join(MODULES, sub)))
+
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="chatbot_test_logs_"))
+os.environ.setdefault("EMBED_BACKEND", "hashed")
+os.environ.setdefault("EMBED_STORE_ENABLED", "0")
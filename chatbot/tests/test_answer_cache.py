@@ -0,0 +1,63 @@
+import answer_cache
+from answer_cache import AnswerCache, data_version, normalize_question
+
+
+def test_normalize_question_turkish_case_and_punctuation():
+    assert normalize_question("  İstanbul'da EN ucuz   DİZEL?? ") == "istanbul da en ucuz dizel"
+    assert normalize_question("IŞIK") == "ışık"
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = AnswerCache()
+    cache.put("En ucuz Egea hangisi?", "v1", "cevap")
+    assert cache.get("en ucuz egea hangisi", "v1") == "cevap"
+    assert cache.stats() == {"kayit": 1, "hit": 1, "miss": 0}
+
+
+def test_version_change_misses():
+    cache = AnswerCache()
+    cache.put("soru", "v1", "cevap")
+    assert cache.get("soru", "v2") is None
+    assert cache.stats()["miss"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(ttl_sec=60)
+    cache.put("soru", "v1", "cevap")
+    now[0] += 30
+    assert cache.get("soru", "v1") == "cevap"
+    now[0] += 31
+    assert cache.get("soru", "v1") is None
+    assert cache.stats()["kayit"] == 0
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", "v1", "A")
+    cache.put("b", "v1", "B")
+    assert cache.get("a", "v1") == "A"  # a en son kullanılan olur
+    cache.put("c", "v1", "C")
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") == "A"
+    assert cache.get("c", "v1") == "C"
+
+
+def test_semantic_hit_threshold_and_version():
+    cache = AnswerCache(semantic_threshold=0.95)
+    cache.put("dizel otomatik suv", "v1", "cevap", embedding=[1.0, 0.0, 0.0])
+    assert cache.get("otomatik dizel suv", "v1", embedding=[0.99, 0.05, 0.0]) == "cevap"
+    assert cache.get("benzinli hatchback", "v1", embedding=[0.0, 1.0, 0.0]) is None
+    assert cache.get("otomatik dizel suv", "v2", embedding=[1.0, 0.0, 0.0]) is None
+
+
+def test_data_version():
+    stats = {"mysql": {"toplam_ilan": 10, "min_fiyat": 1, "max_fiyat": 2, "min_yil": 2010, "max_yil": 2020},
+             "qdrant": {"points_count": 10}}
+    version = data_version(stats)
+    assert version and len(version) == 12
+    assert data_version(stats) == version
+    assert data_version({**stats, "qdrant": {"points_count": 11}}) != version
+    assert data_version({}) is None
+    assert data_version({"mysql": stats["mysql"], "qdrant": {"hata": "bağlantı yok"}}) is None
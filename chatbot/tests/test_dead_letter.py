@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+# index_vectors MySQL ve Qdrant istemcilerini modül yüklenirken içe aktarır
+pytest.importorskip("dotenv")
+pytest.importorskip("qdrant_client")
+pytest.importorskip("db")
+pytest.importorskip("vector_db")
+
+import index_vectors  # noqa: E402
+from index_vectors import drop_retried_failures, read_failed_ids, record_failures  # noqa: E402
+
+
+@pytest.fixture
+def dead_letter(tmp_path, monkeypatch):
+    path = tmp_path / "index_failed.jsonl"
+    monkeypatch.setattr(index_vectors, "DEAD_LETTER_PATH", str(path))
+    monkeypatch.setattr(index_vectors, "_dead_letter_retry_offset", 0)
+    return path
+
+
+def lines(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_missing_file_reads_empty(dead_letter):
+    assert read_failed_ids() == ([], 0)
+
+
+def test_record_failures_deduplicates(dead_letter):
+    record_failures([5, 9000, 5], "429")
+    record_failures([9000, 7], "429")
+    assert [r["id"] for r in lines(dead_letter)] == [5, 9000, 7]
+    ids, size = read_failed_ids()
+    assert ids == [5, 9000, 7]
+    assert size == dead_letter.stat().st_size
+
+
+def test_retry_keeps_only_refailed_ids(dead_letter):
+    record_failures([5, 9000, 7], "429")
+    ids, offset = read_failed_ids()
+    # Tekrar denemede yeniden başarısız olan id, denenen kısım silineceği için tekrar yazılır
+    record_failures([9000], "yine 429")
+    drop_retried_failures(offset)
+    assert [(r["id"], r["hata"]) for r in lines(dead_letter)] == [(9000, "yine 429")]
+
+
+def test_successful_retry_removes_file(dead_letter):
+    record_failures([1, 2], "429")
+    _, offset = read_failed_ids()
+    drop_retried_failures(offset)
+    assert not dead_letter.exists()
+
+
+def test_failures_during_retry_are_not_lost_on_interrupt(dead_letter):
+    record_failures([1, 2], "429")
+    read_failed_ids()
+    record_failures([3], "429")
+    # drop_retried_failures çağrılmadan kesilen tekrar denemede tüm id'ler yerinde kalır
+    assert read_failed_ids()[0] == [1, 2, 3]
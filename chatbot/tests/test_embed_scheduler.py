@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+import embed_scheduler
+from embed_scheduler import EmbedScheduler, is_rate_limit
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Üstel beklemeyi atlar; istenen bekleme süreleri listeye yazılır."""
+    real_sleep = asyncio.sleep
+    delays = []
+
+    async def fast_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(embed_scheduler.asyncio, "sleep", fast_sleep)
+    return delays
+
+
+def fake_embed(texts):
+    return [[float(len(t))] for t in texts]
+
+
+def test_is_rate_limit():
+    assert is_rate_limit(RuntimeError("429 Too Many Requests"))
+    assert is_rate_limit(Exception("RESOURCE_EXHAUSTED: quota"))
+    assert not is_rate_limit(ValueError("geçersiz girdi"))
+
+
+def test_additive_increase_is_capped():
+    scheduler = EmbedScheduler(fake_embed, rate=1.0, max_rate=1.6, increase=0.5)
+    scheduler._on_success(1)
+    assert scheduler.rate == pytest.approx(1.5)
+    scheduler._on_success(1)
+    scheduler._on_success(1)
+    assert scheduler.rate == pytest.approx(1.6)
+
+
+def test_multiplicative_decrease_has_floor():
+    scheduler = EmbedScheduler(fake_embed, rate=1.0, decrease=0.5)
+    scheduler._on_rate_limit()
+    assert scheduler.rate == pytest.approx(0.5)
+    for _ in range(10):
+        scheduler._on_rate_limit()
+    assert scheduler.rate == pytest.approx(embed_scheduler.MIN_RATE)
+    assert scheduler.stats()["hiz_siniri"] == 11
+
+
+def test_rate_limit_is_retried(backoffs):
+    calls = []
+
+    def flaky(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise RuntimeError("429 quota exceeded")
+        return fake_embed(texts)
+
+    scheduler = EmbedScheduler(flaky, rate=100.0, max_rate=100.0)
+    assert asyncio.run(scheduler.embed(["ab", "c"])) == [[2.0], [1.0]]
+    stats = scheduler.stats()
+    assert (stats["hiz_siniri"], stats["hata"], stats["istek"], stats["metin"]) == (1, 0, 1, 2)
+    assert len(calls) == 2 and len(backoffs) >= 1
+
+
+def test_embed_many_marks_exhausted_chunk_none(backoffs):
+    def embed_fn(texts):
+        if "bozuk" in texts:
+            raise ValueError("sunucu hatası")
+        return fake_embed(texts)
+
+    scheduler = EmbedScheduler(embed_fn, rate=100.0, max_rate=100.0)
+    vectors = asyncio.run(scheduler.embed_many(["a", "bb", "bozuk", "x"], batch_size=2))
+    assert vectors == [[1.0], [2.0], None, None]
+    stats = scheduler.stats()
+    assert stats["hata"] == embed_scheduler.MAX_RETRIES
+    assert stats["basarisiz_parca"] == 1
+
+
+def test_backoff_does_not_hold_slot(backoffs):
+    """Bekleyen parça eşzamanlılık slotunu tutmaz; tek slotla diğer parça ilerler."""
+    order = []
+
+    def embed_fn(texts):
+        order.append(texts[0])
+        if texts[0] == "yavas" and order.count("yavas") == 1:
+            raise RuntimeError("429")
+        return fake_embed(texts)
+
+    scheduler = EmbedScheduler(embed_fn, concurrency=1, rate=100.0, max_rate=100.0)
+    asyncio.run(scheduler.embed_many(["yavas", "hizli"], batch_size=1))
+    assert order == ["yavas", "hizli", "yavas"]
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from embedding_backends import EmbeddingBackend, HashedNgramBackend, create_backend
+
+
+def test_hashed_backend_shape_norm_and_determinism():
+    backend = HashedNgramBackend(dim=256)
+    vectors = np.asarray(backend.embed(["Fiat Egea 1.3 Multijet", "Renault Clio dizel"], "retrieval_document"))
+    assert vectors.shape == (2, 256)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    again = np.asarray(HashedNgramBackend(dim=256).embed(["Fiat Egea 1.3 Multijet"], "retrieval_query"))
+    assert np.array_equal(vectors[0], again[0])
+
+
+def test_hashed_backend_empty_text_is_zero_vector():
+    assert HashedNgramBackend(dim=64).embed([""], "retrieval_document") == [[0.0] * 64]
+
+
+def test_hashed_backend_similarity_ranks_related_text_higher():
+    backend = HashedNgramBackend()
+    doc, related, unrelated = np.asarray(backend.embed(
+        ["Volkswagen Passat 1.6 TDI otomatik dizel", "passat tdi dizel otomatik", "kırmızı hatchback benzinli"],
+        "retrieval_document",
+    ))
+    assert doc @ related > doc @ unrelated
+
+
+def test_create_backend_spec():
+    backend = create_backend("hashed:128")
+    assert isinstance(backend, HashedNgramBackend) and backend.dim == 128
+
+
+def test_embedding_backend_is_abstract():
+    with pytest.raises(TypeError):
+        EmbeddingBackend()
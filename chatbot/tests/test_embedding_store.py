@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from embedding_store import EmbeddingStore, content_key
+
+MODEL = "models/gemini-embedding-001"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore(str(tmp_path))
+
+
+def test_content_key_normalizes_model_and_task_type():
+    assert content_key(MODEL, "RETRIEVAL_DOCUMENT", "x") == content_key("gemini-embedding-001", "retrieval_document", "x")
+    assert content_key(MODEL, "retrieval_document", "x") != content_key(MODEL, "retrieval_query", "x")
+
+
+def test_get_many_preserves_order_and_marks_missing(store):
+    store.put_many(MODEL, "retrieval_document", ["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+    assert store.get_many(MODEL, "retrieval_document", ["b", "yok", "a"]) == [[0.0, 1.0], None, [1.0, 0.0]]
+    assert store.get_many(MODEL, "retrieval_query", ["a"]) == [None]
+    stats = store.stats()
+    assert (stats["kayit"], stats["isabet"], stats["iskalama"]) == (2, 2, 2)
+
+
+def test_put_many_skips_existing_and_none(store, tmp_path):
+    store.put_many(MODEL, "retrieval_document", ["a", "b"], [[1.0, 2.0], None])
+    store.put_many(MODEL, "retrieval_document", ["a", "a", "c"], [[9.0, 9.0], [9.0, 9.0], [3.0, 4.0]])
+    assert store.get_many(MODEL, "retrieval_document", ["a", "b", "c"]) == [[1.0, 2.0], None, [3.0, 4.0]]
+    assert os.path.getsize(tmp_path / "vectors_2.f32") == 2 * 2 * 4
+
+
+def test_mixed_dimensions_and_reopen(store, tmp_path):
+    store.put_many(MODEL, "retrieval_document", ["kisa", "uzun"], [[0.5, 0.5], [0.25, 0.25, 0.5]])
+    store.put_many(MODEL, "retrieval_document", ["kisa2"], [[1.5, 2.5]])
+    reopened = EmbeddingStore(str(tmp_path))
+    assert reopened.get_many(MODEL, "retrieval_document", ["uzun", "kisa", "kisa2"]) == \
+        [[0.25, 0.25, 0.5], [0.5, 0.5], [1.5, 2.5]]
@@ -0,0 +1,75 @@
+import asyncio
+import io
+
+import numpy as np
+from PIL import Image
+
+from image_prep import fit_to_budget
+from image_select import category_hint, dhash, hamming, select_images
+
+
+def noise_jpeg(seed: int, size: tuple[int, int] = (320, 240), quality: int = 90) -> bytes:
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).resize((size[0] // 8, size[1] // 8)).resize(size).save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def blob(data: bytes) -> dict:
+    return {"mime_type": "image/jpeg", "data": data}
+
+
+def test_dhash_is_stable_under_reencoding():
+    original = noise_jpeg(1)
+    with Image.open(io.BytesIO(original)) as img:
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=60)
+    assert hamming(dhash(original), dhash(out.getvalue())) <= 10
+    assert hamming(dhash(original), dhash(noise_jpeg(2))) > 10
+    assert dhash(b"resim degil") is None
+
+
+def test_category_hint():
+    assert category_hint("https://cdn/x/ic-mekan-1.jpg") == "ic"
+    assert category_hint("https://cdn/x/1.jpg", "Jant ve lastikler") == "jant"
+    assert category_hint("https://cdn/x/1.jpg") is None
+
+
+def test_select_images_drops_duplicates_keeps_gallery_order():
+    a, b = noise_jpeg(1), noise_jpeg(2)
+    images = [blob(a), blob(a), blob(b)]
+    urls = ["u0", "u1", "u2"]
+    picked, picked_urls = asyncio.run(select_images(images, urls, budget=5))
+    assert picked_urls == ["u0", "u2"]
+    assert [p["data"] for p in picked] == [a, b]
+
+
+def test_select_images_budget_prefers_cover_and_new_category():
+    images = [blob(noise_jpeg(seed)) for seed in range(5)]
+    urls = ["kapak.jpg", "dis-1.jpg", "dis-2.jpg", "ic-mekan.jpg", "dis-3.jpg"]
+    alts = {"dis-1.jpg": "dış görünüm"}
+    _, picked_urls = asyncio.run(select_images(images, urls, budget=2, alts=alts))
+    assert picked_urls[0] == "kapak.jpg"
+    assert set(picked_urls) in ({"kapak.jpg", "dis-1.jpg"}, {"kapak.jpg", "ic-mekan.jpg"})
+
+
+def test_select_images_single_candidate():
+    images = [blob(b"bozuk")]
+    assert asyncio.run(select_images(images, ["u"], budget=3)) == (images, ["u"])
+
+
+def test_fit_to_budget_shrinks_under_limit():
+    raw = np.random.default_rng(0).integers(0, 256, (1500, 2400, 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(raw).save(out, "PNG")
+    fitted = fit_to_budget(blob(out.getvalue()), max_bytes=300 * 1024, max_edge=2048, fmt="JPEG")
+    assert fitted is not None
+    assert fitted["mime_type"] == "image/jpeg"
+    assert len(fitted["data"]) <= 300 * 1024
+    with Image.open(io.BytesIO(fitted["data"])) as img:
+        assert img.format == "JPEG" and max(img.size) <= 2048
+
+
+def test_fit_to_budget_gives_up():
+    assert fit_to_budget(blob(noise_jpeg(3, size=(1200, 900))), max_bytes=500, fmt="JPEG") is None
+    assert fit_to_budget(blob(b"resim degil"), max_bytes=10_000) is None